@@ -9,98 +9,434 @@ PROGRAM_BRIEF = "Removes duplicated (and possibly duplicated entries) in a CSV f
 AUTHORS_STRING = "David Choi <david.choi@pentastic.hk>"
 VERSION_STRING = "2025.08.13 15:31"
 
-import platform # to obtain OS platform
 import sys # to retrieve command line arguments
 import os  # to handle file I/O operations
 import csv # to read and write CSV files
-import tempfile # to create temporary files
-import shutil # to copy files
-import xml.etree.ElementTree as ET # to read XML files
+import contextlib # to write the destination files atomically
+import hashlib # to compute row digests
+import math # to round up partition counts
+import io # to parse CSV shards in memory
+import time # to time the matching stages
+import json # to read and write review files
+import bisect # to find the candidate rows of a block after a primary row
+# The modules only needed by some runs are imported lazily by the functions using them, so that the program starts
+# (and the module is imported, e.g. for Deduper) faster: tempfile and shutil to write files, gzip to read and write .gz files,
+# xml.etree.ElementTree to read .nessus files, heapq to merge the partitions on disk, concurrent.futures to run worker processes,
+# and glob to find the source files matching a pattern.
 
 import rmdutil # import our own modules
 
 # how to use: python3 rm_csv_dup.py ${src_csv_path} ${dest_csv_path}
 
-IS_WINDOWS = (platform.system() == "Windows")
+IS_WINDOWS = (sys.platform == "win32")
+
+# the encoding of the source and destination CSV files
+ENCODING = "utf-8"
+
+# (option flag(s), usage), shown in the help
+OPTION_FLAGS_USAGES = [
+    ("-h or --help", "For Manual"),
+    ("-v or --version", "For Version"),
+    ("--exact-only", "Only remove completely same entries"),
+    ("--memory-budget ${MB}", "Remove them on disk above ${MB} MB"),
+    ("--jobs ${N}", "Parse and remove them in N processes"),
+    ("--batch", "Never ask, only apply known decisions"),
+    ("--decisions ${PATH}", "Where merge decisions are kept"),
+    ("--no-decisions", "Don't keep merge decisions"),
+    ("--incremental", "Only process rows new since the last run"),
+    ("--preview-rows ${N}", "Only show the first N rows to be merged"),
+    ("--page-rows ${N}", "Show the rows to be merged N at a time"),
+    ("--lookahead ${N}", "Prepare the next N merges while you review"),
+    ("--no-lookahead", "Only prepare a merge when it is reviewed"),
+    ("--similarity ${JACCARD}", "Also merge keys sharing JACCARD of words"),
+    ("--group-by ${RULES}", "Merge by these rules, see below"),
+    ("--group-config ${PATH}", "Merge by the rules in this file"),
+    ("--aggregate ${AGGREGATORS}", "How to merge each column, see below"),
+    ("--consolidate", "Merge all the source files into one file"),
+    ("--stats", "Report where the time and memory go"),
+    ("--stats-json ${PATH}", "Also save the report as JSON"),
+]
+
+# option flags which take a value, e.g. --memory-budget 512 or --memory-budget=512
+VALUE_OPTION_FLAGS = ["--memory-budget", "--jobs", "--decisions", "--preview-rows", "--page-rows", "--lookahead", "--similarity", "--group-by", "--group-config", "--aggregate", "--stats-json"]
+# option flags which take no value
+SWITCH_OPTION_FLAGS = ["--exact-only", "--batch", "--no-decisions", "--incremental", "--no-lookahead", "--consolidate", "--stats"]
+
+# the number of next merge groups prepared in the background while the user reviews a group, by default
+DEFAULT_LOOKAHEAD_GROUPS = 4
+
+# where the merge decisions are kept by default, shared by all runs of the user
+DEFAULT_DECISIONS_PATH = os.path.join(os.path.expanduser("~"), ".rm_csv_dup_decisions.sqlite3")
+
+# @return the option flags usage table drawn with box-drawing characters
+def format_option_flags_usage() -> str:
+    flags_width = max([len(flags) for (flags, usage) in OPTION_FLAGS_USAGES] + [len("Option Flag(s)")]) + 1
+    usage_width = max([len(usage) for (flags, usage) in OPTION_FLAGS_USAGES] + [len("Usage")]) + 1
+    if IS_WINDOWS:
+        borders = ("╔═╦╗", "║║║", "╠═╬╣", "╚═╩╝")
+    else:
+        borders = ("╭─┬╮", "│││", "├─┼┤", "╰─┴╯")
+    def format_border(border: str) -> str:
+        return border[0] + border[1] * (flags_width + 1) + border[2] + border[1] * (usage_width + 1) + border[3]
+    def format_cells(flags: str, usage: str) -> str:
+        return borders[1][0] + " " + flags.ljust(flags_width) + borders[1][1] + " " + usage.ljust(usage_width) + borders[1][2]
+    lines = [""]
+    lines.append(format_border(borders[0]))
+    lines.append(format_cells("Option Flag(s)", "Usage"))
+    lines.append(format_border(borders[2]))
+    for (flags, usage) in OPTION_FLAGS_USAGES:
+        lines.append(format_cells(flags, usage))
+    lines.append(format_border(borders[3]))
+    return "\n".join(lines)
 
 def print_help():
     print("")
     print("Command Line Interface - " + PROGRAM_NAME)
     print("")
     print("How to use:")
-    print(">" if IS_WINDOWS else "$", "python3", "\"" + sys.argv[0] + "\"", "${src_csv_path} ${dest_csv_path}")
-    if IS_WINDOWS:
-        option_flags_usage = """
-╔════════════════════╦═════════════╗
-║ Option Flag(s)     ║ Usage       ║
-╠════════════════════╬═════════════╣
-║ -h or --help       ║ For Manual  ║
-║ -v or --version    ║ For Version ║
-╚════════════════════╩═════════════╝"""
-    else:
-        option_flags_usage = """
-╭────────────────────┬─────────────╮
-│ Option Flag(s)     │ Usage       │
-├────────────────────┼─────────────┤
-│ -h or --help       │ For Manual  │
-│ -v or --version    │ For Version │
-╰────────────────────┴─────────────╯"""
+    print(">" if IS_WINDOWS else "$", "python3", "\"" + sys.argv[0] + "\"", "[option flags]", "${src_csv_path} ${dest_csv_path}")
+    print("Or in two phases, to review the merges in a file instead of one by one:")
+    print(">" if IS_WINDOWS else "$", "python3", "\"" + sys.argv[0] + "\"", "[option flags]", COMMAND_PLAN, "${src_csv_path} ${review_path}")
+    print(">" if IS_WINDOWS else "$", "python3", "\"" + sys.argv[0] + "\"", "[option flags]", COMMAND_APPLY, "${src_csv_path} ${review_path} ${dest_csv_path}")
+    option_flags_usage = format_option_flags_usage()
     print(option_flags_usage)
     print("")
     print("Param src_csv_path:")
-    print("The path to the CSV file to be processed.")
+    print("The path to the CSV file (or the .nessus file exported by Nessus) to be processed, which may be compressed as .gz.")
+    print("Or a directory (or a glob pattern, e.g. \"scans/*.nessus\") of such files, each processed into dest_csv_path as a directory,")
+    print("e.g. \"scan.csv\" into \"${dest_csv_path}/scan" + DEST_FILE_SUFFIX + ".csv\", concurrently in --jobs processes with --batch,")
+    print("or all processed together into dest_csv_path as one CSV file with --consolidate.")
     src_csv_path_example = "C:\\" if IS_WINDOWS else "/"
     src_csv_path_example += os.path.join("Users", "Dave CH", "Documents", "proj", "Pentast", "ness", "scan_results.csv")
     print("e.g. \"" + src_csv_path_example + "\"")
     print("")
     print("Param dest_csv_path:")
-    print("The path to the CSV output file.")
+    print("The path to the CSV output file, which is compressed if it ends with \".csv.gz\".")
     dest_csv_path_example = "C:\\" if IS_WINDOWS else "/"
     dest_csv_path_example += os.path.join("Users", "Dave CH", "Documents", "proj", "Pentast", "ness", "scan_results_no_dup.csv")
     print("e.g. \"" + dest_csv_path_example + "\"")
     print("")
+    print("Param review_path:")
+    print("The path to the JSON review file, written by " + COMMAND_PLAN + " with every merge planned, and read back by " + COMMAND_APPLY + ".")
+    print("Set the \"decision\" of every merge to \"" + REVIEW_DECISION_MERGE + "\" or \"" + REVIEW_DECISION_KEEP + "\" in between, the merges left \"" + REVIEW_DECISION_UNDECIDED + "\" are not applied.")
+    print("")
+    print("Grouping rules:")
+    print("Rules are separated by \";\" (or written one per line in the --group-config file), and run in order.")
+    print("Every rule is a list of key columns separated by \",\", and each key column may be followed by")
+    print(":" + STRATEGY_EXACT + " (the default), :" + STRATEGY_SUBNET + "[=${IPV4_MASKLEN}[/${IPV6_MASKLEN}]] (IP addresses in the same subnet, /24 and /64 by default),")
+    print("or :" + STRATEGY_PREFIX_SUFFIX + " or :" + STRATEGY_FUZZY + "[=${JACCARD}] for at most one of them.")
+    print("e.g. \"Plugin ID, Host; Name:prefix-suffix, Port; Synopsis:fuzzy=0.7; Plugin ID, Host:subnet=24/64\"")
+    print("Without rules, the rows are merged by \"" + "; ".join(format_grouping_rule(grouping_rule) for grouping_rule in get_default_grouping_rules(KEY_COLUMN_NAMES)) + "\".")
+    print("")
+    print("Aggregators:")
+    print("A list of \"column name:aggregator\" separated by \",\", where the aggregator is one of")
+    print("union (the default, the distinct values), union=${N} (at most N distinct values), count (the number of distinct values),")
+    print("min or max (as numbers, e.g. CVSS, or as strings, e.g. dates), first (the first value) or concat (all values).")
+    print("e.g. \"Host:union=20, CVSS v3.0 Base Score:max, Plugin Output:first\"")
+    print("")
 
-# @return true if option flag is detected, false otherwise.
+# @return true if the help or version option flag is detected, false otherwise.
 def check_option_flags():
     if (len(sys.argv) >= 2):
         arg = sys.argv[1]
-        if (arg.startswith("-")):
-            if (arg == "-v" or arg == "--version"):
-                print("Script:  " + PROGRAM_NAME)
-                print("Brief:   " + PROGRAM_BRIEF)
-                print("Author:  " + AUTHORS_STRING)
-                print("Version: " + VERSION_STRING)
-            else:
-                if not(arg == "-h" or arg == "--help"):
-                    print("")
-                    print("Option flag " + arg + " not recognized.")
-                print_help()
+        if (arg == "-v" or arg == "--version"):
+            print("Script:  " + PROGRAM_NAME)
+            print("Brief:   " + PROGRAM_BRIEF)
+            print("Author:  " + AUTHORS_STRING)
+            print("Version: " + VERSION_STRING)
+            return True
+        if (arg == "-h" or arg == "--help"):
+            print_help()
             return True
     return False
 
+# Separates the option flags from the params.
+# @return (options, params), where options[option_flag] == value (True for option flags without value), or None if an option flag is not recognized.
+def parse_command_line(args: list):
+    options = {}
+    params = []
+    i = 0
+    while (i < len(args)):
+        arg = args[i]
+        i += 1
+        if (not arg.startswith("-")):
+            params.append(arg)
+            continue
+        
+        (option_flag, has_value, value) = arg.partition("=")
+        if (option_flag in VALUE_OPTION_FLAGS):
+            if (not has_value):
+                if (i >= len(args)):
+                    print("")
+                    print("Option flag " + option_flag + " needs a value.")
+                    print_help()
+                    return None
+                value = args[i]
+                i += 1
+            options[option_flag] = value
+        elif (option_flag in SWITCH_OPTION_FLAGS and not has_value):
+            options[option_flag] = True
+        else:
+            print("")
+            print("Option flag " + arg + " not recognized.")
+            print_help()
+            return None
+    return (options, params)
+
+# @return the value of the option flag as a positive number, default_value if the option flag is absent, or 0 (after printing an error) if the value is not a positive number.
+def get_positive_int_option(options: dict, option_flag: str, default_value):
+    if (option_flag not in options):
+        return default_value
+    try:
+        value = int(options[option_flag])
+    except ValueError:
+        value = 0
+    if (value <= 0):
+        print("Error: " + option_flag + " = \"" + options[option_flag] + "\" is not a positive number.")
+        return 0
+    return value
+
+# @return the value of the option flag as a number in (0, 1], default_value if the option flag is absent, or 0 (after printing an error) if the value is not such a number.
+def get_fraction_option(options: dict, option_flag: str, default_value):
+    if (option_flag not in options):
+        return default_value
+    try:
+        value = float(options[option_flag])
+    except ValueError:
+        value = 0
+    if (not (value > 0 and value <= 1)):
+        print("Error: " + option_flag + " = \"" + options[option_flag] + "\" is not a number between 0 and 1.")
+        return 0
+    return value
+
+# The merged row of a group and its tables, prepared before the group is reviewed.
+class MergePreview:
+    __slots__ = ("merged_row", "merge_seconds", "before_table_str", "after_table_str")
+    
+    # @param preview_max_rows See review_merge()
+    # @param preview_page_rows See review_merge().  The table before merging is only prepared if it is not paged.
+    # @param source_rows See get_merged_row()
+    def __init__(self, header: list, rows_to_be_merged: list, preview_max_rows: int = None, preview_page_rows: int = None, column_aggregators: dict = None, source_rows: list = None):
+        begin_time = time.perf_counter()
+        self.merged_row = rmdutil.merge_rows(rows_to_be_merged, column_aggregators = column_aggregators, source_rows = source_rows)
+        self.merge_seconds = time.perf_counter() - begin_time
+        self.before_table_str = None
+        shown_row_count = len(rows_to_be_merged)
+        if (preview_max_rows is not None and shown_row_count > preview_max_rows):
+            shown_row_count = preview_max_rows
+        if (preview_page_rows is None or shown_row_count <= preview_page_rows):
+            self.before_table_str = rmdutil.format_table(header, rows_to_be_merged, preview_max_rows)
+        self.after_table_str = rmdutil.format_table(header, [self.merged_row])
+
+# @param source_rows The original rows of rows_to_be_merged, aggregated instead by some aggregators, see rmdutil.merge_rows()
+# @return the merged row of the preview (counted by stats if given), or of the rows if there is no preview
+def get_merged_row(rows_to_be_merged: list, preview: MergePreview = None, stats: rmdutil.RunStats = None, column_aggregators: dict = None, source_rows: list = None) -> list:
+    if (preview is not None):
+        if (stats is not None):
+            stats.add_merge_rows(preview.merge_seconds)
+        return preview.merged_row
+    if (stats is not None):
+        return stats.merge_rows(rows_to_be_merged, column_aggregators, source_rows)
+    return rmdutil.merge_rows(rows_to_be_merged, column_aggregators = column_aggregators, source_rows = source_rows)
+
+# Shows the rows before and after merging, and asks the user whether to merge them.
+# @param preview_max_rows Only the first preview_max_rows rows to be merged are shown, None to show all.
+# @param preview_page_rows The rows to be merged are shown preview_page_rows rows at a time, None to show all at once.
+# @param stats The RunStats timing merge_rows(), None not to time it.
+# @param column_aggregators See rmdutil.merge_rows()
+# @param preview The MergePreview prepared for exactly these rows, None to prepare it now.
+# @param source_rows See get_merged_row()
+# @return the merged row if the user accepts the merge, None otherwise.
+def review_merge(header: list, rows_to_be_merged: list, preview_max_rows: int = None, preview_page_rows: int = None, stats: rmdutil.RunStats = None, column_aggregators: dict = None, preview: MergePreview = None, source_rows: list = None):
+    print("\n\n")
+    
+    # prints the table before merging
+    if (preview is not None and preview.before_table_str is not None):
+        sys.stdout.write(preview.before_table_str)
+    else:
+        rmdutil.print_table(header, rows_to_be_merged, preview_max_rows, preview_page_rows)
+    
+    print("\n\n/\\ Table BEFORE merging. /\\")
+    print("")
+    print("\\/ Table AFTER merging. \\/\n\n")
+    
+    # generates a merged row for preview only
+    merged_row = get_merged_row(rows_to_be_merged, preview, stats, column_aggregators, source_rows)
+    
+    # prints the table after merging
+    if (preview is not None):
+        sys.stdout.write(preview.after_table_str)
+    else:
+        # creates a table with only the merged row
+        # only for easier printing to the console
+        merged_table = [merged_row]
+        rmdutil.print_table(header, merged_table)
+    
+    # ask the user for merging permission
+    user_wants_to_merge = rmdutil.ask_user("Do you want to merge? [Y/n]: ")
+    
+    if (not user_wants_to_merge):
+        # don't do the merge
+        print("This merge is cancelled.")
+        return None
+    
+    return merged_row
+
+# the string between the key values of a row in a group by several key columns, unlikely to appear in any key
+KEY_VALUES_SEPARATOR = "\x1f"
+
+# @param key_column_indexes The key columns the rows are grouped by
+# @return (fingerprint, column name, key values) identifying the group in a MergeDecisionStore
+def get_group_fingerprint(header: list, rows_to_be_merged: list, key_column_indexes: list) -> tuple:
+    # a group by one key column is identified the same way as before grouping rules existed
+    column_name = ", ".join(header[column_index] for column_index in key_column_indexes)
+    key_values = [KEY_VALUES_SEPARATOR.join(row[column_index] for column_index in key_column_indexes) for row in rows_to_be_merged]
+    return (rmdutil.MergeDecisionStore.fingerprint(column_name, key_values), column_name, key_values)
+
+# Decides whether to merge each group of similar rows.
+# Known decisions are applied without asking again, and new decisions are saved to the decision store, so a group found
+# again in a later stage of the same run is not asked again either.
+# Every group is counted once in the summary, however many stages find it.
+class MergeReviewer:
+    # @param decision_store The MergeDecisionStore, or None to always ask the user.
+    # @param batch True to never ask the user.  Groups without a known decision are not merged then.
+    # @param preview_max_rows See review_merge()
+    # @param preview_page_rows See review_merge()
+    # @param stats See review_merge()
+    # @param column_aggregators See review_merge()
+    # @param decide The function (header: list, rows_to_be_merged: list, merged_row: list) -> bool deciding whether to
+    # merge a group in place of asking the user, see Deduper.  None to ask the user by review_merge().
+    def __init__(self, decision_store = None, batch: bool = False, preview_max_rows: int = None, preview_page_rows: int = None, stats: rmdutil.RunStats = None, column_aggregators: dict = None, decide = None):
+        self.__decision_store = decision_store
+        self.__batch = batch
+        self.__decide = decide
+        self.__preview_max_rows = preview_max_rows
+        self.__preview_page_rows = preview_page_rows
+        self.__stats = stats
+        self.__column_aggregators = column_aggregators
+        # the fingerprints of the groups decided in this run
+        self.__decided_fingerprints = set()
+        # the fingerprints of the groups counted below
+        self.__counted_fingerprints = set()
+        # the groups merged and rejected by the decisions of previous runs
+        self.known_merged_count = 0
+        self.known_rejected_count = 0
+        # the groups found again after being decided earlier in this run, and merged or rejected again without asking
+        self.repeated_merged_count = 0
+        self.repeated_rejected_count = 0
+        # the groups without a decision, which are not merged in batch mode
+        self.undecided_count = 0
+    
+    # @return true if review() may ask the user, so that preparing the previews of the next groups in advance pays off
+    def is_interactive(self) -> bool:
+        return (not self.__batch and self.__decide is None)
+    
+    # Prepares the preview of a group before it is reviewed.  It can be called from a background thread.
+    # @param source_rows See get_merged_row()
+    # @return the MergePreview to be passed to review()
+    def prepare(self, header: list, rows_to_be_merged: list, source_rows: list = None) -> MergePreview:
+        return MergePreview(header, rows_to_be_merged, self.__preview_max_rows, self.__preview_page_rows, self.__column_aggregators, source_rows)
+    
+    # @param key_column_indexes The key columns the rows are grouped by, which identify the group in the decision store.
+    # @param preview The MergePreview prepared by prepare() for exactly these rows, None if there is none.
+    # @param source_rows See get_merged_row()
+    # @return the merged row if the rows are to be merged, None otherwise.
+    def review(self, header: list, rows_to_be_merged: list, key_column_indexes: list, preview: MergePreview = None, source_rows: list = None):
+        if (self.__decision_store is not None or self.__batch):
+            (fingerprint, column_name, key_values) = get_group_fingerprint(header, rows_to_be_merged, key_column_indexes)
+        
+        if (self.__decision_store is not None):
+            user_wants_to_merge = self.__decision_store.get(fingerprint)
+            if (user_wants_to_merge is not None):
+                self.__count_known(fingerprint, user_wants_to_merge)
+                if (user_wants_to_merge):
+                    return get_merged_row(rows_to_be_merged, preview, self.__stats, self.__column_aggregators, source_rows)
+                return None
+        
+        if (self.__batch):
+            # nobody to ask, leave the rows as they are
+            if (fingerprint not in self.__counted_fingerprints):
+                self.__counted_fingerprints.add(fingerprint)
+                self.undecided_count += 1
+            return None
+        
+        if (self.__decide is not None):
+            merged_row = get_merged_row(rows_to_be_merged, preview, self.__stats, self.__column_aggregators, source_rows)
+            # the rows may be RowHandles, which are handed over as plain lists like the rows written to the sink of a Deduper
+            if (not self.__decide(header, [list(row) for row in rows_to_be_merged], merged_row)):
+                merged_row = None
+        else:
+            merged_row = review_merge(header, rows_to_be_merged, self.__preview_max_rows, self.__preview_page_rows, self.__stats, self.__column_aggregators, preview, source_rows)
+        if (self.__decision_store is not None):
+            self.__decision_store.put(fingerprint, column_name, key_values, (merged_row is not None))
+            self.__decided_fingerprints.add(fingerprint)
+        return merged_row
+    
+    # Counts a group with a known decision once, as decided in this run or by a previous run.
+    def __count_known(self, fingerprint: str, user_wants_to_merge: bool):
+        if (fingerprint in self.__counted_fingerprints):
+            return
+        self.__counted_fingerprints.add(fingerprint)
+        if (fingerprint in self.__decided_fingerprints):
+            if (user_wants_to_merge):
+                self.repeated_merged_count += 1
+            else:
+                self.repeated_rejected_count += 1
+        elif (user_wants_to_merge):
+            self.known_merged_count += 1
+        else:
+            self.known_rejected_count += 1
+    
+    def print_summary(self):
+        if (self.known_merged_count > 0 or self.known_rejected_count > 0):
+            print(str(self.known_merged_count) + " merge(s) accepted and " + str(self.known_rejected_count) + " merge(s) rejected by the decisions of previous runs.")
+        if (self.repeated_merged_count > 0 or self.repeated_rejected_count > 0):
+            print(str(self.repeated_merged_count) + " merge(s) accepted and " + str(self.repeated_rejected_count) + " merge(s) rejected again without asking, as they were decided in an earlier stage of this run.")
+        if (self.undecided_count > 0):
+            print(str(self.undecided_count) + " merge(s) without previous decisions are skipped in batch mode.")
+
+# Merges the rows by any comparator, comparing every primary row with all the remaining rows.  The built-in matching
+# stages find their candidates by MatchingPairClusterer instead.
 # @param comparator_function The function (primary_key_str: str, row_key_str: str) -> bool, which returns true if both rows are mergable, false otherwise. The function is only called upon different rows.
-def merge_by_column_with_comparator(header: list, raw_table: list, column_name: str, comparator_function) -> list:
+# @param reviewer The MergeReviewer deciding whether to merge each group, None to always ask the user.
+def merge_by_column_with_comparator(header: list, raw_table: list, column_name: str, comparator_function, reviewer: MergeReviewer = None) -> list:
     try:
         column_index = header.index(column_name)
     except ValueError:
         return raw_table
     
-    # create result table to hold the results
-    result_table = []
+    if (reviewer is None):
+        reviewer = MergeReviewer()
+    
+    # create result table to hold the merged rows
+    merged_rows = []
+    
+    # rows are never moved out of the raw table, their indexes serve as row IDs
+    # a merged row is only marked as deleted here, and skipped when the result table is assembled
+    row_count = len(raw_table)
+    deleted = bytearray(row_count)
     
     primary_row_index = 0
     
-    while len(raw_table) > primary_row_index:
+    while row_count > primary_row_index:
+        if (deleted[primary_row_index]):
+            # this row was merged into a previous primary row
+            primary_row_index += 1
+            continue
+        
         # the primary row will be used to find similar rows
         primary_row = raw_table[primary_row_index]
         primary_key_column_value = primary_row[column_index]
         
         # collects the rows similar to the primary row
         # note that primary_row is always collected to the similar_rows
-        similar_rows = [primary_row]
+        similar_row_indexes = [primary_row_index]
         
         # scan all remaining rows in the raw table, starting from the row right after the primary row
-        for i in range(primary_row_index + 1, len(raw_table)):
+        for i in range(primary_row_index + 1, row_count):
+            if (deleted[i]):
+                continue
+            
             row = raw_table[i]
             key_column_value = row[column_index]
             
@@ -108,11 +444,11 @@ def merge_by_column_with_comparator(header: list, raw_table: list, column_name:
             if (comparator_function(primary_key_column_value, key_column_value)):
                 # this row is similar to the primary row
                 # save this row to later ask the user to merge it or not
-                similar_rows.append(row)
+                similar_row_indexes.append(i)
         
-        if (len(similar_rows) == 0):
-            pass # similar_rows should always include the primary row itself
-        elif (len(similar_rows) == 1):
+        if (len(similar_row_indexes) == 0):
+            pass # similar_row_indexes should always include the primary row itself
+        elif (len(similar_row_indexes) == 1):
             # this row is very unique: only this row itself is similar to itself
             # no need to ask the user for merging permission then
             # because we aren't actually merging anything
@@ -120,217 +456,1844 @@ def merge_by_column_with_comparator(header: list, raw_table: list, column_name:
             primary_row_index += 1
         else:
             # get the rows to be merged
-            rows_to_be_merged = similar_rows
-            
-            print("\n\n")
-            
-            # prints the table before merging
-            rmdutil.print_table(header, rows_to_be_merged)
-            
-            print("\n\n/\\ Table BEFORE merging. /\\")
-            print("")
-            print("\\/ Table AFTER merging. \\/\n\n")
-            
-            # generates a merged row for preview only
-            merged_row = rmdutil.merge_rows(rows_to_be_merged)
-            
-            # creates a table with only the merged row
-            # only for easier printing to the console
-            merged_table = [merged_row]
+            rows_to_be_merged = [raw_table[i] for i in similar_row_indexes]
             
-            # prints the table after merging
-            rmdutil.print_table(header, merged_table)
+            # ask the reviewer for merging permission
+            merged_row = reviewer.review(header, rows_to_be_merged, [column_index])
             
-            # ask the user for merging permission
-            user_wants_to_merge = rmdutil.ask_user("Do you want to merge? [Y/n]: ")
-            
-            if (user_wants_to_merge):
+            if (merged_row is not None):
                 # remove all the similar rows from the raw table
-                #for similar_row in similar_rows:
-                #    raw_table.remove(similar_row)
-                raw_table = [row for row in raw_table if row not in similar_rows]
+                for i in similar_row_indexes:
+                    deleted[i] = 1
                 
                 # add the merged row to the result table
-                result_table.append(merged_row)
+                merged_rows.append(merged_row)
             else:
-                # don't do the merge
-                print("This merge is cancelled.")
-                
                 # skip using this row as primary row for future scans
                 primary_row_index += 1
     
-    # move the remaining "very unique" rows to the result table
-    while (len(raw_table) > 0):
-        result_table.append(raw_table.pop(0))
+    # the merged rows come first, followed by the remaining "very unique" rows
+    result_table = merged_rows
+    result_table.extend(row for (i, row) in enumerate(raw_table) if not deleted[i])
     
     return result_table
 
-def merge_by_column_with_matching_pair(header: list, raw_table: list, column_name: str, ignore_case: bool, words_matching_pair: tuple) -> list:
+# the string between 2 words of a key
+KEY_SPLITTER = " "
+
+# the number of words to be matched at the begin and end of both keys, strictest first
+WORDS_MATCHING_PAIRS = [(3, 3), (3, 2), (2, 3), (2, 2), (3, 1), (1, 3), (3, 0), (0, 3), (2, 1), (1, 2), (2, 0), (0, 2), (1, 0), (0, 1)]
+
+# the strategies to match the values of a key column of a grouping rule
+# the (case-folded) values are the same
+STRATEGY_EXACT = "exact"
+# the values begin and end with the same words, for every words matching pair
+STRATEGY_PREFIX_SUFFIX = "prefix-suffix"
+# the values share at least a fraction of their words, see rmdutil.MinHashIndex
+STRATEGY_FUZZY = "fuzzy"
+# the values are IP addresses in the same subnet, or the same values if they are not IP addresses, see rmdutil.IpAddressArray
+STRATEGY_SUBNET = "subnet"
+STRATEGIES = [STRATEGY_EXACT, STRATEGY_PREFIX_SUFFIX, STRATEGY_FUZZY, STRATEGY_SUBNET]
+# the strategies which hash every row into a block, any number of them can be combined in a rule
+BLOCK_STRATEGIES = [STRATEGY_EXACT, STRATEGY_SUBNET]
+
+# the Jaccard similarity of a fuzzy key column without a threshold of its own
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+# the subnet mask lengths of a subnet key column without mask lengths of its own
+DEFAULT_IPV4_MASKLEN = 24
+DEFAULT_IPV6_MASKLEN = 64
+
+# A key column of a grouping rule, and how its values are matched.
+class GroupingKey:
+    # @param similarity_threshold The Jaccard similarity of a fuzzy key column
+    # @param ipv4_masklen The number of leading bits of the IPv4 subnets of a subnet key column
+    # @param ipv6_masklen The number of leading bits of the IPv6 subnets of a subnet key column
+    def __init__(self, column_name: str, strategy: str = STRATEGY_EXACT, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD, ipv4_masklen: int = DEFAULT_IPV4_MASKLEN, ipv6_masklen: int = DEFAULT_IPV6_MASKLEN):
+        self.column_name = column_name
+        self.strategy = strategy
+        self.similarity_threshold = similarity_threshold
+        self.ipv4_masklen = ipv4_masklen
+        self.ipv6_masklen = ipv6_masklen
     
-    def matching_pair_comparator(primary_key_str: str, row_key_str: str) -> bool:
-        if (primary_key_str == ""):
+    def __str__(self) -> str:
+        if (self.strategy == STRATEGY_EXACT):
+            return self.column_name
+        if (self.strategy == STRATEGY_FUZZY):
+            return self.column_name + ":" + self.strategy + "=" + str(self.similarity_threshold)
+        if (self.strategy == STRATEGY_SUBNET):
+            return self.column_name + ":" + self.strategy + "=" + str(self.ipv4_masklen) + "/" + str(self.ipv6_masklen)
+        return self.column_name + ":" + self.strategy
+
+# A grouping rule is a list of GroupingKey, and groups the rows whose key columns all match.
+# @return the rule written the same way as parse_grouping_rule() reads it
+def format_grouping_rule(grouping_rule: list) -> str:
+    return ", ".join(str(grouping_key) for grouping_key in grouping_rule)
+
+# Reads a grouping rule like "Name:prefix-suffix, Port" or "Plugin ID, Host" or "Synopsis:fuzzy=0.7, Port" or
+# "Plugin ID, Host:subnet=24/64".
+# Every key column is "column name[:strategy]", and the strategy is exact if omitted.
+# At most one key column of a rule can be matched by prefix-suffix or fuzzy.
+# @param default_similarity_threshold The Jaccard similarity of fuzzy key columns without "=threshold"
+# @return the grouping rule, or None (after printing an error) if it cannot be read.
+def parse_grouping_rule(rule_str: str, default_similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+    grouping_rule = []
+    for key_str in rule_str.split(","):
+        (column_name, has_strategy, strategy) = key_str.partition(":")
+        column_name = column_name.strip()
+        (strategy, has_threshold, threshold_str) = strategy.strip().partition("=")
+        strategy = strategy.strip()
+        if (not has_strategy):
+            strategy = STRATEGY_EXACT
+        if (column_name == "" or strategy not in STRATEGIES):
+            print("Error: \"" + key_str.strip() + "\" in grouping rule \"" + rule_str.strip() + "\" should be a column name, optionally followed by one of :" + ", :".join(STRATEGIES) + ".")
+            return None
+        
+        similarity_threshold = default_similarity_threshold
+        (ipv4_masklen, ipv6_masklen) = (DEFAULT_IPV4_MASKLEN, DEFAULT_IPV6_MASKLEN)
+        if (has_threshold and strategy == STRATEGY_SUBNET):
+            # "=24" or "=24/64"
+            (ipv4_masklen_str, has_ipv6_masklen, ipv6_masklen_str) = threshold_str.partition("/")
+            try:
+                ipv4_masklen = int(ipv4_masklen_str)
+                if (has_ipv6_masklen):
+                    ipv6_masklen = int(ipv6_masklen_str)
+            except ValueError:
+                ipv4_masklen = -1
+            if (ipv4_masklen < 0 or ipv4_masklen > 32 or ipv6_masklen < 0 or ipv6_masklen > 128):
+                print("Error: \"" + key_str.strip() + "\" in grouping rule \"" + rule_str.strip() + "\" should set the subnet as :" + STRATEGY_SUBNET + "=${IPV4_MASKLEN} or :" + STRATEGY_SUBNET + "=${IPV4_MASKLEN}/${IPV6_MASKLEN}.")
+                return None
+        elif (has_threshold):
+            try:
+                similarity_threshold = float(threshold_str)
+            except ValueError:
+                similarity_threshold = 0
+            if (strategy != STRATEGY_FUZZY or not (similarity_threshold > 0 and similarity_threshold <= 1)):
+                print("Error: \"" + key_str.strip() + "\" in grouping rule \"" + rule_str.strip() + "\" can only set a similarity between 0 and 1 for :" + STRATEGY_FUZZY + ".")
+                return None
+        grouping_rule.append(GroupingKey(column_name, strategy, similarity_threshold, ipv4_masklen, ipv6_masklen))
+    
+    if (len([grouping_key for grouping_key in grouping_rule if grouping_key.strategy not in BLOCK_STRATEGIES]) > 1):
+        print("Error: grouping rule \"" + rule_str.strip() + "\" can only match one column by :" + STRATEGY_PREFIX_SUFFIX + " or :" + STRATEGY_FUZZY + ".")
+        return None
+    return grouping_rule
+
+# Reads the grouping rules separated by ";", or one per line of a grouping config file.
+# Empty rules, and lines beginning with "#", are ignored.
+# @return the list of grouping rules, or None (after printing an error) if any of them cannot be read.
+def parse_grouping_rules(rules_str: str, default_similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+    grouping_rules = []
+    for rule_str in rules_str.replace("\n", ";").split(";"):
+        if (rule_str.strip() == "" or rule_str.strip().startswith("#")):
+            continue
+        grouping_rule = parse_grouping_rule(rule_str, default_similarity_threshold)
+        if (grouping_rule is None):
+            return None
+        grouping_rules.append(grouping_rule)
+    return grouping_rules
+
+# Reads the aggregators of the merged columns like "Host:union=20, CVSS v3.0 Base Score:max, Plugin Output:first".
+# Every entry is "column name:aggregator", see rmdutil.AGGREGATORS, and the columns not listed are aggregated by "union".
+# @return the dict of column name -> aggregator function, or None (after printing an error) if it cannot be read.
+def parse_column_aggregators(aggregators_str: str):
+    column_aggregators = {}
+    for entry_str in aggregators_str.split(","):
+        if (entry_str.strip() == ""):
+            continue
+        (column_name, has_aggregator, aggregator_str) = entry_str.rpartition(":")
+        column_name = column_name.strip()
+        aggregator = rmdutil.get_aggregator(aggregator_str)
+        if (not has_aggregator or column_name == "" or aggregator is None):
+            print("Error: \"" + entry_str.strip() + "\" should be a column name followed by one of :" + ", :".join(rmdutil.AGGREGATORS.keys()) + " (or :union=${N} to keep at most N values).")
+            return None
+        column_aggregators[column_name] = aggregator
+    return column_aggregators
+
+# @return the grouping rules of the original behaviour: the words matching pairs of every key column in turn,
+# each followed by a fuzzy match if similarity_threshold is not None
+def get_default_grouping_rules(column_names: list, similarity_threshold: float = None) -> list:
+    grouping_rules = []
+    for column_name in column_names:
+        grouping_rules.append([GroupingKey(column_name, STRATEGY_PREFIX_SUFFIX)])
+        if (similarity_threshold is not None):
+            grouping_rules.append([GroupingKey(column_name, STRATEGY_FUZZY, similarity_threshold)])
+    return grouping_rules
+
+# @return the names of the key columns of the grouping rules, in the order they first appear
+def get_grouping_column_names(grouping_rules: list) -> list:
+    column_names = []
+    for grouping_rule in grouping_rules:
+        for grouping_key in grouping_rule:
+            if (grouping_key.column_name not in column_names):
+                column_names.append(grouping_key.column_name)
+    return column_names
+
+# Merges the rows by grouping rules, e.g. the rows whose key columns begin and end with the same words, or the rows
+# with the same values in several exact key columns.
+# The keys of every key column are normalized and indexed in one pass over the table, and the merged rows are added to
+# the same indexes.  All the matching stages (every grouping rule in order, and every words matching pair of a
+# prefix-suffix rule, strictest pair first) then run over the same row IDs, so the table is never rebuilt or re-scanned
+# between decisions.  The exact key columns of a rule are hashed into one block key per row, so an exact rule is a
+# single group-by pass, and the other strategies only compare the rows within the same block.
+class MatchingPairClusterer:
+    # @param column_names The key columns, in the order they are matched.  Columns missing from the header are ignored.
+    # @param reviewer The MergeReviewer deciding whether to merge each group, None to always ask the user.
+    # @param raw_table The rows, as a list or a RowStore.  A RowStore is used (and the merged rows are appended to it) as it is.
+    # @param settled_row_count The number of rows at the beginning of raw_table which were reviewed by a previous run.
+    # Settled rows are still used as primary rows to find similar new rows, but they are never merged into each other again.
+    # @param settled_normalized_keys The normalized keys of the settled rows, where settled_normalized_keys[rowIndex][keyColumnIndex] == normalized key, None to normalize them again.
+    # @param stats The RunStats recording every matching stage, None not to record them.
+    # @param similarity_threshold If not None, every key column also gets a similarity stage after its words matching pairs,
+    # which groups the rows whose keys share at least this fraction (Jaccard similarity) of their word shingles.
+    # @param shingle_words The number of consecutive words in every shingle of the similarity stage.
+    # @param grouping_rules The grouping rules to run in order, instead of the ones made of column_names and similarity_threshold
+    # by get_default_grouping_rules().  Rules with a key column missing from the header are ignored.
+    # @param lookahead_groups If the reviewer is interactive, up to this many next groups (and their previews) are found in
+    # a background thread while the user reviews the current group.  0 to find every group only when it is reviewed.
+    def __init__(self, header: list, raw_table: list, column_names: list, ignore_case: bool = True, words_matching_pairs: list = WORDS_MATCHING_PAIRS, reviewer: MergeReviewer = None, settled_row_count: int = 0, settled_normalized_keys: list = None, stats: rmdutil.RunStats = None, similarity_threshold: float = None, shingle_words: int = 1, grouping_rules: list = None, lookahead_groups: int = 0):
+        self.__header = header
+        self.__stats = stats
+        self.__lookahead_groups = lookahead_groups
+        self.__shingle_words = shingle_words
+        self.__reviewer = (reviewer if (reviewer is not None) else MergeReviewer())
+        self.__words_matching_pairs = words_matching_pairs
+        self.__settled_row_count = settled_row_count
+        
+        if (grouping_rules is None):
+            grouping_rules = get_default_grouping_rules(column_names, similarity_threshold)
+        self.__grouping_rules = [grouping_rule for grouping_rule in grouping_rules if all(grouping_key.column_name in header for grouping_key in grouping_rule)]
+        
+        # row ID -> row, every merged row gets a new row ID
+        self.__rows = (raw_table if isinstance(raw_table, rmdutil.RowStore) else rmdutil.RowStore(raw_table))
+        self.__rows.reserve_columns(len(header))
+        # row ID -> 1 if the row has been merged into another row
+        self.__deleted = bytearray(len(self.__rows))
+        # (merged row ID, the row IDs merged into it) of every merge of the current stage, whose keys are not indexed yet
+        self.__stage_merges = []
+        # the number of keys compared by the current stage, only counted for the stats
+        self.__comparison_count = 0
+        # (stage number, key column indexes, row IDs, merged row ID) of every merge, in the order they are accepted
+        self.merge_history = []
+        # merged row ID -> the original row IDs merged into it, for the merged rows not merged again, see get_merged_row()
+        # The settled rows count as original rows, since the rows merged into them are not kept.
+        self.__source_row_ids = {}
+        # (grouping rule, words matching pair (or None), seconds) of every stage, where the stage number is the index
+        self.stage_times = []
+        # the row IDs of the current table, in table order
+        self.__order = list(range(len(self.__rows)))
+        
+        self.__column_indexes = [header.index(column_name) for column_name in get_grouping_column_names(self.__grouping_rules)]
+        
+        # normalizes the keys of every key column in one pass
+        # key column index -> NormalizedKeyStore of the keys
+        max_words_count = max([max(words_matching_pair) for words_matching_pair in words_matching_pairs], default = 0)
+        self.__key_stores = {}
+        for column_index in self.__column_indexes:
+            self.__key_stores[column_index] = rmdutil.NormalizedKeyStore(ignore_case, KEY_SPLITTER, max_words_count)
+        for (column_index, key_store) in self.__key_stores.items():
+            (codes, pool) = self.__rows.column(column_index)
+            for row_id in range(len(self.__rows)):
+                if (settled_normalized_keys is not None and row_id < settled_row_count):
+                    key_store.add(pool[codes[row_id]], settled_normalized_keys[row_id][self.__column_indexes.index(column_index)])
+                else:
+                    key_store.add(pool[codes[row_id]])
+        
+        # key column index -> KeyIndex of the normalized keys, only for the key columns matched by prefix and suffix
+        # Settled rows are never merged into each other again, so only the new rows (and the merged rows) are indexed as
+        # candidates, and a run over a few new rows doesn't look through all the settled rows for every primary row.
+        self.__key_indexes = {}
+        for grouping_rule in self.__grouping_rules:
+            for grouping_key in grouping_rule:
+                column_index = header.index(grouping_key.column_name)
+                if (grouping_key.strategy == STRATEGY_PREFIX_SUFFIX and column_index not in self.__key_indexes):
+                    key_store = self.__key_stores[column_index]
+                    new_row_ids = range(settled_row_count, len(self.__rows))
+                    self.__key_indexes[column_index] = rmdutil.KeyIndex([key_store.key(row_id) for row_id in new_row_ids], new_row_ids)
+        
+        # key column index -> IpAddressArray of the cells, only for the key columns matched by subnet
+        self.__ip_address_arrays = {}
+        for grouping_rule in self.__grouping_rules:
+            for grouping_key in grouping_rule:
+                column_index = header.index(grouping_key.column_name)
+                if (grouping_key.strategy == STRATEGY_SUBNET and column_index not in self.__ip_address_arrays):
+                    ip_address_array = rmdutil.IpAddressArray()
+                    (codes, pool) = self.__rows.column(column_index)
+                    for row_id in range(len(self.__rows)):
+                        ip_address_array.append(pool[codes[row_id]])
+                    self.__ip_address_arrays[column_index] = ip_address_array
+    
+    # @return the original row IDs of the rows, i.e. with every merged row ID replaced by the row IDs merged into it, see get_merged_row()
+    def __get_source_row_ids(self, row_ids: list) -> list:
+        source_row_ids = []
+        for row_id in row_ids:
+            source_row_ids.extend(self.__source_row_ids.get(row_id, (row_id,)))
+        return source_row_ids
+    
+    # @return the row ID of the merged row
+    # The keys of the merged row are only indexed (and the keys of the rows merged into it only dropped) when the stage
+    # ends, since a stage never compares the rows merged by itself.  So the indexes don't change while the groups of a
+    # stage are being found, maybe in a background thread.
+    def __add_merged_row(self, merged_row: list, similar_row_ids: list) -> int:
+        merged_row_id = len(self.__rows)
+        self.__rows.append(merged_row)
+        self.__deleted.append(0)
+        for row_id in similar_row_ids:
+            self.__deleted[row_id] = 1
+        self.__stage_merges.append((merged_row_id, similar_row_ids))
+        return merged_row_id
+    
+    # Indexes the keys of the rows merged by the current stage.
+    def __index_merged_rows(self):
+        for (merged_row_id, similar_row_ids) in self.__stage_merges:
+            merged_row = self.__rows.row(merged_row_id)
+            for (column_index, key_store) in self.__key_stores.items():
+                key_index = self.__key_indexes.get(column_index)
+                for row_id in similar_row_ids:
+                    if (key_index is not None and row_id >= self.__settled_row_count):
+                        key_index.remove(row_id)
+                    key_store.drop(row_id)
+                key_store.add(merged_row[column_index])
+                if (key_index is not None):
+                    key_index.insert(key_store.key(merged_row_id), merged_row_id)
+            for (column_index, ip_address_array) in self.__ip_address_arrays.items():
+                ip_address_array.append(merged_row[column_index])
+        self.__stage_merges = []
+    
+    # @return row ID -> position in the table when a stage begins, -1 for deleted rows
+    # Rows merged during a stage are not compared again until the next stage.
+    def __rank_rows(self) -> list:
+        row_ranks = [-1] * len(self.__rows)
+        for (rank, row_id) in enumerate(self.__order):
+            row_ranks[row_id] = rank
+        return row_ranks
+    
+    # @param block_keys_of_rule The exact and subnet key columns of a grouping rule
+    # @return row ID -> the tuple of the normalized keys (or subnet keys) of the key columns when a stage begins, None for
+    # deleted rows and the rows with an empty key, or None if there are no such key columns
+    def __get_block_keys(self, block_keys_of_rule: list):
+        if (len(block_keys_of_rule) == 0):
+            return None
+        column_indexes = [self.__header.index(grouping_key.column_name) for grouping_key in block_keys_of_rule]
+        column_codes = [self.__rows.column(column_index)[0] for column_index in column_indexes]
+        # (key store, IP address array and mask lengths for a subnet key column) of every key column
+        key_sources = []
+        for (grouping_key, column_index) in zip(block_keys_of_rule, column_indexes):
+            if (grouping_key.strategy == STRATEGY_SUBNET):
+                key_sources.append((self.__key_stores[column_index], self.__ip_address_arrays[column_index], grouping_key.ipv4_masklen, grouping_key.ipv6_masklen))
+            else:
+                key_sources.append((self.__key_stores[column_index], None, 0, 0))
+        block_keys = [None] * len(self.__rows)
+        for row_id in self.__order:
             # we should not merge 2 rows when both of their key columns are empty...
-            return False
+            if (any(codes[row_id] == rmdutil.EMPTY_CODE for codes in column_codes)):
+                continue
+            block_key = []
+            for (key_store, ip_address_array, ipv4_masklen, ipv6_masklen) in key_sources:
+                subnet_key = None
+                if (ip_address_array is not None):
+                    subnet_key = ip_address_array.subnet_key(row_id, ipv4_masklen, ipv6_masklen)
+                # a cell which is not an IP address (e.g. a host name, or the hosts of a merged row) is matched exactly
+                block_key.append(key_store.key(row_id) if (subnet_key is None) else subnet_key)
+            block_keys[row_id] = tuple(block_key)
+        return block_keys
+    
+    # @return the row IDs of a group, the primary row first, followed by the similar rows in table order
+    @staticmethod
+    def __sort_group(primary_row_id: int, similar_row_ids: list, row_ranks: list) -> list:
+        similar_row_ids.sort(key = row_ranks.__getitem__)
+        similar_row_ids.insert(0, primary_row_id)
+        return similar_row_ids
+    
+    # Prepares every group and its preview, see MergeReviewer.prepare().  It runs in a background thread.
+    def __iter_prepared_groups(self, groups, row_ranks: list):
+        rows = self.__rows
+        for (primary_row_id, similar_row_ids) in groups:
+            group_row_ids = MatchingPairClusterer.__sort_group(primary_row_id, similar_row_ids, row_ranks)
+            yield (group_row_ids, self.__reviewer.prepare(self.__header, [rows[row_id] for row_id in group_row_ids], [rows[row_id] for row_id in self.__get_source_row_ids(group_row_ids)]))
+    
+    # Asks the reviewer to merge every group of a stage in turn, and merges the groups accepted.
+    # @param groups The iterator of (primary row ID, similar row IDs after it) found by the stage
+    def __review_groups(self, groups, key_column_indexes: list, row_ranks: list):
+        deleted = self.__deleted
+        self.__comparison_count = 0
+        
+        if (self.__lookahead_groups > 0 and self.__reviewer.is_interactive()):
+            # the next groups are found while the user reviews the current group
+            prepared_groups = rmdutil.iter_in_background(self.__iter_prepared_groups(groups, row_ranks), self.__lookahead_groups)
+        else:
+            # every group is found only after the previous group is decided
+            prepared_groups = ((MatchingPairClusterer.__sort_group(primary_row_id, similar_row_ids, row_ranks), None) for (primary_row_id, similar_row_ids) in groups)
+        
+        merged_row_ids = []
+        for (group_row_ids, preview) in prepared_groups:
+            # a group found in advance may have lost rows to the groups merged after it was found
+            if (deleted[group_row_ids[0]]):
+                continue
+            alive_row_ids = [row_id for row_id in group_row_ids if not deleted[row_id]]
+            if (len(alive_row_ids) < 2):
+                continue
+            if (len(alive_row_ids) < len(group_row_ids)):
+                # the preview no longer shows the rows to be merged
+                (group_row_ids, preview) = (alive_row_ids, None)
+            
+            if (self.__stats is not None):
+                self.__stats.add_group(len(group_row_ids))
+            
+            source_row_ids = self.__get_source_row_ids(group_row_ids)
+            merged_row = self.__reviewer.review(self.__header, [self.__rows[row_id] for row_id in group_row_ids], key_column_indexes, preview, [self.__rows[row_id] for row_id in source_row_ids])
+            if (merged_row is not None):
+                merged_row_id = self.__add_merged_row(merged_row, group_row_ids)
+                # a merged row is never merged again once it is merged into another row, so only the newest one keeps its source rows
+                for row_id in group_row_ids:
+                    self.__source_row_ids.pop(row_id, None)
+                self.__source_row_ids[merged_row_id] = source_row_ids
+                merged_row_ids.append(merged_row_id)
+                self.merge_history.append((len(self.stage_times), key_column_indexes, group_row_ids, merged_row_id))
+        
+        self.__end_stage(merged_row_ids)
+    
+    def __end_stage(self, merged_row_ids: list):
+        self.__index_merged_rows()
+        
+        # the merged rows come first, followed by the remaining rows
+        self.__order = merged_row_ids + [row_id for row_id in self.__order if not self.__deleted[row_id]]
+        
+        if (self.__stats is not None):
+            self.__stats.add_comparisons(self.__comparison_count)
+    
+    # Finds the groups of rows with the same keys in all the exact key columns, and asks the user to merge them.
+    # The rows are hashed into blocks in one pass, and every row is only compared with the rows after it in its block.
+    def __run_exact_stage(self, block_keys_of_rule: list):
+        key_column_indexes = [self.__header.index(grouping_key.column_name) for grouping_key in block_keys_of_rule]
+        row_ranks = self.__rank_rows()
+        self.__review_groups(self.__iter_exact_groups(block_keys_of_rule, row_ranks), key_column_indexes, row_ranks)
+    
+    # @return the iterator of (primary row ID, similar row IDs) of the exact stage
+    def __iter_exact_groups(self, block_keys_of_rule: list, row_ranks: list):
+        deleted = self.__deleted
+        block_keys = self.__get_block_keys(block_keys_of_rule)
+        
+        # block key -> (the ranks, the row IDs) of the rows of the block which can be candidates, i.e. not settled, in table order
+        blocks = {}
+        for row_id in self.__order:
+            block_key = block_keys[row_id]
+            if (block_key is None or row_id < self.__settled_row_count):
+                continue
+            block = blocks.get(block_key)
+            if (block is None):
+                block = ([], [])
+                blocks[block_key] = block
+            block[0].append(row_ranks[row_id])
+            block[1].append(row_id)
+        
+        # the number of rows compared in this stage, only counted for the stats
+        comparison_count = 0
         
-        if (ignore_case):
-            # convert key value to lowercase for compare without case
-            primary_key_str = primary_key_str.lower()
-            row_key_str = row_key_str.lower()
+        for primary_row_id in self.__order:
+            if (deleted[primary_row_id] or block_keys[primary_row_id] is None):
+                continue
+            block = blocks.get(block_keys[primary_row_id])
+            if (block is None):
+                continue
+            (block_ranks, block_row_ids) = block
+            
+            # collects the rows after the primary row in the same block
+            similar_row_ids = []
+            for i in range(bisect.bisect_right(block_ranks, row_ranks[primary_row_id]), len(block_row_ids)):
+                row_id = block_row_ids[i]
+                comparison_count += 1
+                if (not deleted[row_id]):
+                    similar_row_ids.append(row_id)
+            
+            if (len(similar_row_ids) == 0):
+                continue
+            
+            yield (primary_row_id, similar_row_ids)
+        
+        self.__comparison_count = comparison_count
+    
+    # Finds the groups of similar rows for one words matching pair of one key column, and asks the user to merge them.
+    # @param block_keys_of_rule The exact and subnet key columns of the grouping rule, only rows with the same keys in them are grouped.
+    def __run_stage(self, column_index: int, words_matching_pair: tuple, block_keys_of_rule: list = []):
+        key_column_indexes = [column_index] + [self.__header.index(grouping_key.column_name) for grouping_key in block_keys_of_rule]
+        row_ranks = self.__rank_rows()
+        self.__review_groups(self.__iter_stage_groups(column_index, words_matching_pair, block_keys_of_rule, row_ranks), key_column_indexes, row_ranks)
+    
+    # @return the iterator of (primary row ID, similar row IDs) of the stage of a words matching pair
+    def __iter_stage_groups(self, column_index: int, words_matching_pair: tuple, block_keys_of_rule: list, row_ranks: list):
+        codes = self.__rows.column(column_index)[0]
+        deleted = self.__deleted
+        key_store = self.__key_stores[column_index]
+        key_index = self.__key_indexes[column_index]
         
-        KEY_SPLITTER = " "
-        # key words
-        primary_key_words = primary_key_str.split(KEY_SPLITTER)
-        primary_key_words_count = len(primary_key_words)
+        stage_row_count = len(row_ranks)
+        block_keys = self.__get_block_keys(block_keys_of_rule)
+        primary_block_key = None
         
-        # beginning words matching count
-        beginning_words_matching_count = words_matching_pair[0]
-        # cap it to the length of primary key words
-        if (beginning_words_matching_count > primary_key_words_count):
-            beginning_words_matching_count = primary_key_words_count
+        # the number of keys compared in this stage, only counted for the stats
+        comparison_count = 0
         
-        # ending words matching count
-        ending_words_matching_count = words_matching_pair[1]
-        # cap it to the length of primary key words
-        if (ending_words_matching_count > primary_key_words_count):
-            ending_words_matching_count = primary_key_words_count
+        for primary_row_id in self.__order:
+            if (deleted[primary_row_id]):
+                # this row was merged into a previous primary row
+                continue
+            
+            if (codes[primary_row_id] == rmdutil.EMPTY_CODE):
+                # we should not merge 2 rows when both of their key columns are empty...
+                continue
+            if (block_keys is not None):
+                primary_block_key = block_keys[primary_row_id]
+                if (primary_block_key is None):
+                    continue
+            (begin_str, end_str) = key_store.affixes(primary_row_id, words_matching_pair)
+            
+            # collects the rows after the primary row that are similar to the primary row
+            primary_rank = row_ranks[primary_row_id]
+            similar_row_ids = []
+            # every candidate looked up is counted, including the ones thrown away without comparing their keys
+            candidate_row_ids = key_index.lookup(begin_str, end_str)
+            comparison_count += len(candidate_row_ids)
+            for row_id in candidate_row_ids:
+                if (row_id >= stage_row_count or row_ranks[row_id] <= primary_rank or deleted[row_id]):
+                    continue
+                if (block_keys is not None and block_keys[row_id] != primary_block_key):
+                    continue
+                row_key_str = key_store.key(row_id)
+                if (row_key_str.startswith(begin_str) and row_key_str.endswith(end_str)):
+                    similar_row_ids.append(row_id)
+            
+            if (len(similar_row_ids) == 0):
+                # this row is very unique: only this row itself is similar to itself
+                # no need to ask the user for merging permission then
+                continue
+            
+            yield (primary_row_id, similar_row_ids)
         
-        # get the beginning and ending of the primary key string to be matched with the row key string
-        begin_str = KEY_SPLITTER.join(primary_key_words[0 : beginning_words_matching_count])
-        end_str = KEY_SPLITTER.join(primary_key_words[primary_key_words_count - ending_words_matching_count : primary_key_words_count])
+        self.__comparison_count = comparison_count
+    
+    # Finds the groups of rows whose keys share at least similarity_threshold of their word shingles, and asks the user to merge them.
+    # The candidates of every primary row come from a MinHashIndex, so the keys are not compared pair by pair.
+    # @param block_keys_of_rule The exact and subnet key columns of the grouping rule, only rows with the same keys in them are grouped.
+    def __run_similarity_stage(self, column_index: int, similarity_threshold: float, block_keys_of_rule: list = []):
+        key_column_indexes = [column_index] + [self.__header.index(grouping_key.column_name) for grouping_key in block_keys_of_rule]
+        row_ranks = self.__rank_rows()
+        self.__review_groups(self.__iter_similarity_groups(column_index, similarity_threshold, block_keys_of_rule, row_ranks), key_column_indexes, row_ranks)
+    
+    # @return the iterator of (primary row ID, similar row IDs) of the similarity stage
+    def __iter_similarity_groups(self, column_index: int, similarity_threshold: float, block_keys_of_rule: list, row_ranks: list):
+        codes = self.__rows.column(column_index)[0]
+        deleted = self.__deleted
+        key_store = self.__key_stores[column_index]
+        
+        block_keys = self.__get_block_keys(block_keys_of_rule)
+        primary_block_key = None
+        
+        # settled rows are never merged into each other again, so only the new rows can be candidates
+        min_hash_index = rmdutil.MinHashIndex(similarity_threshold)
+        for row_id in self.__order:
+            if (row_id >= self.__settled_row_count):
+                min_hash_index.insert(key_store.shingles(row_id, self.__shingle_words), row_id)
+        
+        # the number of keys compared in this stage, only counted for the stats
+        comparison_count = 0
+        
+        for primary_row_id in self.__order:
+            if (deleted[primary_row_id]):
+                # this row was merged into a previous primary row
+                continue
+            
+            if (codes[primary_row_id] == rmdutil.EMPTY_CODE):
+                # we should not merge 2 rows when both of their key columns are empty...
+                continue
+            if (block_keys is not None):
+                primary_block_key = block_keys[primary_row_id]
+                if (primary_block_key is None):
+                    continue
+            primary_shingles = key_store.shingles(primary_row_id, self.__shingle_words)
+            
+            # collects the rows after the primary row that are similar to the primary row
+            primary_rank = row_ranks[primary_row_id]
+            similar_row_ids = []
+            for (shingles, row_ids) in min_hash_index.lookup(primary_shingles):
+                # rows with the same key share the same shingles, so they are compared only once
+                comparison_count += 1
+                if (rmdutil.get_jaccard_similarity(primary_shingles, shingles) < similarity_threshold):
+                    continue
+                for row_id in row_ids:
+                    if (row_ranks[row_id] > primary_rank and not deleted[row_id] and (block_keys is None or block_keys[row_id] == primary_block_key)):
+                        similar_row_ids.append(row_id)
+            
+            if (len(similar_row_ids) == 0):
+                # no other row is similar enough
+                continue
+            
+            yield (primary_row_id, similar_row_ids)
         
-        return row_key_str.startswith(begin_str) and row_key_str.endswith(end_str)
+        self.__comparison_count = comparison_count
+    
+    # Runs a stage and records how long it takes.
+    # @param rule_str The grouping rule, see format_grouping_rule()
+    # @param stage The words matching pair of the stage, or None if the rule has only one stage.
+    def __run_timed(self, rule_str: str, stage, run_stage_function, *args):
+        stage_begin_time = time.perf_counter()
+        if (self.__stats is not None):
+            self.__stats.begin_stage(rule_str if (stage is None) else (rule_str + " " + str(stage)))
+        run_stage_function(*args)
+        self.stage_times.append((rule_str, stage, time.perf_counter() - stage_begin_time))
+    
+    # Runs all the matching stages.
+    # @return the result table
+    def run(self) -> list:
+        for grouping_rule in self.__grouping_rules:
+            rule_str = format_grouping_rule(grouping_rule)
+            block_keys_of_rule = [grouping_key for grouping_key in grouping_rule if grouping_key.strategy in BLOCK_STRATEGIES]
+            matching_keys = [grouping_key for grouping_key in grouping_rule if grouping_key.strategy not in BLOCK_STRATEGIES]
+            if (len(matching_keys) == 0):
+                self.__run_timed(rule_str, None, self.__run_exact_stage, block_keys_of_rule)
+                continue
+            
+            matching_key = matching_keys[0]
+            column_index = self.__header.index(matching_key.column_name)
+            if (matching_key.strategy == STRATEGY_PREFIX_SUFFIX):
+                for words_matching_pair in self.__words_matching_pairs:
+                    self.__run_timed(rule_str, words_matching_pair, self.__run_stage, column_index, words_matching_pair, block_keys_of_rule)
+            else:
+                # the similarity stage catches what the words matching pairs have missed, e.g. keys differing in the middle
+                self.__run_timed(rule_str, None, self.__run_similarity_stage, column_index, matching_key.similarity_threshold, block_keys_of_rule)
+        if (self.__stats is not None):
+            self.__stats.end_stage()
+        return [self.__rows[row_id] for row_id in self.__order]
     
-    return merge_by_column_with_comparator(header, raw_table, column_name, matching_pair_comparator)
+    # @return the row of a row ID, including the rows merged into other rows
+    def get_row(self, row_id: int) -> list:
+        return self.__rows[row_id]
+    
+    # @return the normalized keys of the result table, where normalized_keys[rowIndex][keyColumnIndex] == normalized key
+    def get_result_normalized_keys(self) -> list:
+        return [[self.__key_stores[column_index].key(row_id) for column_index in self.__column_indexes] for row_id in self.__order]
 
-def merge_by_column(header: list, raw_table: list, column_name: str, ignore_case: bool = True) -> list:
-    try:
-        column_index = header.index(column_name)
-    except ValueError:
-        return raw_table
+def merge_by_column_with_matching_pair(header: list, raw_table: list, column_name: str, ignore_case: bool, words_matching_pair: tuple) -> list:
+    return MatchingPairClusterer(header, raw_table, [column_name], ignore_case, [words_matching_pair]).run()
+
+# @param similarity_threshold See MatchingPairClusterer
+def merge_by_column(header: list, raw_table: list, column_name: str, ignore_case: bool = True, similarity_threshold: float = None) -> list:
+    return MatchingPairClusterer(header, raw_table, [column_name], ignore_case, similarity_threshold = similarity_threshold).run()
+
+# Only merges the rows whose keys share at least similarity_threshold of their word shingles, see MatchingPairClusterer
+def merge_by_column_with_similarity(header: list, raw_table: list, column_name: str, ignore_case: bool, similarity_threshold: float, shingle_words: int = 1) -> list:
+    return MatchingPairClusterer(header, raw_table, [column_name], ignore_case, shingle_words = shingle_words, grouping_rules = [[GroupingKey(column_name, STRATEGY_FUZZY, similarity_threshold)]]).run()
+
+# Merges the rows by grouping rules, see MatchingPairClusterer
+def merge_by_grouping_rules(header: list, raw_table: list, grouping_rules: list, ignore_case: bool = True) -> list:
+    return MatchingPairClusterer(header, raw_table, [], ignore_case, grouping_rules = grouping_rules).run()
+
+# the number of bytes of a row digest, 128-bit digests practically never collide
+ROW_DIGEST_SIZE = 16
+
+def get_row_digest(row: list) -> bytes:
+    return hashlib.blake2b(repr(row).encode(ENCODING, "surrogatepass"), digest_size = ROW_DIGEST_SIZE).digest()
+
+# @return an iterator of (digest, row) for every row
+def iter_digested_rows(rows):
+    for row in rows:
+        yield (get_row_digest(row), row)
+
+# the number of bytes read at a time when looking for record boundaries
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+# Finds the byte offsets that split a CSV file into shards which can be parsed on their own.
+# A newline only ends a record if it is not inside a quoted field, i.e. if an even number of quotes precede it.
+# This holds for files where quotes only enclose fields or are doubled inside quoted fields, as Nessus and the csv module write them.
+# @return the offsets [header end, shard boundaries..., file size], the shards are offsets[i] to offsets[i + 1]
+def find_csv_shard_offsets(src_csv_path: str, shard_count: int) -> list:
+    file_size = os.path.getsize(src_csv_path)
     
-    # the number of words to be matched at the begin and end of both keys
-    words_matching_pairs = [(3, 3), (3, 2), (2, 3), (2, 2), (3, 1), (1, 3), (3, 0), (0, 3), (2, 1), (1, 2), (2, 0), (0, 2), (1, 0), (0, 1)]
+    # the first boundary ends the header, the others are the first boundaries after evenly spaced targets
+    targets = [0] + [file_size * i // shard_count for i in range(1, shard_count)]
+    target_index = 0
+    offsets = []
     
-    for words_matching_pair in words_matching_pairs:
-        raw_table = merge_by_column_with_matching_pair(header, raw_table, column_name, ignore_case, words_matching_pair)
+    # the number of quotes before the current block
+    quote_count = 0
+    block_offset = 0
+    with open(src_csv_path, "rb") as src_csv_file:
+        while (target_index < len(targets)):
+            block = src_csv_file.read(SCAN_BLOCK_SIZE)
+            if (len(block) == 0):
+                break
+            
+            # quotes are only counted once, up to the newline being checked
+            counted_index = 0
+            counted_quote_count = quote_count
+            search_begin = 0
+            while (target_index < len(targets)):
+                search_begin = max(search_begin, targets[target_index] - block_offset)
+                newline_index = block.find(b"\n", search_begin)
+                if (newline_index == -1):
+                    break
+                counted_quote_count += block.count(b"\"", counted_index, newline_index)
+                counted_index = newline_index
+                if (counted_quote_count % 2 == 0):
+                    offsets.append(block_offset + newline_index + 1)
+                    target_index += 1
+                search_begin = newline_index + 1
+            
+            quote_count += block.count(b"\"")
+            block_offset += len(block)
+    
+    if (len(offsets) == 0 or offsets[-1] < file_size):
+        offsets.append(file_size)
+    return offsets
+
+# Removes the complete duplicates from the rows parsed by a worker process, like iter_unique_rows(), and counts the rows.
+# @return (the number of rows, a list of (digest, row) for the first occurrence of every row)
+def collect_unique_rows(digested_rows) -> tuple:
+    row_count = 0
+    seen_digests = set()
+    unique_digested_rows = []
+    for (digest, row) in digested_rows:
+        row_count += 1
+        if (digest not in seen_digests):
+            seen_digests.add(digest)
+            unique_digested_rows.append((digest, row))
+    return (row_count, unique_digested_rows)
+
+# Adds the number of rows parsed by a worker process to stats.rows_in once its unique rows are read, see collect_unique_rows().
+# @return an iterator of the digested rows
+def iter_precounted_rows(digested_rows: list, row_count: int, stats: rmdutil.RunStats = None):
+    if (stats is not None):
+        stats.rows_in += row_count
+    yield from digested_rows
+
+# Parses a shard of a CSV file, and removes the complete duplicates within the shard.
+# @return (the number of rows in the shard, a list of (digest, row) for the first occurrence of every row in the shard)
+def parse_csv_shard(src_csv_path: str, begin_offset: int, end_offset: int) -> tuple:
+    with open(src_csv_path, "rb") as src_csv_file:
+        src_csv_file.seek(begin_offset)
+        shard_bytes = src_csv_file.read(end_offset - begin_offset)
     
-    return raw_table
+    # decodes the shard the same way as opening the whole file in text mode
+    shard_file = io.TextIOWrapper(io.BytesIO(shard_bytes), encoding = ENCODING)
+    return collect_unique_rows(iter_digested_rows(csv.reader(shard_file)))
+
+# the number of shards per worker process, so that a slow shard doesn't hold back the others
+SHARDS_PER_JOB = 4
+
+# Parses the rows after the header of a CSV file in jobs worker processes.
+# @param stats See read_src_table()
+# @return an iterator of (digest, row) for every row unique within its shard, in the original order
+def iter_digested_csv_rows_in_parallel(src_csv_path: str, jobs: int, stats: rmdutil.RunStats = None):
+    import concurrent.futures
+    shard_offsets = find_csv_shard_offsets(src_csv_path, jobs * SHARDS_PER_JOB)
+    shard_count = len(shard_offsets) - 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        for (row_count, digested_rows) in executor.map(parse_csv_shard, [src_csv_path] * shard_count, shard_offsets[0 : shard_count], shard_offsets[1 : shard_count + 1]):
+            yield from iter_precounted_rows(digested_rows, row_count, stats)
 
-def rm_dup(src_csv_path: str, dest_csv_path: str):
-    ENCODING = "utf-8"
+# Removes the complete duplicates from the rows, keeping the first occurrence of every row, in order.
+# Only the digests of the rows are kept in memory, and every unique row is yielded as soon as it is known to be unique.
+# @param digested_rows The iterator of (digest, row) for every row, see iter_digested_rows()
+# @param partition_count If larger than 1, the rows are hash-partitioned into temporary files first, so that only the
+# digests of one partition are kept in memory at a time.  The unique rows are only yielded after all rows are read then.
+# @param temp_dir_path The directory to hold the temporary files, or None for the default temporary directory.
+# @param yield_digests True to yield (digest, row) instead of row.
+def iter_unique_rows(digested_rows, partition_count: int = 1, temp_dir_path: str = None, yield_digests: bool = False):
+    if (partition_count <= 1):
+        seen_digests = set()
+        for (digest, row) in digested_rows:
+            if (digest not in seen_digests):
+                seen_digests.add(digest)
+                yield ((digest, row) if yield_digests else row)
+        return
     
-    # opens a temporary destination file
-    with tempfile.NamedTemporaryFile(mode='w+t', encoding=ENCODING, newline='', delete=False) as temp_file:
-        # creates a CSV writer
-        csv_writer = csv.writer(temp_file)
+    import tempfile
+    import heapq
+    with tempfile.TemporaryDirectory(dir = temp_dir_path) as temp_dir:
+        # every record in a temporary file is [sequence number, digest, *row]
+        partition_paths = [os.path.join(temp_dir, "partition_" + str(i) + ".csv") for i in range(partition_count)]
+        run_paths = [os.path.join(temp_dir, "run_" + str(i) + ".csv") for i in range(partition_count)]
+        
+        # splits the rows into partitions by their digests
+        # all the copies of a row end up in the same partition, in their original order
+        partition_files = [open(partition_path, "w", encoding = ENCODING, newline = "") for partition_path in partition_paths]
+        try:
+            partition_writers = [csv.writer(partition_file) for partition_file in partition_files]
+            for (sequence_number, (digest, row)) in enumerate(digested_rows):
+                partition_index = int.from_bytes(digest[0 : 8], "little") % partition_count
+                partition_writers[partition_index].writerow([sequence_number, digest.hex()] + row)
+        finally:
+            for partition_file in partition_files:
+                partition_file.close()
+        
+        # removes the duplicates of every partition on its own
+        for i in range(partition_count):
+            seen_digests = set()
+            with open(partition_paths[i], "r", encoding = ENCODING, newline = "") as partition_file:
+                with open(run_paths[i], "w", encoding = ENCODING, newline = "") as run_file:
+                    run_writer = csv.writer(run_file)
+                    for record in csv.reader(partition_file):
+                        if (record[1] not in seen_digests):
+                            seen_digests.add(record[1])
+                            run_writer.writerow(record)
+            os.remove(partition_paths[i])
+        
+        # merges the partitions back into the original order
+        run_files = [open(run_path, "r", encoding = ENCODING, newline = "") for run_path in run_paths]
+        try:
+            run_readers = [csv.reader(run_file) for run_file in run_files]
+            for record in heapq.merge(*run_readers, key = lambda record: int(record[0])):
+                row = record[2 : len(record)]
+                yield ((bytes.fromhex(record[1]), row) if yield_digests else row)
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+# the columns of a CSV file exported by Nessus, which the rows of a .nessus file are mapped onto
+NESSUS_CSV_HEADER = ["Plugin ID", "CVE", "CVSS v2.0 Base Score", "Risk", "Host", "Protocol", "Port", "Name", "Synopsis", "Description", "Solution", "See Also", "Plugin Output"]
+
+def is_nessus_path(src_path: str) -> bool:
+    return get_uncompressed_path(src_path).lower().endswith(".nessus")
+
+# the extension of the compressed files, which are read and written through gzip
+GZIP_EXTENSION = ".gz"
+
+def is_gzip_path(path: str) -> bool:
+    return path.lower().endswith(GZIP_EXTENSION)
+
+# @return the path without the .gz extension, e.g. "scan.csv" for "scan.csv.gz"
+def get_uncompressed_path(path: str) -> str:
+    if (is_gzip_path(path)):
+        return path[0 : len(path) - len(GZIP_EXTENSION)]
+    return path
+
+# Opens a source file, decompressing a .gz file on the fly.
+# @param mode "r" for text, or "rb" for bytes
+def open_src_file(src_path: str, mode: str = "r"):
+    if (not is_gzip_path(src_path)):
+        return (open(src_path, "rb") if (mode == "rb") else open(src_path, "r", encoding = ENCODING))
+    import gzip
+    return (gzip.open(src_path, "rb") if (mode == "rb") else gzip.open(src_path, "rt", encoding = ENCODING))
+
+# Opens a destination file for writing text, compressed if it ends with .gz.
+# The text is streamed to a temporary file in the same directory, which replaces the destination file (atomically, by
+# os.replace()) only once it is completely written.  So the destination file is never left half written, and nothing
+# is copied across file systems afterwards.  The temporary file is removed if the writing fails.
+@contextlib.contextmanager
+def open_dest_file(dest_path: str, newline: str = ""):
+    import tempfile
+    dest_path = os.path.abspath(dest_path)
+    (temp_fd, temp_path) = tempfile.mkstemp(prefix = "." + os.path.basename(dest_path) + ".", suffix = ".tmp", dir = os.path.dirname(dest_path))
+    try:
+        with open(temp_fd, "wb") as temp_file:
+            binary_file = temp_file
+            if (is_gzip_path(dest_path)):
+                import gzip
+                binary_file = gzip.GzipFile(os.path.basename(get_uncompressed_path(dest_path)), "wb", fileobj = temp_file)
+            with io.TextIOWrapper(binary_file, encoding = ENCODING, newline = newline) as text_file:
+                yield text_file
         
-        # parses the source CSV file
-        with open(src_csv_path, 'r', encoding=ENCODING) as src_csv_file:
-            # creates a CSV reader
-            csv_reader = csv.reader(src_csv_file)
+        # mkstemp() only lets the owner read the temporary file, so it gets the permissions the destination file has (or would have)
+        if (os.path.exists(dest_path)):
+            import shutil
+            shutil.copymode(dest_path, temp_path)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+# Streams the findings of a .nessus (XML) file as rows of NESSUS_CSV_HEADER, one row per CVE like the Nessus CSV export.
+# Every ReportItem is cleared once its rows are built, and every ReportHost once all its items are read,
+# so the memory usage doesn't grow with the file size.
+def iter_nessus_rows(src_nessus_path: str):
+    with open_src_file(src_nessus_path, "rb") as src_nessus_file:
+        yield from iter_nessus_file_rows(src_nessus_file)
+
+# @param src_nessus_file The .nessus file opened in binary mode
+def iter_nessus_file_rows(src_nessus_file):
+    import xml.etree.ElementTree as ET
+    report_elem = None
+    host_name = ""
+    for (event, elem) in ET.iterparse(src_nessus_file, events = ("start", "end")):
+        if (event == "start"):
+            if (elem.tag == "Report"):
+                report_elem = elem
+            elif (elem.tag == "ReportHost"):
+                host_name = elem.get("name", "")
+            continue
+        
+        if (elem.tag == "ReportItem"):
+            def get_text(tag: str) -> str:
+                return elem.findtext(tag, "")
             
-            # reads the header
-            header = next(csv_reader)
+            name = elem.get("pluginName", "")
+            if (name == ""):
+                name = get_text("plugin_name")
+            cves = [cve_elem.text for cve_elem in elem.iter("cve") if cve_elem.text]
+            if (len(cves) == 0):
+                cves = [""]
+            for cve in cves:
+                yield [
+                    elem.get("pluginID", ""),
+                    cve,
+                    get_text("cvss_base_score"),
+                    get_text("risk_factor"),
+                    host_name,
+                    elem.get("protocol", ""),
+                    elem.get("port", ""),
+                    name,
+                    get_text("synopsis"),
+                    get_text("description"),
+                    get_text("solution"),
+                    get_text("see_also"),
+                    get_text("plugin_output"),
+                ]
+            elem.clear()
+        elif (elem.tag == "ReportHost"):
+            elem.clear()
+            if (report_elem is not None):
+                report_elem.remove(elem)
+
+def iter_csv_rows(src_csv_path: str):
+    with open_src_file(src_csv_path) as src_csv_file:
+        yield from csv.reader(src_csv_file)
+
+# Parses a source CSV (or .nessus) file.
+# @param jobs The number of worker processes to parse a source CSV file.
+# @param stats The RunStats counting the rows read into rows_in (including the duplicates removed by the worker processes), None not to count them.
+# @return (header, digested_rows), where digested_rows is an iterator of (digest, row) for the rows after the header.
+# With more than 1 job, the complete duplicates within every shard are already removed.
+def read_src_table(src_path: str, jobs: int = 1, stats: rmdutil.RunStats = None) -> tuple:
+    if (is_nessus_path(src_path)):
+        header = NESSUS_CSV_HEADER
+        digested_rows = iter_digested_rows(iter_nessus_rows(src_path))
+    else:
+        rows = iter_csv_rows(src_path)
+        
+        # reads the header
+        header = next(rows)
+        
+        if (jobs > 1 and not is_gzip_path(src_path)):
+            # parses the rows in worker processes (a compressed file cannot be split, so it is always parsed in one process), which also remove the complete duplicates within their shards, and count them
+            rows.close()
+            return (header, iter_digested_csv_rows_in_parallel(src_path, jobs, stats))
+        digested_rows = iter_digested_rows(rows)
+    
+    if (stats is not None):
+        digested_rows = iter_counted_rows(digested_rows, stats)
+    return (header, digested_rows)
+
+# Parses a source file, and removes the complete duplicates within the file, see read_src_tables().
+# @return (header, the number of rows in the file, a list of (digest, row) for the first occurrence of every row in the file)
+def parse_src_file(src_path: str) -> tuple:
+    (header, digested_rows) = read_src_table(src_path)
+    return (header, *collect_unique_rows(digested_rows))
+
+# Parses every source file, one file per worker process with more than 1 job.
+# @param stats See read_src_table()
+# @return an iterator of (src_path, header, digested_rows) for every source file, in order
+def iter_src_tables(src_paths: list, jobs: int = 1, stats: rmdutil.RunStats = None):
+    import concurrent.futures
+    if (jobs <= 1 or len(src_paths) <= 1):
+        for src_path in src_paths:
+            yield (src_path, *read_src_table(src_path, jobs, stats))
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        for (src_path, (header, row_count, digested_rows)) in zip(src_paths, executor.map(parse_src_file, src_paths)):
+            yield (src_path, header, iter_precounted_rows(digested_rows, row_count, stats))
+
+# Parses several source files as one table, in the order of the files.
+# The files whose header is not the same as the header of the first file are skipped.
+# @param jobs The number of worker processes to parse the source files.
+# @param stats See read_src_table().  The rows of the files skipped are not counted.
+# @return (header, digested_rows), see read_src_table()
+# With more than 1 job, the complete duplicates within every file are already removed.
+def read_src_tables(src_paths: list, jobs: int = 1, stats: rmdutil.RunStats = None) -> tuple:
+    src_tables = iter_src_tables(src_paths, jobs, stats)
+    (first_src_path, header, first_digested_rows) = next(src_tables)
+    
+    def iter_all_digested_rows():
+        yield from first_digested_rows
+        for (src_path, src_header, digested_rows) in src_tables:
+            if (src_header != header):
+                print("Warning: \"" + src_path + "\" is skipped, its header is not the same as the header of \"" + first_src_path + "\".")
+                continue
+            yield from digested_rows
+    return (header, iter_all_digested_rows())
+
+# Counts the rows read from the source file into stats.rows_in.
+def iter_counted_rows(digested_rows, stats: rmdutil.RunStats):
+    for digested_row in digested_rows:
+        stats.rows_in += 1
+        yield digested_row
+
+# the key columns that similar rows are merged by, in order
+KEY_COLUMN_NAMES = ["Name", "Solution"]
+
+# @param src_path The source path, or a list of source paths read as one table
+# @return the number of partitions so that each one fits in the memory budget, see iter_unique_rows()
+def get_partition_count(src_path, memory_budget_mb: int = None) -> int:
+    if (memory_budget_mb is None):
+        return 1
+    src_paths = ([src_path] if isinstance(src_path, str) else src_path)
+    return math.ceil(sum(os.path.getsize(path) for path in src_paths) / (memory_budget_mb * 1024 * 1024))
+
+# @return the path of the incremental index kept next to the destination CSV file
+def get_incremental_index_path(dest_csv_path: str) -> str:
+    return dest_csv_path + ".rmdidx.sqlite3"
+
+# @param src_csv_path The source CSV (or .nessus) file, or a list of them deduplicated together into one destination CSV file, see read_src_tables()
+# @param memory_budget_mb If the source CSV file is larger than this many MB, the complete duplicates are removed on disk.  None for no limit.
+# @param exact_only True to only remove the complete duplicates, and stream them to the destination CSV file.
+# @param jobs The number of worker processes to parse the source CSV file and remove the complete duplicates.
+# @param decisions_path The file keeping the merge decisions, None to always ask the user.
+# @param batch True to never ask the user, only the merges decided before are applied.
+# @param incremental True to only process the source rows not seen by the previous runs with the same destination CSV file.
+# The rows kept in the incremental index come first, and the new rows are only merged into them or each other.
+# @param preview_max_rows See review_merge()
+# @param preview_page_rows See review_merge()
+# @param stats The RunStats recording every stage of the run, None not to record them.
+# @param similarity_threshold See MatchingPairClusterer
+# @param grouping_rules The grouping rules to merge the similar rows by, None to merge them by KEY_COLUMN_NAMES, see MatchingPairClusterer
+# @param column_aggregators The dict of column name -> aggregator function of the merged rows, see parse_column_aggregators(), None to aggregate every column by "union".
+# @param lookahead_groups See MatchingPairClusterer
+def rm_dup(src_csv_path, dest_csv_path: str, memory_budget_mb: int = None, exact_only: bool = False, jobs: int = 1, decisions_path: str = None, batch: bool = False, incremental: bool = False, preview_max_rows: int = None, preview_page_rows: int = None, stats: rmdutil.RunStats = None, similarity_threshold: float = None, grouping_rules: list = None, column_aggregators: dict = None, lookahead_groups: int = 0):
+    partition_count = get_partition_count(src_csv_path, memory_budget_mb)
+    
+    explicit_grouping_rules = (grouping_rules is not None)
+    if (grouping_rules is None):
+        # merges by "Name" first, then by "Solution"
+        grouping_rules = get_default_grouping_rules(KEY_COLUMN_NAMES, similarity_threshold)
+    key_column_names = get_grouping_column_names(grouping_rules)
+    
+    incremental_index = None
+    if (incremental):
+        incremental_index = rmdutil.IncrementalIndex(get_incremental_index_path(dest_csv_path))
+    
+    try:
+        # streams the rows to a temporary file, which replaces the destination CSV file once it is complete
+        with open_dest_file(dest_csv_path) as dest_csv_file:
+            # creates a CSV writer
+            csv_writer = csv.writer(dest_csv_file)
+            
+            if (stats is not None):
+                # the complete duplicates are removed while the rows are written then
+                stats.begin_stage("read and remove complete duplicates" + (" and write" if exact_only else ""))
+            
+            # parses the source file
+            if (isinstance(src_csv_path, str)):
+                (header, digested_rows) = read_src_table(src_csv_path, jobs, stats)
+            else:
+                (header, digested_rows) = read_src_tables(src_csv_path, jobs, stats)
             
             # copies the header
             csv_writer.writerow(header)
             
-            # use the keys of a dictionary to remove complete duplicates
-            rows = {}
+            if (explicit_grouping_rules and not exact_only):
+                for grouping_rule in grouping_rules:
+                    for grouping_key in grouping_rule:
+                        if (grouping_key.column_name not in header):
+                            print("Warning: grouping rule \"" + format_grouping_rule(grouping_rule) + "\" is skipped, column \"" + grouping_key.column_name + "\" is not found.")
+                            break
             
-            for row in csv_reader:
-                row_tuple = tuple(row)
-                rows[row_tuple] = None
+            # column index -> aggregator function
+            column_index_aggregators = None
+            if (column_aggregators is not None and not exact_only):
+                column_index_aggregators = {}
+                for (column_name, aggregator) in column_aggregators.items():
+                    if (column_name in header):
+                        column_index_aggregators[header.index(column_name)] = aggregator
+                    else:
+                        print("Warning: the aggregator of column \"" + column_name + "\" is ignored, the column is not found.")
             
-            unique_rows = []
-            for tup in list(rows.keys()):
-                unique_row = list(tup)
-                unique_rows.append(unique_row)
+            # removes complete duplicates
+            unique_rows = iter_unique_rows(digested_rows, partition_count, os.path.dirname(os.path.abspath(dest_csv_path)), yield_digests = incremental)
+            if (stats is not None and not exact_only):
+                # the matching stages need all the rows anyway, which are kept compactly in a RowStore
+                unique_rows = (list(unique_rows) if incremental else rmdutil.RowStore(unique_rows))
+                stats.unique_rows = len(unique_rows)
+                stats.begin_stage("load incremental index" if incremental else "index keys")
+            
+            # the rows reviewed by the previous runs
+            settled_rows = []
+            settled_normalized_keys = None
+            if (incremental):
+                seen_digests = set()
+                if (incremental_index.is_compatible(header, key_column_names)):
+                    seen_digests = incremental_index.load_seen_digests()
+                    (settled_rows, settled_normalized_keys) = incremental_index.load_output_rows()
+                else:
+                    print("No compatible incremental index is found, all rows are processed.")
+                
+                # only keeps the rows never seen before
+                new_digests = []
+                new_rows = []
+                for (digest, row) in unique_rows:
+                    if (digest not in seen_digests):
+                        new_digests.append(digest)
+                        new_rows.append(row)
+                print(str(len(new_rows)) + " new row(s) since the last run.")
+                unique_rows = settled_rows + new_rows
+                if (stats is not None and not exact_only):
+                    stats.begin_stage("index keys")
             
-            unique_rows = merge_by_column(header, unique_rows, "Name")
-            unique_rows = merge_by_column(header, unique_rows, "Solution")
+            result_normalized_keys = None
+            if (not exact_only):
+                decision_store = None
+                if (decisions_path is not None):
+                    decision_store = rmdutil.MergeDecisionStore(decisions_path)
+                try:
+                    reviewer = MergeReviewer(decision_store, batch, preview_max_rows, preview_page_rows, stats, column_index_aggregators)
+                    
+                    clusterer = MatchingPairClusterer(header, unique_rows, key_column_names, reviewer = reviewer, settled_row_count = len(settled_rows), settled_normalized_keys = settled_normalized_keys, stats = stats, grouping_rules = grouping_rules, lookahead_groups = lookahead_groups)
+                    unique_rows = clusterer.run()
+                    if (incremental):
+                        result_normalized_keys = clusterer.get_result_normalized_keys()
+                    
+                    reviewer.print_summary()
+                finally:
+                    if (decision_store is not None):
+                        decision_store.close()
+            elif (incremental):
+                # keeps the keys normalized the same way as the matching stages
+                key_column_indexes = [header.index(column_name) for column_name in key_column_names if column_name in header]
+                result_normalized_keys = [[row[column_index].lower() for column_index in key_column_indexes] for row in unique_rows]
             
+            if (stats is not None and not exact_only):
+                stats.begin_stage("write")
             for unique_row in unique_rows:
                 # copies this row to the destination CSV file
                 csv_writer.writerow(unique_row)
+                if (stats is not None):
+                    stats.rows_out += 1
+            if (stats is not None and exact_only):
+                stats.unique_rows = stats.rows_out
+        
+        if (incremental):
+            if (stats is not None):
+                stats.begin_stage("save incremental index")
+            # only remembers the new rows once the destination CSV file is written
+            incremental_index.save(header, key_column_names, new_digests, unique_rows, result_normalized_keys)
+    finally:
+        if (incremental_index is not None):
+            incremental_index.close()
+        if (stats is not None):
+            stats.end_stage()
+
+# Removes the duplicated rows of a table in process, for the pipelines embedding this module instead of running it on files.
+# The rows are read from an iterator and written to a sink, and the merges are decided by a function, so nothing is printed or asked, e.g.
+#     deduper = rm_csv_dup.Deduper(header, decide = lambda header, rows_to_be_merged, merged_row: len(rows_to_be_merged) <= 20)
+#     deduper.run(rows, csv_writer.writerow)
+class Deduper:
+    # @param header The column names of the rows
+    # @param decide See MergeReviewer.  None to only merge the groups decided before, as in batch mode.
+    # @param exact_only True to only remove the complete duplicates, and stream them to the sink.
+    # @param decisions_path The file keeping the merge decisions (which may be shared with the command line), None not to keep them.
+    # @param grouping_rules See rm_dup()
+    # @param similarity_threshold See MatchingPairClusterer
+    # @param column_aggregators See rm_dup()
+    # @param partition_count See iter_unique_rows()
+    # @param temp_dir_path See iter_unique_rows()
+    # @param stats See rm_dup()
+    # @throws ValueError if a grouping rule or an aggregator refers to a column which is not in the header
+    def __init__(self, header: list, decide = None, exact_only: bool = False, decisions_path: str = None, grouping_rules: list = None, similarity_threshold: float = None, column_aggregators: dict = None, partition_count: int = 1, temp_dir_path: str = None, stats: rmdutil.RunStats = None):
+        self.header = list(header)
+        self.__decide = decide
+        self.__exact_only = exact_only
+        self.__decisions_path = decisions_path
+        self.__partition_count = partition_count
+        self.__temp_dir_path = temp_dir_path
+        self.__stats = stats
+        
+        if (grouping_rules is None):
+            # merges by "Name" first, then by "Solution", if the header has them
+            grouping_rules = get_default_grouping_rules(KEY_COLUMN_NAMES, similarity_threshold)
+        else:
+            for grouping_rule in grouping_rules:
+                for grouping_key in grouping_rule:
+                    if (grouping_key.column_name not in self.header):
+                        raise ValueError("Column \"" + grouping_key.column_name + "\" of grouping rule \"" + format_grouping_rule(grouping_rule) + "\" is not found.")
+        self.__grouping_rules = grouping_rules
+        self.__key_column_names = get_grouping_column_names(grouping_rules)
+        
+        # column index -> aggregator function
+        self.__column_index_aggregators = None
+        if (column_aggregators is not None):
+            self.__column_index_aggregators = {}
+            for (column_name, aggregator) in column_aggregators.items():
+                if (column_name not in self.header):
+                    raise ValueError("Column \"" + column_name + "\" of the aggregators is not found.")
+                self.__column_index_aggregators[self.header.index(column_name)] = aggregator
+        
+        # the merges of the last run applied and rejected by the decisions of previous runs, applied and rejected again
+        # after being decided earlier in the run, and skipped without a decision, see MergeReviewer
+        self.known_merged_count = 0
+        self.known_rejected_count = 0
+        self.repeated_merged_count = 0
+        self.repeated_rejected_count = 0
+        self.undecided_count = 0
     
-    # copy the temp file to the destination CSV file
-    shutil.copyfile(temp_file.name, dest_csv_path)
+    # Removes the complete duplicates (keeping the first occurrence of every row, in order), then merges the similar rows.
+    # @param rows The iterator of the rows after the header, where row[columnIndex] == cell
+    # @param sink The function (row: list) called with every result row in order, e.g. csv_writer.writerow or list.append
+    # @return the number of rows written to the sink
+    def run(self, rows, sink) -> int:
+        stats = self.__stats
+        row_count = 0
+        try:
+            if (stats is not None):
+                stats.begin_stage("remove complete duplicates" + (" and write" if self.__exact_only else ""))
+            # the rows may be tuples or any other sequences, which are handled (and handed to the sink) as lists like the rows read from a CSV file
+            digested_rows = iter_digested_rows(list(row) for row in rows)
+            if (stats is not None):
+                digested_rows = iter_counted_rows(digested_rows, stats)
+            result_rows = iter_unique_rows(digested_rows, self.__partition_count, self.__temp_dir_path)
+            
+            if (not self.__exact_only):
+                unique_rows = rmdutil.RowStore(result_rows)
+                if (stats is not None):
+                    stats.unique_rows = len(unique_rows)
+                    stats.begin_stage("index keys")
+                result_rows = self.__merge(unique_rows)
+                if (stats is not None):
+                    stats.begin_stage("write")
+            
+            for row in result_rows:
+                sink(row)
+                row_count += 1
+            if (stats is not None):
+                stats.rows_out += row_count
+                if (self.__exact_only):
+                    stats.unique_rows = row_count
+        finally:
+            if (stats is not None):
+                stats.end_stage()
+        return row_count
     
-    # delete the temp file
-    os.remove(temp_file.name)
+    # Merges the similar rows by the grouping rules.
+    # @return an iterator of the result rows as lists
+    def __merge(self, unique_rows: rmdutil.RowStore):
+        decision_store = None
+        if (self.__decisions_path is not None):
+            decision_store = rmdutil.MergeDecisionStore(self.__decisions_path)
+        try:
+            reviewer = MergeReviewer(decision_store, (self.__decide is None), stats = self.__stats, column_aggregators = self.__column_index_aggregators, decide = self.__decide)
+            clusterer = MatchingPairClusterer(self.header, unique_rows, self.__key_column_names, reviewer = reviewer, stats = self.__stats, grouping_rules = self.__grouping_rules)
+            result_rows = clusterer.run()
+        finally:
+            if (decision_store is not None):
+                decision_store.close()
+        self.known_merged_count = reviewer.known_merged_count
+        self.known_rejected_count = reviewer.known_rejected_count
+        self.repeated_merged_count = reviewer.repeated_merged_count
+        self.repeated_rejected_count = reviewer.repeated_rejected_count
+        self.undecided_count = reviewer.undecided_count
+        return (list(row) for row in result_rows)
 
-def main():
-    # the working directory is the default source dir
-    src_dir_path = "."
+# the file name suffix of every destination file written into a destination directory
+DEST_FILE_SUFFIX = "_no_dup"
+
+# @return true if the path is a source file, i.e. a CSV (or .nessus) file, or a .gz of one
+def is_src_file_path(path: str) -> bool:
+    return (get_uncompressed_path(path).lower().endswith(".csv") or is_nessus_path(path))
+
+# @return true if the path is a glob pattern, e.g. "scans/*.csv"
+def is_glob_pattern(path: str) -> bool:
+    return any(c in path for c in "*?[")
+
+# @param src_dir_path The directory of the source files, or a glob pattern matching them
+# @return the paths of the source files in the directory (not in its subdirectories) or matching the pattern, sorted
+def find_src_paths(src_dir_path: str) -> list:
+    import glob
+    if (os.path.isdir(src_dir_path)):
+        paths = [os.path.join(src_dir_path, name) for name in os.listdir(src_dir_path)]
+    else:
+        paths = glob.glob(src_dir_path)
+    return sorted(path for path in paths if os.path.isfile(path) and is_src_file_path(path))
+
+# @return the destination CSV file of a source file in the destination directory, which is compressed if the source file is,
+# e.g. "${dest_dir_path}/scan_no_dup.csv.gz" for "scan.nessus.gz"
+def get_dest_path_in_dir(src_path: str, dest_dir_path: str) -> str:
+    name = os.path.splitext(os.path.basename(get_uncompressed_path(src_path)))[0] + DEST_FILE_SUFFIX + ".csv"
+    if (is_gzip_path(src_path)):
+        name += GZIP_EXTENSION
+    return os.path.join(dest_dir_path, name)
+
+# Runs rm_dup() on a source file, see rm_dup_files().
+# @param with_stats True to record the stats of the run, and print their report after the run
+# @return the stats as a dict, or None if not with_stats
+def rm_dup_file(src_path: str, dest_path: str, with_stats: bool, rm_dup_options: dict):
+    stats = (rmdutil.RunStats() if with_stats else None)
+    rm_dup(src_path, dest_path, stats = stats, **rm_dup_options)
+    if (stats is None):
+        return None
+    stats.print_report()
+    return stats.to_dict()
+
+# Runs rm_dup_file() in a worker process, where the output is kept instead of printed, since the workers would interleave their outputs.
+# @return (the output, the stats as a dict or None)
+def rm_dup_file_in_worker(src_path: str, dest_path: str, with_stats: bool, rm_dup_options: dict) -> tuple:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        stats_dict = rm_dup_file(src_path, dest_path, with_stats, rm_dup_options)
+    return (output.getvalue(), stats_dict)
+
+# Runs rm_dup() on every source file, writing it to its own destination file in a directory, see get_dest_path_in_dir().
+# In batch mode, the files are processed concurrently in jobs worker processes, and the output of every file is printed in order once it is done.
+# Otherwise they are processed one by one so that the merges can be reviewed, and every file is parsed in jobs worker processes.
+# All the files share the same merge decisions, so a group decided in a file is not asked again in the others.
+# @param with_stats True to report the stats of every file
+# @param rm_dup_options The other params of rm_dup(), except jobs and stats
+# @return the dict of source path -> its stats as a dict (None if not with_stats), for every file processed without error
+def rm_dup_files(src_paths: list, dest_dir_path: str, jobs: int = 1, batch: bool = False, with_stats: bool = False, **rm_dup_options) -> dict:
+    import concurrent.futures
+    rm_dup_options["batch"] = batch
+    results = {}
+    def print_file_header(i: int, src_path: str, dest_path: str):
+        print("")
+        print("[" + str(i + 1) + "/" + str(len(src_paths)) + "] \"" + src_path + "\" -> \"" + dest_path + "\"")
+    def print_file_error(src_path: str, error: Exception):
+        print("Error: \"" + src_path + "\" is not processed, " + type(error).__name__ + ": " + str(error))
     
-    if (check_option_flags()):
-        return
+    dest_paths = [get_dest_path_in_dir(src_path, dest_dir_path) for src_path in src_paths]
+    if (not batch or jobs <= 1 or len(src_paths) <= 1):
+        rm_dup_options["jobs"] = jobs
+        for (i, (src_path, dest_path)) in enumerate(zip(src_paths, dest_paths)):
+            print_file_header(i, src_path, dest_path)
+            try:
+                results[src_path] = rm_dup_file(src_path, dest_path, with_stats, rm_dup_options)
+            except Exception as error:
+                print_file_error(src_path, error)
+        return results
     
-    if (len(sys.argv) < 3):
-        print_help()
-        return
+    # every file is parsed in its own worker process then
+    rm_dup_options["jobs"] = 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        futures = [executor.submit(rm_dup_file_in_worker, src_path, dest_path, with_stats, rm_dup_options) for (src_path, dest_path) in zip(src_paths, dest_paths)]
+        for (i, (src_path, dest_path, future)) in enumerate(zip(src_paths, dest_paths, futures)):
+            print_file_header(i, src_path, dest_path)
+            try:
+                (output, results[src_path]) = future.result()
+            except Exception as error:
+                print_file_error(src_path, error)
+                continue
+            print(output, end = "")
+    return results
+
+# the version of the review file format written by plan_dup()
+REVIEW_FILE_VERSION = 1
+
+# the decisions of a group in a review file
+REVIEW_DECISION_MERGE = "y"
+REVIEW_DECISION_KEEP = "n"
+REVIEW_DECISION_UNDECIDED = "?"
+
+# Accepts every merge, so that plan_dup() can find all the groups without asking.
+class PlanReviewer(MergeReviewer):
+    def __init__(self, stats: rmdutil.RunStats = None, column_aggregators: dict = None):
+        super().__init__(None, True)
+        self.__stats = stats
+        self.__column_aggregators = column_aggregators
     
-    # user passed designated source folder from command line
-    src_csv_path = sys.argv[1]
-    # removes double-quotes at beginning and end of src_csv_path
-    if (src_csv_path.startswith("\"")):
-        src_csv_path = src_csv_path[1]
-    if (src_csv_path.endswith("\"")):
-        src_csv_path = src_csv_path[0 : len(src_csv_path) - 1]
+    def review(self, header: list, rows_to_be_merged: list, key_column_indexes: list, preview: MergePreview = None, source_rows: list = None):
+        return get_merged_row(rows_to_be_merged, preview, self.__stats, self.__column_aggregators, source_rows)
+
+# Reads the source file and removes the complete duplicates, the same way for plan_dup() and apply_plan().
+# @return (header, RowStore of the unique rows, the hex digest of all the unique rows in order)
+def read_unique_rows(src_path: str, memory_budget_mb: int = None, jobs: int = 1, temp_dir_path: str = None, stats: rmdutil.RunStats = None) -> tuple:
+    (header, digested_rows) = read_src_table(src_path, jobs, stats)
+    source_digest = hashlib.sha256()
+    unique_rows = rmdutil.RowStore()
+    for (digest, row) in iter_unique_rows(digested_rows, get_partition_count(src_path, memory_budget_mb), temp_dir_path, yield_digests = True):
+        source_digest.update(digest)
+        unique_rows.append(row)
+    if (stats is not None):
+        stats.unique_rows = len(unique_rows)
+    return (header, unique_rows, source_digest.hexdigest())
+
+# @param key_column_indexes The key columns shown for every row
+# @return the key cells of the row, joined like the columns of a group by several key columns
+def get_review_key_str(row: list, key_column_indexes: list) -> str:
+    return " | ".join(row[column_index] for column_index in key_column_indexes)
+
+# The first phase of a two-phase run: finds all the groups of similar rows without asking, and writes them to a review
+# file instead of merging them.  Every group is planned as if all the groups before it were merged, so a group may
+# contain the merged row of a previous group.
+# The review file is JSON, where every group has the row IDs to be merged (the unique rows are numbered from 0, and the
+# merged rows from the number of unique rows, in the order of the groups), the keys of the rows and of the merged row as
+# a preview, and a decision: "y" to merge, "n" not to merge, or "?" if undecided.  Groups with a decision kept in the
+# decision store are decided already.
+# @param review_path The review file to be written, to be edited and passed to apply_plan()
+# @param See rm_dup() for the other params
+def plan_dup(src_path: str, review_path: str, memory_budget_mb: int = None, jobs: int = 1, decisions_path: str = None, stats: rmdutil.RunStats = None, similarity_threshold: float = None, grouping_rules: list = None, column_aggregators: dict = None):
+    if (grouping_rules is None):
+        grouping_rules = get_default_grouping_rules(KEY_COLUMN_NAMES, similarity_threshold)
+    
+    try:
+        if (stats is not None):
+            stats.begin_stage("read and remove complete duplicates")
+        (header, unique_rows, source_digest) = read_unique_rows(src_path, memory_budget_mb, jobs, os.path.dirname(os.path.abspath(review_path)), stats)
+        # the clusterer appends the merged rows to the same RowStore
+        unique_row_count = len(unique_rows)
+        
+        column_index_aggregators = None
+        if (column_aggregators is not None):
+            column_index_aggregators = {header.index(column_name): aggregator for (column_name, aggregator) in column_aggregators.items() if column_name in header}
+        
+        if (stats is not None):
+            stats.begin_stage("index keys")
+        clusterer = MatchingPairClusterer(header, unique_rows, get_grouping_column_names(grouping_rules), reviewer = PlanReviewer(stats, column_index_aggregators), stats = stats, grouping_rules = grouping_rules)
+        clusterer.run()
+        
+        if (stats is not None):
+            stats.begin_stage("write review file")
+        decision_store = None
+        if (decisions_path is not None):
+            decision_store = rmdutil.MergeDecisionStore(decisions_path)
+        try:
+            groups = []
+            decided_count = 0
+            for (stage_number, key_column_indexes, group_row_ids, merged_row_id) in clusterer.merge_history:
+                rows_to_be_merged = [clusterer.get_row(row_id) for row_id in group_row_ids]
+                decision = REVIEW_DECISION_UNDECIDED
+                if (decision_store is not None):
+                    user_wants_to_merge = decision_store.get(get_group_fingerprint(header, rows_to_be_merged, key_column_indexes)[0])
+                    if (user_wants_to_merge is not None):
+                        decision = (REVIEW_DECISION_MERGE if user_wants_to_merge else REVIEW_DECISION_KEEP)
+                        decided_count += 1
+                groups.append({
+                    "id": merged_row_id,
+                    "stage": stage_number,
+                    "columns": [header[column_index] for column_index in key_column_indexes],
+                    "rows": group_row_ids,
+                    "keys": [get_review_key_str(row, key_column_indexes) for row in rows_to_be_merged],
+                    "merged": get_review_key_str(clusterer.get_row(merged_row_id), key_column_indexes),
+                    "decision": decision,
+                })
+        finally:
+            if (decision_store is not None):
+                decision_store.close()
+        
+        stages = [rule_str + ("" if (words_matching_pair is None) else " " + str(words_matching_pair)) for (rule_str, words_matching_pair, seconds) in clusterer.stage_times]
+        review = {"version": REVIEW_FILE_VERSION, "source": {"path": src_path, "unique_rows": unique_row_count, "digest": source_digest}, "header": header, "stages": stages, "groups": groups}
+        with open_dest_file(review_path, None) as review_file:
+            json.dump(review, review_file, ensure_ascii = False, indent = 1)
+    finally:
+        if (stats is not None):
+            stats.end_stage()
+    
+    print(str(len(groups)) + " merge(s) planned, " + str(decided_count) + " of them decided by previous decisions.")
+    print("Set the \"decision\" of every group in \"" + review_path + "\" to \"" + REVIEW_DECISION_MERGE + "\" or \"" + REVIEW_DECISION_KEEP + "\", then apply it.")
+
+# The second phase of a two-phase run: merges the groups of a review file written by plan_dup() as decided, without
+# finding them again, and writes the destination CSV file.
+# The groups are replayed in order.  A group containing the merged row of a group which is not merged is not the group
+# reviewed, so it is left undecided and listed, to be reviewed by planning again.  Undecided groups are not merged.
+# @param review_path The review file written by plan_dup(), with the decisions edited
+# @param decisions_path The file keeping the merge decisions, which learns the decisions of the review file.  None not to keep them.
+# @param See rm_dup() for the other params
+# @return true if the destination CSV file is written, false (after printing an error) if the review file doesn't match the source file
+def apply_plan(src_path: str, review_path: str, dest_csv_path: str, memory_budget_mb: int = None, jobs: int = 1, decisions_path: str = None, stats: rmdutil.RunStats = None, column_aggregators: dict = None) -> bool:
+    with open(review_path, "r", encoding = ENCODING) as review_file:
+        review = json.load(review_file)
+    if (review.get("version") != REVIEW_FILE_VERSION):
+        print("Error: \"" + review_path + "\" is not a review file of this version.")
+        return False
+    
+    try:
+        if (stats is not None):
+            stats.begin_stage("read and remove complete duplicates")
+        (header, rows, source_digest) = read_unique_rows(src_path, memory_budget_mb, jobs, os.path.dirname(os.path.abspath(dest_csv_path)), stats)
+        if (header != review["header"] or len(rows) != review["source"]["unique_rows"] or source_digest != review["source"]["digest"]):
+            print("Error: \"" + review_path + "\" is not planned for the rows of \"" + src_path + "\".")
+            return False
+        
+        column_index_aggregators = None
+        if (column_aggregators is not None):
+            column_index_aggregators = {header.index(column_name): aggregator for (column_name, aggregator) in column_aggregators.items() if column_name in header}
+        
+        if (stats is not None):
+            stats.begin_stage("apply decisions")
+        decision_store = None
+        if (decisions_path is not None):
+            decision_store = rmdutil.MergeDecisionStore(decisions_path)
+        try:
+            # merged row ID -> merged row, only for the groups merged
+            merged_rows = {}
+            # merged row ID -> the original row IDs merged into it, which some aggregators aggregate instead of it, see rmdutil.merge_rows()
+            source_row_ids = {}
+            deleted = bytearray(len(rows) + len(review["groups"]))
+            order = list(range(len(rows)))
+            merged_count = 0
+            kept_count = 0
+            undecided_count = 0
+            # the IDs of the groups containing the merged row of a group not merged, which are left undecided
+            changed_group_ids = []
+            
+            group_index = 0
+            groups = review["groups"]
+            while (group_index < len(groups)):
+                # the groups of the same stage
+                stage_number = groups[group_index]["stage"]
+                merged_row_ids = []
+                while (group_index < len(groups) and groups[group_index]["stage"] == stage_number):
+                    group = groups[group_index]
+                    group_index += 1
+                    group_row_ids = group["rows"]
+                    if (any((row_id >= len(rows) and row_id not in merged_rows) or deleted[row_id] for row_id in group_row_ids)):
+                        # a row of this group was not merged as planned, so these are not the rows reviewed
+                        changed_group_ids.append(group["id"])
+                        continue
+                    
+                    rows_to_be_merged = [(rows[row_id] if (row_id < len(rows)) else merged_rows[row_id]) for row_id in group_row_ids]
+                    decision = group["decision"].strip().lower()
+                    if (decision.startswith(REVIEW_DECISION_MERGE) or decision.startswith(REVIEW_DECISION_KEEP)):
+                        user_wants_to_merge = decision.startswith(REVIEW_DECISION_MERGE)
+                        if (decision_store is not None):
+                            key_column_indexes = [header.index(column_name) for column_name in group["columns"]]
+                            (fingerprint, column_name, key_values) = get_group_fingerprint(header, rows_to_be_merged, key_column_indexes)
+                            decision_store.put(fingerprint, column_name, key_values, user_wants_to_merge)
+                    else:
+                        undecided_count += 1
+                        continue
+                    if (not user_wants_to_merge):
+                        kept_count += 1
+                        continue
+                    
+                    group_source_row_ids = []
+                    for row_id in group_row_ids:
+                        group_source_row_ids.extend(source_row_ids.pop(row_id, (row_id,)))
+                    source_row_ids[group["id"]] = group_source_row_ids
+                    source_rows = [rows[row_id] for row_id in group_source_row_ids]
+                    if (stats is not None):
+                        merged_rows[group["id"]] = stats.merge_rows(rows_to_be_merged, column_index_aggregators, source_rows)
+                    else:
+                        merged_rows[group["id"]] = rmdutil.merge_rows(rows_to_be_merged, column_aggregators = column_index_aggregators, source_rows = source_rows)
+                    for row_id in group_row_ids:
+                        deleted[row_id] = 1
+                    merged_row_ids.append(group["id"])
+                    merged_count += 1
+                
+                # the merged rows come first, followed by the remaining rows, like MatchingPairClusterer
+                order = merged_row_ids + [row_id for row_id in order if not deleted[row_id]]
+        finally:
+            if (decision_store is not None):
+                decision_store.close()
+        
+        if (stats is not None):
+            stats.begin_stage("write")
+        with open_dest_file(dest_csv_path) as dest_csv_file:
+            csv_writer = csv.writer(dest_csv_file)
+            csv_writer.writerow(header)
+            for row_id in order:
+                csv_writer.writerow(rows[row_id] if (row_id < len(rows)) else merged_rows[row_id])
+                if (stats is not None):
+                    stats.rows_out += 1
+    finally:
+        if (stats is not None):
+            stats.end_stage()
+    
+    print(str(merged_count) + " merge(s) applied, " + str(kept_count) + " merge(s) rejected, " + str(undecided_count) + " undecided, and " + str(len(changed_group_ids)) + " left undecided for containing the merged row of a group not merged.")
+    if (len(changed_group_ids) > 0):
+        print("Group(s) left undecided: " + ", ".join(str(group_id) for group_id in changed_group_ids))
+        print("Plan the destination CSV file again to review them.")
+    return True
+
+# the commands of a two-phase run, see plan_dup() and apply_plan()
+COMMAND_PLAN = "plan"
+COMMAND_APPLY = "apply"
+# command (None for a one-phase run) -> the number of params after it
+COMMAND_PARAM_COUNTS = {None: 2, COMMAND_PLAN: 2, COMMAND_APPLY: 3}
+
+# @return the path passed from command line, without the double-quotes at its beginning and end
+def unquote_path(path: str) -> str:
+    if (path.startswith("\"")):
+        path = path[1 : len(path)]
+    if (path.endswith("\"")):
+        path = path[0 : len(path) - 1]
+    return path
+
+# @param src_csv_path The source path passed from command line
+# @return the source path, or None (after printing an error) if it is not a CSV (or .nessus) file
+def get_src_path(src_csv_path: str):
+    src_csv_path = unquote_path(src_csv_path)
     if (not os.path.exists(src_csv_path)):
         print("Error: src_csv_path = \"" + src_csv_path + "\" does not exist.")
-        return
+        return None
     if (not os.path.isfile(src_csv_path)):
         print("Error: src_csv_path = \"" + src_csv_path + "\" is not a file.")
-        return
-    if (not src_csv_path.lower().endswith(".csv")):
-        print("Error: src_csv_path = \"" + src_csv_path + "\" is not a CSV file.")
-        return
-    
-    # user passed destination CSV file path from command line
-    dest_csv_path = sys.argv[2]
-    # removes double-quotes at beginning and end of dest_csv_path
-    if (dest_csv_path.startswith("\"")):
-        dest_csv_path = dest_csv_path[1]
-    if (dest_csv_path.endswith("\"")):
-        dest_csv_path = dest_csv_path[0 : len(dest_csv_path) - 1]
+        return None
+    if (not is_src_file_path(src_csv_path)):
+        print("Error: src_csv_path = \"" + src_csv_path + "\" is not a CSV (or .nessus) file, or a .gz of one.")
+        return None
+    return src_csv_path
+
+# @param src_dir_path The source directory or glob pattern passed from command line, see find_src_paths()
+# @return the paths of the source files, or None (after printing an error) if there is none
+def get_src_paths(src_dir_path: str):
+    src_paths = find_src_paths(src_dir_path)
+    if (len(src_paths) == 0):
+        print("Error: src_csv_path = \"" + src_dir_path + "\" has no CSV (or .nessus) files, or .gz of them.")
+        return None
+    print(str(len(src_paths)) + " source file(s) found.")
+    return src_paths
+
+# Asks the user before overwriting the existing destination file(s), unless in batch mode or incremental mode.
+# @param files_str "this file" or "these files"
+# @return true if the destination file(s) can be overwritten
+def confirm_overwrite(files_str: str, batch: bool, incremental: bool) -> bool:
+    while (not batch and not incremental):
+        isOverwrite = input("Are you sure you want to overwrite " + files_str + "? [y/N]: ")
+        isOverwrite = isOverwrite.lower()
+        if (isOverwrite == "n"):
+            print("Program is exiting, no changes are made.")
+            return False
+        if (isOverwrite == "y"):
+            print("User requested to overwrite " + files_str + ".  Program continues.")
+            break
+        print("Input not recognized. Please enter again.")
+    if (incremental):
+        print("Updating " + files_str + " incrementally.  Program continues.")
+    elif (batch):
+        print("Overwriting " + files_str + " in batch mode.  Program continues.")
+    return True
+
+# @param dest_csv_path The destination CSV file path passed from command line
+# @param src_csv_path The source path, or a list of source paths
+# @param batch True not to ask before overwriting the destination CSV file
+# @param incremental True if the destination CSV file is updated incrementally
+# @return the destination CSV file path, or None (after printing an error, or if the user doesn't want to overwrite it) if it cannot be written
+def get_dest_csv_path(dest_csv_path: str, src_csv_path: str, batch: bool, incremental: bool):
+    dest_csv_path = unquote_path(dest_csv_path)
+    src_paths = ([src_csv_path] if isinstance(src_csv_path, str) else src_csv_path)
     dest_csv_dir_path = os.path.dirname(dest_csv_path)
     if (dest_csv_dir_path != ""):
         if (not os.path.exists(dest_csv_dir_path)):
             print("Error: dest_csv_path is under \"" + dest_csv_dir_path + "\", which does not exist.")
-            return
+            return None
         if (not os.path.isdir(dest_csv_dir_path)):
             print("Error: dest_csv_path is under \"" + dest_csv_dir_path + "\", which is not a directory.")
-            return
-    if (not dest_csv_path.lower().endswith(".csv")):
-        print("Error: dest_csv_path = \"" + dest_csv_path + "\" does not ends with \".csv\".")
-        return
+            return None
+    if (not get_uncompressed_path(dest_csv_path).lower().endswith(".csv")):
+        print("Error: dest_csv_path = \"" + dest_csv_path + "\" does not ends with \".csv\" or \".csv.gz\".")
+        return None
     if (os.path.exists(dest_csv_path)):
         if (os.path.isdir(dest_csv_path)):
             print("Error: dest_csv_path = \"" + dest_csv_path + "\" already exists as a directory.")
-            return
+            return None
         elif (os.path.isfile(dest_csv_path)):
-            if (os.path.samefile(src_csv_path, dest_csv_path)):
+            if (any(os.path.samefile(src_path, dest_csv_path) for src_path in src_paths)):
                 print("Error: src_csv_path and dest_csv_path cannot be the same file.")
-                return
+                return None
             else:
                 print("Warning: dest_csv_path = \"" + dest_csv_path + "\" already exists.")
-                while (True):
-                    isOverwrite = input("Are you sure you want to overwrite this file? [y/N]: ")
-                    isOverwrite = isOverwrite.lower()
-                    if (isOverwrite == "n"):
-                        print("Program is exiting, no changes are made.")
-                        return
-                    if (isOverwrite == "y"):
-                        print("User requested to overwrite this file.  Program continues.")
-                        break
-                    print("Input not recognized. Please enter again.")
+                if (not confirm_overwrite("this file", batch, incremental)):
+                    return None
         else:
             print("Error: dest_csv_path = \"" + dest_csv_path + "\" already exists.")
+            return None
+    return dest_csv_path
+
+# @param dest_dir_path The destination directory path passed from command line, which is created if it does not exist
+# @param src_paths The source paths, see get_dest_path_in_dir()
+# @param batch True not to ask before overwriting the destination files
+# @param incremental True if the destination files are updated incrementally
+# @return the destination directory path, or None (after printing an error, or if the user doesn't want to overwrite its files) if it cannot be written
+def get_dest_dir_path(dest_dir_path: str, src_paths: list, batch: bool, incremental: bool):
+    dest_dir_path = unquote_path(dest_dir_path)
+    
+    # the destination paths so far
+    dest_paths = set()
+    for src_path in src_paths:
+        dest_path = get_dest_path_in_dir(src_path, dest_dir_path)
+        if (dest_path in dest_paths):
+            print("Error: \"" + src_path + "\" would be written to the same file as another source file, \"" + dest_path + "\".")
+            return None
+        dest_paths.add(dest_path)
+    
+    if (not os.path.exists(dest_dir_path)):
+        parent_dir_path = os.path.dirname(os.path.abspath(dest_dir_path))
+        if (not os.path.isdir(parent_dir_path)):
+            print("Error: dest_csv_path is under \"" + parent_dir_path + "\", which is not a directory.")
+            return None
+        os.mkdir(dest_dir_path)
+        print("Directory \"" + dest_dir_path + "\" is created.")
+        return dest_dir_path
+    if (not os.path.isdir(dest_dir_path)):
+        print("Error: dest_csv_path = \"" + dest_dir_path + "\" is not a directory, use --consolidate to write all source files into one file.")
+        return None
+    
+    existing_dest_paths = [dest_path for dest_path in sorted(dest_paths) if os.path.exists(dest_path)]
+    for dest_path in existing_dest_paths:
+        if (not os.path.isfile(dest_path)):
+            print("Error: \"" + dest_path + "\" already exists, and is not a file.")
+            return None
+        if (any(os.path.samefile(src_path, dest_path) for src_path in src_paths)):
+            print("Error: \"" + dest_path + "\" is both a source file and a destination file.")
+            return None
+    if (len(existing_dest_paths) > 0):
+        print("Warning: " + str(len(existing_dest_paths)) + " destination file(s) already exist in \"" + dest_dir_path + "\".")
+        if (not confirm_overwrite("these files", batch, incremental)):
+            return None
+    return dest_dir_path
+
+# @param review_path The review file path passed from command line
+# @param is_written True if the review file is to be written by plan, false if it is to be read by apply
+# @return the review file path, or None (after printing an error) if it cannot be written or read
+def get_review_path(review_path: str, is_written: bool):
+    review_path = unquote_path(review_path)
+    if (not review_path.lower().endswith(".json")):
+        print("Error: review_path = \"" + review_path + "\" does not ends with \".json\".")
+        return None
+    if (not is_written):
+        if (not os.path.isfile(review_path)):
+            print("Error: review_path = \"" + review_path + "\" is not a file.")
+            return None
+        return review_path
+    review_dir_path = os.path.dirname(review_path)
+    if (review_dir_path != "" and not os.path.isdir(review_dir_path)):
+        print("Error: review_path is under \"" + review_dir_path + "\", which is not a directory.")
+        return None
+    if (os.path.isdir(review_path)):
+        print("Error: review_path = \"" + review_path + "\" already exists as a directory.")
+        return None
+    return review_path
+
+def main():
+    # the working directory is the default source dir
+    src_dir_path = "."
+    
+    if (check_option_flags()):
+        return
+    
+    command_line = parse_command_line(sys.argv[1 : len(sys.argv)])
+    if (command_line is None):
+        return
+    (options, params) = command_line
+    
+    command = None
+    if (len(params) > 0 and params[0] in COMMAND_PARAM_COUNTS):
+        command = params.pop(0)
+    if (len(params) < COMMAND_PARAM_COUNTS[command]):
+        print_help()
+        return
+    if (command is not None and ("--incremental" in options or "--exact-only" in options)):
+        print("Error: " + command + " cannot be used with --incremental or --exact-only.")
+        return
+    
+    memory_budget_mb = get_positive_int_option(options, "--memory-budget", None)
+    jobs = get_positive_int_option(options, "--jobs", 1)
+    preview_max_rows = get_positive_int_option(options, "--preview-rows", None)
+    preview_page_rows = get_positive_int_option(options, "--page-rows", None)
+    lookahead_groups = get_positive_int_option(options, "--lookahead", DEFAULT_LOOKAHEAD_GROUPS)
+    similarity_threshold = get_fraction_option(options, "--similarity", None)
+    if (memory_budget_mb == 0 or jobs == 0 or preview_max_rows == 0 or preview_page_rows == 0 or lookahead_groups == 0 or similarity_threshold == 0):
+        return
+    if ("--no-lookahead" in options):
+        lookahead_groups = 0
+    
+    grouping_rules_str = None
+    if ("--group-config" in options):
+        group_config_path = options["--group-config"]
+        if (not os.path.isfile(group_config_path)):
+            print("Error: --group-config = \"" + group_config_path + "\" is not a file.")
+            return
+        with open(group_config_path, "r", encoding = ENCODING) as group_config_file:
+            grouping_rules_str = group_config_file.read()
+    if ("--group-by" in options):
+        grouping_rules_str = (options["--group-by"] if (grouping_rules_str is None) else grouping_rules_str + "\n" + options["--group-by"])
+    grouping_rules = None
+    if (grouping_rules_str is not None):
+        grouping_rules = parse_grouping_rules(grouping_rules_str, (similarity_threshold if (similarity_threshold is not None) else DEFAULT_SIMILARITY_THRESHOLD))
+        if (grouping_rules is None):
+            return
+    
+    column_aggregators = None
+    if ("--aggregate" in options):
+        column_aggregators = parse_column_aggregators(options["--aggregate"])
+        if (column_aggregators is None):
+            return
+    
+    batch = ("--batch" in options)
+    incremental = ("--incremental" in options)
+    decisions_path = options.get("--decisions", DEFAULT_DECISIONS_PATH)
+    if ("--no-decisions" in options):
+        decisions_path = None
+    
+    consolidate = ("--consolidate" in options)
+    
+    # the source files of a source directory (or glob pattern), None for one source file
+    src_paths = None
+    src_csv_path = unquote_path(params[0])
+    if (command is None and not os.path.isfile(src_csv_path) and (os.path.isdir(src_csv_path) or is_glob_pattern(src_csv_path))):
+        src_paths = get_src_paths(src_csv_path)
+        if (src_paths is None):
+            return
+    else:
+        src_csv_path = get_src_path(src_csv_path)
+        if (src_csv_path is None):
+            return
+        if (consolidate):
+            print("Error: --consolidate needs a source directory or glob pattern as src_csv_path.")
+            return
+    review_path = None
+    if (command is not None):
+        review_path = get_review_path(params[1], (command == COMMAND_PLAN))
+        if (review_path is None):
+            return
+    dest_csv_path = None
+    dest_dir_path = None
+    if (src_paths is not None and not consolidate):
+        dest_dir_path = get_dest_dir_path(params[1], src_paths, batch, incremental)
+        if (dest_dir_path is None):
             return
+    elif (src_paths is not None):
+        dest_csv_path = get_dest_csv_path(params[1], src_paths, batch, incremental)
+        if (dest_csv_path is None):
+            return
+    elif (command != COMMAND_PLAN):
+        # the destination CSV file is always the last param
+        dest_csv_path = get_dest_csv_path(params[COMMAND_PARAM_COUNTS[command] - 1], src_csv_path, batch, incremental)
+        if (dest_csv_path is None):
+            return
+    
+    stats = None
+    stats_json_path = options.get("--stats-json")
+    with_stats = ("--stats" in options or stats_json_path is not None)
+    
+    if (dest_dir_path is not None):
+        # the stats of every file are reported after it, and saved together keyed by the source paths
+        all_stats = rm_dup_files(src_paths, dest_dir_path, jobs, batch, with_stats, memory_budget_mb = memory_budget_mb, exact_only = ("--exact-only" in options), decisions_path = decisions_path, incremental = incremental, preview_max_rows = preview_max_rows, preview_page_rows = preview_page_rows, similarity_threshold = similarity_threshold, grouping_rules = grouping_rules, column_aggregators = column_aggregators, lookahead_groups = lookahead_groups)
+        print("")
+        print(str(len(all_stats)) + " of " + str(len(src_paths)) + " source file(s) processed.")
+        if (stats_json_path is not None):
+            with open(stats_json_path, "w", encoding = "utf-8") as stats_json_file:
+                json.dump(all_stats, stats_json_file, indent = 2)
+            print("Stats saved to \"" + stats_json_path + "\".")
+        return
+    
+    if (with_stats):
+        stats = rmdutil.RunStats()
+    
+    if (src_paths is not None):
+        # deduplicates all the source files together into one destination file
+        src_csv_path = src_paths
+    
+    if (command == COMMAND_PLAN):
+        plan_dup(src_csv_path, review_path, memory_budget_mb, jobs, decisions_path, stats, similarity_threshold, grouping_rules, column_aggregators)
+    elif (command == COMMAND_APPLY):
+        apply_plan(src_csv_path, review_path, dest_csv_path, memory_budget_mb, jobs, decisions_path, stats, column_aggregators)
+    else:
+        rm_dup(src_csv_path, dest_csv_path, memory_budget_mb, ("--exact-only" in options), jobs, decisions_path, batch, incremental, preview_max_rows, preview_page_rows, stats, similarity_threshold, grouping_rules, column_aggregators, lookahead_groups)
     
-    rm_dup(src_csv_path, dest_csv_path)
+    if (stats is not None):
+        stats.print_report()
+        if (stats_json_path is not None):
+            stats.save_json(stats_json_path)
+            print("Stats saved to \"" + stats_json_path + "\".")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
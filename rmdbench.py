@@ -0,0 +1,229 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file rmdbench.py
+# @brief Benchmarks rm_csv_dup.py on synthetic Nessus-style CSV files.
+# how to use: python3 rmdbench.py [--sizes 10000,100000] [--baseline ${json_path}] [--save-baseline]
+
+import sys # to retrieve command line arguments
+import os  # to handle file I/O operations
+import csv # to write CSV files
+import json # to read and write baselines
+import random # to generate synthetic findings
+import tempfile # to hold the generated files
+import time # to time the stages
+
+import rmdutil # import our own modules
+import rm_csv_dup
+
+# the row counts benchmarked by default, add 1000000 with --sizes for the largest scans
+DEFAULT_SIZES = [10000, 100000]
+
+# where the baseline timings are kept by default
+DEFAULT_BASELINE_PATH = "rmdbench_baseline.json"
+
+# a timing is reported as a regression if it is this many times slower than the baseline...
+REGRESSION_RATIO = 1.25
+# ...and at least this many seconds slower, so that tiny timings don't raise false alarms
+REGRESSION_MIN_SECONDS = 0.05
+
+# (product, version prefix, family titles) for the near-duplicate families
+PRODUCTS = [
+    ("Apache", "2.4.", ["Multiple Vulnerabilities", "Denial of Service", "mod_proxy SSRF"]),
+    ("Apache Tomcat", "9.0.", ["Multiple Vulnerabilities", "Request Smuggling"]),
+    ("OpenSSL", "1.1.1", ["Multiple Vulnerabilities", "Denial of Service"]),
+    ("OpenSSH", "8.", ["Multiple Vulnerabilities", "Information Disclosure"]),
+    ("PHP", "8.1.", ["Multiple Vulnerabilities", "Remote Code Execution"]),
+    ("nginx", "1.2", ["Multiple Vulnerabilities", "Memory Disclosure"]),
+    ("Oracle Java SE", "1.8.0_", ["Multiple Vulnerabilities"]),
+    ("jQuery", "3.", ["Cross-Site Scripting"]),
+    ("MySQL", "8.0.", ["Multiple Vulnerabilities", "Privilege Escalation"]),
+    ("Microsoft Windows", "KB50", ["Security Update", "Remote Code Execution"]),
+]
+
+# findings which are the same on every host, and never vary between versions
+SINGLETONS = [
+    ("SSL Certificate Cannot Be Trusted", "Purchase or generate a proper SSL certificate for this service.", "Medium"),
+    ("SSL Self-Signed Certificate", "Purchase or generate a proper SSL certificate for this service.", "Medium"),
+    ("TLS Version 1.0 Protocol Detection", "Enable support for TLS 1.2 and 1.3, and disable support for TLS 1.0.", "Medium"),
+    ("SMB Signing not required", "Enforce message signing in the host's configuration.", "Medium"),
+    ("Nessus SYN scanner", "Protect your target with an IP filter.", "None"),
+    ("ICMP Timestamp Request Remote Date Disclosure", "Filter out the ICMP timestamp requests (13), and the outgoing ICMP timestamp replies (14).", "Low"),
+]
+
+RISKS = ["Critical", "High", "Medium", "Low"]
+
+# the number of the last unique rows kept to draw the complete duplicates from, so that generating the largest scans
+# doesn't keep every row (with its multi-line Plugin Output) in memory
+DUP_SAMPLE_ROWS = 10000
+
+# Generates a synthetic CSV file shaped like a Nessus CSV export.
+# @param exact_dup_rate The fraction of rows which are complete duplicates of an earlier row (one of the last DUP_SAMPLE_ROWS unique rows).
+# @param family_size The number of version variants of every near-duplicate family of Name/Solution.
+# @param singleton_rate The fraction of unique rows which are host-independent findings like certificate issues.
+# @param plugin_output_lines The number of lines of every Plugin Output.
+def generate_scan_csv(csv_path: str, row_count: int, exact_dup_rate: float = 0.2, family_size: int = 8, singleton_rate: float = 0.3, plugin_output_lines: int = 12, seed: int = 1):
+    rnd = random.Random(seed)
+    
+    # every family is a product, a title, and family_size versions of it
+    families = []
+    plugin_id = 100000
+    for (product, version_prefix, titles) in PRODUCTS:
+        for title in titles:
+            versions = [version_prefix + str(10 + i) for i in range(family_size)]
+            families.append((product, title, versions, plugin_id))
+            plugin_id += family_size
+    
+    host_count = max(1, row_count // 20)
+    hosts = ["10." + str((i >> 16) & 255) + "." + str((i >> 8) & 255) + "." + str(i & 255) for i in range(1, host_count + 1)]
+    
+    # a ring buffer of the last unique rows
+    sample_rows = []
+    next_sample_index = 0
+    with open(csv_path, "w", encoding = rm_csv_dup.ENCODING, newline = "") as csv_file:
+        csv_writer = csv.writer(csv_file, quoting = csv.QUOTE_ALL)
+        csv_writer.writerow(rm_csv_dup.NESSUS_CSV_HEADER)
+        for i in range(row_count):
+            if (len(sample_rows) > 0 and rnd.random() < exact_dup_rate):
+                csv_writer.writerow(rnd.choice(sample_rows))
+                continue
+            
+            host = rnd.choice(hosts)
+            port = str(rnd.choice([22, 80, 443, 445, 3306, 8080, 8443]))
+            if (rnd.random() < singleton_rate):
+                (name, solution, risk) = rnd.choice(SINGLETONS)
+                row_plugin_id = str(50000 + SINGLETONS.index((name, solution, risk)))
+                cve = ""
+            else:
+                (product, title, versions, family_plugin_id) = rnd.choice(families)
+                version_index = rnd.randrange(len(versions))
+                version = versions[version_index]
+                name = product + " < " + version + " " + title
+                solution = "Upgrade to " + product + " version " + version + " or later."
+                risk = rnd.choice(RISKS)
+                row_plugin_id = str(family_plugin_id + version_index)
+                cve = "CVE-20" + str(rnd.randint(15, 24)) + "-" + str(rnd.randint(1000, 49999))
+            
+            plugin_output = "\n".join(["  Path              : /opt/app/lib/" + str(rnd.randint(0, 99)) + "/component.jar", "  Installed version : " + str(rnd.randint(1, 9)) + "." + str(rnd.randint(0, 99))] * (plugin_output_lines // 2))
+            row = [row_plugin_id, cve, str(rnd.randint(0, 100) / 10), risk, host, "tcp", port, name, "Synopsis of " + name + ".", "The remote host is affected by " + name + ".", solution, "https://example.com/advisories/" + row_plugin_id, plugin_output]
+            if (len(sample_rows) < DUP_SAMPLE_ROWS):
+                sample_rows.append(row)
+            else:
+                sample_rows[next_sample_index] = row
+                next_sample_index = (next_sample_index + 1) % DUP_SAMPLE_ROWS
+            csv_writer.writerow(row)
+
+# Decides every group without asking, accepting a fixed fraction of them, and times merge_rows.
+class BenchmarkReviewer(rm_csv_dup.MergeReviewer):
+    def __init__(self, accept_rate: float = 0.7, seed: int = 1):
+        super().__init__(None, True)
+        self.__rnd = random.Random(seed)
+        self.__accept_rate = accept_rate
+        self.merge_rows_seconds = 0.0
+        self.merge_count = 0
+    
+    def review(self, header: list, rows_to_be_merged: list, key_column_indexes: list, preview: rm_csv_dup.MergePreview = None, source_rows: list = None):
+        if (self.__rnd.random() >= self.__accept_rate):
+            return None
+        begin_time = time.perf_counter()
+        merged_row = rmdutil.merge_rows(rows_to_be_merged, source_rows = source_rows)
+        self.merge_rows_seconds += time.perf_counter() - begin_time
+        self.merge_count += 1
+        return merged_row
+
+# Runs the pipeline of rm_csv_dup.rm_dup() on a CSV file, timing every stage.
+# @return the dict of timing name -> seconds
+def benchmark_csv(csv_path: str, dest_csv_path: str) -> dict:
+    timings = {}
+    
+    begin_time = time.perf_counter()
+    (header, digested_rows) = rm_csv_dup.read_src_table(csv_path)
+    unique_rows = rmdutil.RowStore(rm_csv_dup.iter_unique_rows(digested_rows))
+    timings["exact dedup"] = time.perf_counter() - begin_time
+    
+    reviewer = BenchmarkReviewer()
+    clusterer = rm_csv_dup.MatchingPairClusterer(header, unique_rows, rm_csv_dup.KEY_COLUMN_NAMES, reviewer = reviewer)
+    result_rows = clusterer.run()
+    for (rule_str, words_matching_pair, seconds) in clusterer.stage_times:
+        timings["stage " + rule_str + ("" if (words_matching_pair is None) else " " + str(words_matching_pair))] = seconds
+    timings["merge_rows"] = reviewer.merge_rows_seconds
+    
+    begin_time = time.perf_counter()
+    with open(dest_csv_path, "w", encoding = rm_csv_dup.ENCODING, newline = "") as dest_csv_file:
+        csv_writer = csv.writer(dest_csv_file)
+        csv_writer.writerow(header)
+        for row in result_rows:
+            csv_writer.writerow(row)
+    timings["write output"] = time.perf_counter() - begin_time
+    
+    print(str(len(unique_rows)) + " unique rows, " + str(reviewer.merge_count) + " merges, " + str(len(result_rows)) + " rows written.")
+    return timings
+
+# Prints the timings of every size next to the baseline.
+# @return the number of regressions
+def report(results: dict, baseline: dict) -> int:
+    regression_count = 0
+    table = []
+    for (size, timings) in results.items():
+        baseline_timings = baseline.get(size, {})
+        for (name, seconds) in timings.items():
+            baseline_seconds = baseline_timings.get(name)
+            verdict = ""
+            baseline_cell = ""
+            if (baseline_seconds is not None):
+                baseline_cell = "%.3f" % baseline_seconds
+                if (seconds > baseline_seconds * REGRESSION_RATIO and seconds - baseline_seconds > REGRESSION_MIN_SECONDS):
+                    verdict = "REGRESSION"
+                    regression_count += 1
+            table.append([size, name, "%.3f" % seconds, baseline_cell, verdict])
+    rmdutil.print_table(["Rows", "Timing", "Seconds", "Baseline", ""], table)
+    return regression_count
+
+def main():
+    sizes = DEFAULT_SIZES
+    baseline_path = DEFAULT_BASELINE_PATH
+    save_baseline = False
+    
+    args = sys.argv[1 : len(sys.argv)]
+    i = 0
+    while (i < len(args)):
+        if (args[i] == "--sizes" and i + 1 < len(args)):
+            sizes = [int(size) for size in args[i + 1].split(",")]
+            i += 2
+        elif (args[i] == "--baseline" and i + 1 < len(args)):
+            baseline_path = args[i + 1]
+            i += 2
+        elif (args[i] == "--save-baseline"):
+            save_baseline = True
+            i += 1
+        else:
+            print("how to use: python3 rmdbench.py [--sizes 10000,100000] [--baseline ${json_path}] [--save-baseline]")
+            return 2
+    
+    baseline = {}
+    if (os.path.isfile(baseline_path)):
+        with open(baseline_path, "r", encoding = "utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in sizes:
+            csv_path = os.path.join(temp_dir, "scan_" + str(size) + ".csv")
+            print("Generating " + str(size) + " rows...")
+            generate_scan_csv(csv_path, size)
+            results[str(size)] = benchmark_csv(csv_path, os.path.join(temp_dir, "scan_" + str(size) + "_no_dup.csv"))
+    
+    regression_count = report(results, baseline)
+    
+    if (save_baseline):
+        baseline.update(results)
+        with open(baseline_path, "w", encoding = "utf-8") as baseline_file:
+            json.dump(baseline, baseline_file, indent = 2)
+        print("Baseline saved to \"" + baseline_path + "\".")
+    
+    if (regression_count > 0):
+        print(str(regression_count) + " regression(s) against the baseline.")
+        return 1
+    return 0
+
+if (__name__ == "__main__"):
+    sys.exit(main())
@@ -1,46 +1,709 @@
 # Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
 
-# Warning: supports IPv4 only
+import bisect # to search sorted keys
+import functools # to bind the params of aggregators
+import hashlib # to fingerprint merge groups
+import json # to store the key values of merge groups
+import time # to timestamp merge decisions and time the stages
+import sys # to write tables to the console
+import array # to pack IP addresses
+# The modules below are imported lazily by the code using them, so that importing this module stays fast:
+# sqlite3 to store merge decisions and incremental indexes, random to draw the MinHash permutations,
+# ipaddress to parse IPv6 addresses, and queue and threading to prepare the next items in the background.
+
+try:
+    import resource # to measure the peak memory usage, not available on Windows
+except ImportError:
+    resource = None
+
+# An IPv4 or IPv6 address, kept as an integer of 32 or 128 bits.
 class IpAddress:
+    # @throws ValueError if ip_addr_str is not an IPv4 or IPv6 address
     def __init__(self, ip_addr_str: str):
-        ip_addr_bytes = ip_addr_str.split(".")
         self.__ip_addr_str = ip_addr_str
-        self.__ip_addr_u32 = 0
+        if (":" in ip_addr_str):
+            # IPv6 has too many forms ("::", zone IDs, embedded IPv4...) to parse by hand
+            import ipaddress
+            ip_addr = ipaddress.IPv6Address(ip_addr_str)
+            self.__version = 6
+            self.__ip_addr_int = int(ip_addr)
+            return
+        
+        ip_addr_bytes = ip_addr_str.split(".")
+        if (len(ip_addr_bytes) != 4):
+            raise ValueError("\"" + ip_addr_str + "\" is not an IP address.")
+        self.__version = 4
+        self.__ip_addr_int = 0
         for i in range(4):
+            # int() alone would also take "+1", " 1" or "1_0"
+            if (not (ip_addr_bytes[i].isascii() and ip_addr_bytes[i].isdigit())):
+                raise ValueError("\"" + ip_addr_str + "\" is not an IP address.")
             byte_val = int(ip_addr_bytes[i])
+            if (byte_val > 255):
+                raise ValueError("\"" + ip_addr_str + "\" is not an IP address.")
             leftshift = 8 * (3 - i)
-            self.__ip_addr_u32 |= byte_val << leftshift
+            self.__ip_addr_int |= byte_val << leftshift
     
     def to_string(self) -> str:
         return self.__ip_addr_str
     
     def to_int(self) -> int:
-        return self.__ip_addr_u32
+        return self.__ip_addr_int
+    
+    # @return 4 or 6
+    def version(self) -> int:
+        return self.__version
+    
+    # @return 32 for IPv4, 128 for IPv6
+    def bit_count(self) -> int:
+        return (32 if (self.__version == 4) else 128)
     
     def equal(self, opponent: "IpAddress") -> bool:
-        return self.__ip_addr_u32 == opponent.__ip_addr_u32
+        return self.__version == opponent.__version and self.__ip_addr_int == opponent.__ip_addr_int
+    
+    # @return the first masklen bits of the address, which are the same for all the addresses in the same subnet
+    def network_int(self, masklen: int) -> int:
+        masklen = min(max(masklen, 0), self.bit_count())
+        return self.__ip_addr_int >> (self.bit_count() - masklen)
     
+    # @return true if both addresses are in the same subnet of masklen bits
     def similar(self, opponent: "IpAddress", masklen: int) -> bool:
-        if (masklen <= 0):
-            return True
-        if (masklen >= 32):
-            return self.equal(opponent)
-        
-        my_addr = self.__ip_addr_u32
-        op_addr = opponent.__ip_addr_u32
-        
-        for i in range(masklen):
-            bitmask = 0x80000000
-            if ((my_addr & bitmask) != (op_addr & bitmask)):
-                return False
-            my_addr <<= 1
-            op_addr <<= 1
+        if (self.__version != opponent.__version):
+            return False
+        return self.network_int(masklen) == opponent.network_int(masklen)
+
+# @return the IpAddress of ip_addr_str, or None if it is not an IP address, e.g. a host name
+def parse_ip_address(ip_addr_str: str):
+    try:
+        return IpAddress(ip_addr_str.strip())
+    except ValueError:
+        return None
+
+# The IP addresses of a column packed into arrays, so that millions of hosts don't cost millions of objects.
+# Every row gets its address as a version byte (0 if the cell is not an IP address) and 2 unsigned 64-bit halves.
+# Rows are bucketed by subnet with subnet_key(), which is a hashable key made of the masked address.
+class IpAddressArray:
+    def __init__(self):
+        # row ID -> 4, 6, or 0 if the cell is not an IP address
+        self.__versions = bytearray()
+        # row ID -> the upper and lower 64 bits of the address (an IPv4 address only has lower bits)
+        self.__highs = array.array("Q")
+        self.__lows = array.array("Q")
+        # cell value -> (version, high, low), since the same hosts appear in many rows
+        self.__memo = {}
+    
+    # @return the row ID of the added cell
+    def append(self, cell_val: str) -> int:
+        packed = self.__memo.get(cell_val)
+        if (packed is None):
+            ip_addr = parse_ip_address(cell_val)
+            if (ip_addr is None):
+                packed = (0, 0, 0)
+            else:
+                ip_addr_int = ip_addr.to_int()
+                packed = (ip_addr.version(), ip_addr_int >> 64, ip_addr_int & 0xFFFFFFFFFFFFFFFF)
+            self.__memo[cell_val] = packed
+        self.__versions.append(packed[0])
+        self.__highs.append(packed[1])
+        self.__lows.append(packed[2])
+        return len(self.__versions) - 1
+    
+    # @return true if the cell of the row is an IP address
+    def is_ip_address(self, row_id: int) -> bool:
+        return self.__versions[row_id] != 0
+    
+    # @param ipv4_masklen The number of leading bits of an IPv4 subnet, e.g. 24 for a /24.
+    # @param ipv6_masklen The number of leading bits of an IPv6 subnet, e.g. 64 for a /64.
+    # @return the (version, masked address) of the subnet of the row, or None if the cell is not an IP address
+    def subnet_key(self, row_id: int, ipv4_masklen: int, ipv6_masklen: int):
+        version = self.__versions[row_id]
+        if (version == 4):
+            return (4, self.__lows[row_id] >> (32 - ipv4_masklen))
+        if (version == 6):
+            if (ipv6_masklen <= 64):
+                return (6, self.__highs[row_id] >> (64 - ipv6_masklen))
+            return (6, self.__highs[row_id], self.__lows[row_id] >> (128 - ipv6_masklen))
+        return None
+
+# the code of the empty string in every column of a RowStore
+EMPTY_CODE = 0
+
+# A table kept column by column.  Every column is an array of integer codes into a pool of the distinct strings of the
+# column, so that a repetitive column (e.g. Risk, Protocol, Port or Solution) costs 4 bytes per row instead of a
+# reference to its own copy of the same string, and no row needs a list of its own.
+# store[row_id] is a RowHandle, which reads like the list of the cells of the row.
+class RowStore:
+    # @param rows The rows to be appended at once
+    def __init__(self, rows = ()):
+        # column index -> the distinct strings of the column, where pools[columnIndex][code] == cell
+        self.__pools = []
+        # column index -> cell -> code
+        self.__codes_of_cells = []
+        # column index -> array of codes, where columns[columnIndex][rowId] == code
+        self.__columns = []
+        # row ID -> the number of cells of the row, since the rows of a CSV file may have different lengths
+        self.__lengths = array.array("I")
+        for row in rows:
+            self.append(row)
+    
+    def __len__(self) -> int:
+        return len(self.__lengths)
+    
+    def __getitem__(self, row_id: int) -> "RowHandle":
+        return RowHandle(self, row_id)
+    
+    def __iter__(self):
+        for row_id in range(len(self.__lengths)):
+            yield RowHandle(self, row_id)
+    
+    # Makes sure there are at least column_count columns, so that column() can read a column no row has reached yet.
+    def reserve_columns(self, column_count: int):
+        while (len(self.__columns) < column_count):
+            # the rows before have no such cell, which reads as empty
+            self.__pools.append([""])
+            self.__codes_of_cells.append({"": EMPTY_CODE})
+            self.__columns.append(array.array("I", bytes(4 * len(self.__lengths))))
+    
+    # @return the row ID of the appended row
+    def append(self, row) -> int:
+        row_id = len(self.__lengths)
+        if (len(self.__columns) < len(row)):
+            self.reserve_columns(len(row))
+        for i in range(len(self.__columns)):
+            cell_val = (row[i] if (i < len(row)) else "")
+            codes_of_cells = self.__codes_of_cells[i]
+            code = codes_of_cells.get(cell_val)
+            if (code is None):
+                pool = self.__pools[i]
+                code = len(pool)
+                pool.append(cell_val)
+                codes_of_cells[cell_val] = code
+            self.__columns[i].append(code)
+        self.__lengths.append(len(row))
+        return row_id
+    
+    def cell(self, row_id: int, column_index: int) -> str:
+        if (column_index >= self.__lengths[row_id]):
+            raise IndexError("row " + str(row_id) + " has no column " + str(column_index))
+        return self.__pools[column_index][self.__columns[column_index][row_id]]
+    
+    # @return the cells of the row as a new list
+    def row(self, row_id: int) -> list:
+        return [self.__pools[i][self.__columns[i][row_id]] for i in range(self.__lengths[row_id])]
+    
+    def row_length(self, row_id: int) -> int:
+        return self.__lengths[row_id]
+    
+    # @return (codes, pool) of a column, where pool[codes[rowId]] == cell, for the loops reading one column of many rows
+    def column(self, column_index: int) -> tuple:
+        return (self.__columns[column_index], self.__pools[column_index])
+    
+    # @return the number of distinct strings of a column
+    def pool_size(self, column_index: int) -> int:
+        return len(self.__pools[column_index])
+
+# A row of a RowStore, which reads like the list of its cells (by index, slice, len() and iteration) without copying them.
+class RowHandle:
+    __slots__ = ("store", "row_id")
+    
+    def __init__(self, store: RowStore, row_id: int):
+        self.store = store
+        self.row_id = row_id
+    
+    def __len__(self) -> int:
+        return self.store.row_length(self.row_id)
+    
+    def __getitem__(self, index):
+        if (isinstance(index, slice)):
+            return self.store.row(self.row_id)[index]
+        if (index < 0):
+            index += self.store.row_length(self.row_id)
+            if (index < 0):
+                raise IndexError("row index out of range")
+        return self.store.cell(self.row_id, index)
+    
+    def __iter__(self):
+        return iter(self.store.row(self.row_id))
+    
+    def __eq__(self, other) -> bool:
+        if (isinstance(other, RowHandle)):
+            return (self.store is other.store and self.row_id == other.row_id) or self.store.row(self.row_id) == other.store.row(other.row_id)
+        return self.store.row(self.row_id) == other
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return repr(self.store.row(self.row_id))
+
+# @return the smallest string that is greater than every string starting with prefix_str, or None if there is no such string
+def prefix_upper_bound(prefix_str: str):
+    MAX_CHAR = chr(0x10FFFF)
+    # characters already at the maximum code point cannot be incremented, drop them
+    prefix_str = prefix_str.rstrip(MAX_CHAR)
+    if (prefix_str == ""):
+        return None
+    return prefix_str[0 : len(prefix_str) - 1] + chr(ord(prefix_str[-1]) + 1)
+
+# Sorts the keys of a table once (both as they are and reversed), so that the rows whose key starts with or ends with
+# a given string can be found by binary search instead of scanning the whole table.
+class KeyIndex:
+    # the smallest number of inserted entries kept apart before they are merged into the sorted entries
+    MIN_PENDING_ENTRIES = 1024
+    # up to PENDING_ENTRIES_FACTOR * sqrt(the number of sorted entries) inserted entries are kept apart, which balances
+    # the cost of a compaction (rebuilding the sorted entries) with the cost of inserting into the pending entries
+    PENDING_ENTRIES_FACTOR = 64
+    
+    # @param keys The normalized key of every row, where keys[rowIndex] == key
+    # @param row_indexes The row index of every key, where keys[i] is the key of row row_indexes[i], None if keys[rowIndex] == key
+    def __init__(self, keys: list, row_indexes: list = None):
+        if (row_indexes is None):
+            row_indexes = range(len(keys))
+        self.__prefix_entries = sorted(zip(keys, row_indexes))
+        self.__suffix_entries = sorted(zip([key[::-1] for key in keys], row_indexes))
+        # the entries inserted since the last compaction are kept apart, so that an insertion doesn't move the whole index
+        self.__pending_prefix_entries = []
+        self.__pending_suffix_entries = []
+        # the rows removed since the last compaction, whose entries are still in the index
+        self.__removed_row_indexes = set()
+    
+    def insert(self, key: str, row_index: int):
+        bisect.insort(self.__pending_prefix_entries, (key, row_index))
+        bisect.insort(self.__pending_suffix_entries, (key[::-1], row_index))
+        pending_count = len(self.__pending_prefix_entries)
+        if (pending_count > KeyIndex.MIN_PENDING_ENTRIES and pending_count * pending_count > KeyIndex.PENDING_ENTRIES_FACTOR * KeyIndex.PENDING_ENTRIES_FACTOR * len(self.__prefix_entries)):
+            self.__compact()
+    
+    # Removes the entries of a row.  They are only dropped by the next compaction, and skipped by lookup() until then.
+    def remove(self, row_index: int):
+        self.__removed_row_indexes.add(row_index)
+        if (len(self.__removed_row_indexes) * 2 > len(self.__prefix_entries) + len(self.__pending_prefix_entries)):
+            self.__compact()
+    
+    # Drops the entries of the removed rows, and merges the pending entries into the sorted entries.
+    def __compact(self):
+        removed_row_indexes = self.__removed_row_indexes
+        self.__prefix_entries = [entry for entry in self.__prefix_entries + self.__pending_prefix_entries if entry[1] not in removed_row_indexes]
+        self.__suffix_entries = [entry for entry in self.__suffix_entries + self.__pending_suffix_entries if entry[1] not in removed_row_indexes]
+        # both parts are already sorted, so sorting only merges them
+        self.__prefix_entries.sort()
+        self.__suffix_entries.sort()
+        self.__pending_prefix_entries = []
+        self.__pending_suffix_entries = []
+        self.__removed_row_indexes = set()
+    
+    # @return the (begin, end) slice of entries whose first item starts with prefix_str
+    @staticmethod
+    def __find_range(entries: list, prefix_str: str) -> tuple:
+        begin = bisect.bisect_left(entries, (prefix_str,))
+        upper_bound = prefix_upper_bound(prefix_str)
+        if (upper_bound is None):
+            end = len(entries)
+        else:
+            end = bisect.bisect_left(entries, (upper_bound,), begin)
+        return (begin, end)
+    
+    # @return the indexes of the rows whose key may start with begin_str and end with end_str.
+    # Only the more selective of both conditions is guaranteed to hold, so callers still have to compare the keys.
+    def lookup(self, begin_str: str, end_str: str) -> list:
+        prefix_ranges = [KeyIndex.__find_range(self.__prefix_entries, begin_str), KeyIndex.__find_range(self.__pending_prefix_entries, begin_str)]
+        suffix_ranges = [KeyIndex.__find_range(self.__suffix_entries, end_str[::-1]), KeyIndex.__find_range(self.__pending_suffix_entries, end_str[::-1])]
+        prefix_count = sum([end - begin for (begin, end) in prefix_ranges])
+        suffix_count = sum([end - begin for (begin, end) in suffix_ranges])
+        if (prefix_count <= suffix_count):
+            entries_ranges = [(self.__prefix_entries, prefix_ranges[0]), (self.__pending_prefix_entries, prefix_ranges[1])]
+        else:
+            entries_ranges = [(self.__suffix_entries, suffix_ranges[0]), (self.__pending_suffix_entries, suffix_ranges[1])]
         
-        return True
+        removed_row_indexes = self.__removed_row_indexes
+        row_indexes = []
+        for (entries, (begin, end)) in entries_ranges:
+            row_indexes.extend(row_index for (key, row_index) in entries[begin : end] if row_index not in removed_row_indexes)
+        return row_indexes
+
+# The normalized key of a cell, with its leading and trailing words joined back into strings on first use.
+class NormalizedKey:
+    __slots__ = ("key", "prefixes", "suffixes", "shingles")
+    
+    def __init__(self, key: str):
+        self.key = key
+        # prefixes[n] is the string of the first n words of the key, None until requested
+        self.prefixes = None
+        # suffixes[n] is the string of the last n words of the key, None until requested
+        self.suffixes = None
+        # the set of word shingles of the key, None until requested
+        self.shingles = None
+
+# Normalizes (and case-folds) the key of every row once, so that the matching stages don't have to lowercase, split
+# and join the same key again for every comparison.  Rows sharing the same cell value share the same NormalizedKey.
+class NormalizedKeyStore:
+    # @param max_words_count The largest number of leading or trailing words that will be requested
+    def __init__(self, ignore_case: bool, key_splitter: str, max_words_count: int):
+        self.__ignore_case = ignore_case
+        self.__key_splitter = key_splitter
+        self.__max_words_count = max_words_count
+        # row ID -> NormalizedKey, None for rows that were dropped
+        self.__entries = []
+        # cell value -> NormalizedKey
+        self.__memo = {}
+    
+    # @param normalized_key_str The key already normalized by a previous run, None to normalize key_str.
+    # @return the row ID of the added key
+    def add(self, key_str: str, normalized_key_str: str = None) -> int:
+        entry = self.__memo.get(key_str)
+        if (entry is None):
+            if (normalized_key_str is None):
+                normalized_key_str = (key_str.lower() if self.__ignore_case else key_str)
+            entry = NormalizedKey(normalized_key_str)
+            self.__memo[key_str] = entry
+        self.__entries.append(entry)
+        return len(self.__entries) - 1
+    
+    # Forgets the key of a row that will never be compared again.
+    def drop(self, row_id: int):
+        self.__entries[row_id] = None
+    
+    def key(self, row_id: int) -> str:
+        return self.__entries[row_id].key
+    
+    # @return the (begin_str, end_str) made of the first words_matching_pair[0] and the last words_matching_pair[1] words of the key
+    def affixes(self, row_id: int, words_matching_pair: tuple) -> tuple:
+        entry = self.__entries[row_id]
+        if (entry.prefixes is None):
+            # tokenize the key only once, and prepare the affixes for every words count
+            key_words = entry.key.split(self.__key_splitter)
+            key_words_count = len(key_words)
+            prefixes = []
+            suffixes = []
+            for words_count in range(self.__max_words_count + 1):
+                # cap it to the length of key words
+                if (words_count > key_words_count):
+                    words_count = key_words_count
+                prefixes.append(self.__key_splitter.join(key_words[0 : words_count]))
+                suffixes.append(self.__key_splitter.join(key_words[key_words_count - words_count : key_words_count]))
+            entry.prefixes = prefixes
+            entry.suffixes = suffixes
+        return (entry.prefixes[words_matching_pair[0]], entry.suffixes[words_matching_pair[1]])
+    
+    # @return the set of the shingles of shingle_words consecutive words of the key, see get_word_shingles()
+    def shingles(self, row_id: int, shingle_words: int) -> frozenset:
+        entry = self.__entries[row_id]
+        if (entry.shingles is None):
+            entry.shingles = get_word_shingles(entry.key, self.__key_splitter, shingle_words)
+        return entry.shingles
+
+# @return the set of every shingle_words consecutive words of the key (the whole key if it is shorter), empty for an empty key
+def get_word_shingles(key_str: str, key_splitter: str = " ", shingle_words: int = 1) -> frozenset:
+    key_words = [word for word in key_str.split(key_splitter) if word != ""]
+    if (len(key_words) <= shingle_words):
+        return frozenset([key_splitter.join(key_words)] if len(key_words) > 0 else [])
+    return frozenset(key_splitter.join(key_words[i : i + shingle_words]) for i in range(len(key_words) - shingle_words + 1))
+
+# @return the Jaccard similarity of 2 sets, i.e. the size of their intersection over the size of their union
+def get_jaccard_similarity(set_a: frozenset, set_b: frozenset) -> float:
+    if (len(set_a) == 0 and len(set_b) == 0):
+        return 0.0
+    intersection_size = len(set_a & set_b)
+    return intersection_size / (len(set_a) + len(set_b) - intersection_size)
+
+# Chooses how to cut a MinHash signature into LSH bands.
+# Fewer, longer bands make fewer false candidates below the threshold, but miss more keys above it.  A false candidate
+# only costs a get_jaccard_similarity() check, while a missed key is a duplicate never shown to the user, so the bands
+# are chosen to be as long as possible while 2 keys with a Jaccard similarity of threshold still become candidates
+# with a probability of at least min_recall.
+# @return (band_count, band_rows)
+def get_lsh_bands(threshold: float, signature_size: int, min_recall: float = 0.99) -> tuple:
+    for band_rows in range(signature_size, 0, -1):
+        band_count = signature_size // band_rows
+        # the probability that 2 keys with a similarity of threshold share at least one band
+        if (1.0 - (1.0 - threshold ** band_rows) ** band_count >= min_recall):
+            return (band_count, band_rows)
+    return (signature_size, 1)
+
+# Finds the keys that probably share at least threshold of their shingles (Jaccard similarity) without comparing every
+# pair of keys.  Every key gets a MinHash signature, which is cut into LSH bands, and keys sharing any whole band are
+# candidates.  The candidates still have to be checked with get_jaccard_similarity(), since LSH is only approximate.
+class MinHashIndex:
+    # the modulus of the permutations (a Mersenne prime), larger than any 8-byte shingle hash
+    PRIME = (1 << 61) - 1
+    
+    # @param signature_size The number of hash permutations, more is slower but more accurate
+    # @param seed The seed of the permutations, fixed so that the same keys always become candidates
+    def __init__(self, threshold: float, signature_size: int = 128, seed: int = 1):
+        import random
+        rnd = random.Random(seed)
+        self.__permutations = [(rnd.randrange(1, MinHashIndex.PRIME), rnd.randrange(0, MinHashIndex.PRIME)) for i in range(signature_size)]
+        (self.__band_count, self.__band_rows) = get_lsh_bands(threshold, signature_size)
+        # band index -> {band values -> sets of shingles}
+        self.__buckets = [{} for i in range(self.__band_count)]
+        # set of shingles -> the row IDs of its keys, so that the rows sharing the same key are only indexed once
+        self.__row_ids = {}
+        # shingle -> its hash under every permutation, since the same words appear in many keys
+        self.__shingle_hashes = {}
+    
+    # @return the MinHash signature of a non-empty set of shingles
+    def signature(self, shingles: frozenset) -> list:
+        shingle_hashes = []
+        for shingle in shingles:
+            permuted_hashes = self.__shingle_hashes.get(shingle)
+            if (permuted_hashes is None):
+                shingle_hash = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8", "surrogatepass"), digest_size = 8).digest(), "little")
+                permuted_hashes = [(a * shingle_hash + b) % MinHashIndex.PRIME for (a, b) in self.__permutations]
+                self.__shingle_hashes[shingle] = permuted_hashes
+            shingle_hashes.append(permuted_hashes)
+        if (len(shingle_hashes) == 1):
+            return shingle_hashes[0]
+        return list(map(min, zip(*shingle_hashes)))
+    
+    # @return the band values of every band of the signature
+    def __bands(self, shingles: frozenset) -> list:
+        signature = self.signature(shingles)
+        band_rows = self.__band_rows
+        return [tuple(signature[i * band_rows : (i + 1) * band_rows]) for i in range(self.__band_count)]
+    
+    # Adds a key.  Keys without shingles are never added, so they never become candidates.
+    def insert(self, shingles: frozenset, row_id: int):
+        if (len(shingles) == 0):
+            return
+        row_ids = self.__row_ids.get(shingles)
+        if (row_ids is not None):
+            row_ids.append(row_id)
+            return
+        self.__row_ids[shingles] = [row_id]
+        for (buckets, band) in zip(self.__buckets, self.__bands(shingles)):
+            bucket = buckets.get(band)
+            if (bucket is None):
+                buckets[band] = [shingles]
+            else:
+                bucket.append(shingles)
+    
+    # @return a list of (candidate shingles, the row IDs of their keys) for every set of shingles sharing any band with the shingles
+    def lookup(self, shingles: frozenset) -> list:
+        if (len(shingles) == 0):
+            return []
+        candidate_shingles_set = set()
+        for (buckets, band) in zip(self.__buckets, self.__bands(shingles)):
+            bucket = buckets.get(band)
+            if (bucket is not None):
+                candidate_shingles_set.update(bucket)
+        return [(candidate_shingles, self.__row_ids[candidate_shingles]) for candidate_shingles in candidate_shingles_set]
+
+# Remembers on disk whether the user accepted or rejected merging a group of rows, so that the same group doesn't have
+# to be reviewed again on the next run.  A group is identified by its key column and the set of its key values.
+class MergeDecisionStore:
+    def __init__(self, db_path: str):
+        import sqlite3
+        self.__connection = sqlite3.connect(db_path)
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS merge_decisions (fingerprint TEXT PRIMARY KEY, column_name TEXT, key_values TEXT, merge INTEGER, decided_at TEXT)")
+        self.__connection.commit()
+    
+    # @return a stable fingerprint of the group, independent of the order of its rows
+    @staticmethod
+    def fingerprint(column_name: str, key_values: list) -> str:
+        key_values = sorted(set(key_values))
+        return hashlib.sha256(json.dumps([column_name, key_values]).encode("utf-8")).hexdigest()
+    
+    # @return True if the group was merged before, False if it was rejected, None if it was never decided
+    def get(self, fingerprint: str):
+        result = self.__connection.execute("SELECT merge FROM merge_decisions WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if (result is None):
+            return None
+        return (result[0] != 0)
+    
+    # Saves the decision immediately, so that it survives if the program is interrupted.
+    def put(self, fingerprint: str, column_name: str, key_values: list, merge: bool):
+        self.__connection.execute("INSERT OR REPLACE INTO merge_decisions VALUES (?, ?, ?, ?, ?)", (fingerprint, column_name, json.dumps(sorted(set(key_values))), (1 if merge else 0), time.strftime("%Y-%m-%d %H:%M:%S")))
+        self.__connection.commit()
+    
+    def close(self):
+        self.__connection.close()
+
+# Keeps what a previous run has produced next to its destination CSV file, so that the next run over a cumulative source
+# only has to deal with the rows it has never seen: the digests of all the source rows processed so far, and the
+# output rows (every merged group is one output row) with the normalized keys of their key columns.
+class IncrementalIndex:
+    def __init__(self, index_path: str):
+        import sqlite3
+        self.__connection = sqlite3.connect(index_path)
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS seen_rows (digest BLOB PRIMARY KEY)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS output_rows (row_id INTEGER PRIMARY KEY, row TEXT, normalized_keys TEXT)")
+        self.__connection.commit()
+    
+    # @return True if the index was saved by a run with the same header and key columns
+    def is_compatible(self, header: list, key_column_names: list) -> bool:
+        result = self.__connection.execute("SELECT value FROM meta WHERE name = 'layout'").fetchone()
+        return (result is not None and json.loads(result[0]) == [header, key_column_names])
+    
+    # @return the set of the digests of all the source rows processed so far
+    def load_seen_digests(self) -> set:
+        return set(digest for (digest,) in self.__connection.execute("SELECT digest FROM seen_rows"))
+    
+    # @return (rows, normalized_keys), where normalized_keys[rowIndex][keyColumnIndex] == normalized key
+    def load_output_rows(self) -> tuple:
+        rows = []
+        normalized_keys = []
+        for (row_json, normalized_keys_json) in self.__connection.execute("SELECT row, normalized_keys FROM output_rows ORDER BY row_id"):
+            rows.append(json.loads(row_json))
+            normalized_keys.append(json.loads(normalized_keys_json))
+        return (rows, normalized_keys)
+    
+    # Replaces the output rows, and adds the digests of the new source rows, in one transaction.
+    def save(self, header: list, key_column_names: list, new_digests: list, output_rows: list, output_normalized_keys: list):
+        with self.__connection:
+            if (not self.is_compatible(header, key_column_names)):
+                self.__connection.execute("DELETE FROM seen_rows")
+            self.__connection.execute("INSERT OR REPLACE INTO meta VALUES ('layout', ?)", (json.dumps([header, key_column_names]),))
+            self.__connection.executemany("INSERT OR IGNORE INTO seen_rows VALUES (?)", [(digest,) for digest in new_digests])
+            self.__connection.execute("DELETE FROM output_rows")
+            self.__connection.executemany("INSERT INTO output_rows VALUES (?, ?, ?)", [(i, json.dumps(list(output_rows[i])), json.dumps(output_normalized_keys[i])) for i in range(len(output_rows))])
+    
+    def close(self):
+        self.__connection.close()
+
+# the total seconds spent waiting for the user to answer a question
+input_wait_seconds = 0.0
+
+# Asks the user like input(), and adds the time spent waiting for the answer to input_wait_seconds.
+def wait_for_input(prompt: str) -> str:
+    global input_wait_seconds
+    begin_time = time.perf_counter()
+    try:
+        return input(prompt)
+    finally:
+        input_wait_seconds += time.perf_counter() - begin_time
+
+# @return the peak resident set size of this process (and of its finished worker processes, if larger) in bytes, or None if it cannot be measured
+def get_peak_rss_bytes():
+    if (resource is None):
+        return None
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS, and in KB elsewhere
+    if (sys.platform == "darwin"):
+        return peak_rss
+    return peak_rss * 1024
+
+# @return the CPU time of this process, plus the CPU time of its worker processes which have ended (e.g. the workers of
+# --jobs), if the platform can measure them, see CHILDREN_CPU_MEASURED
+def get_cpu_seconds() -> float:
+    cpu_seconds = time.process_time()
+    if (resource is not None):
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_seconds += children_usage.ru_utime + children_usage.ru_stime
+    return cpu_seconds
+
+# true if get_cpu_seconds() includes the worker processes, false if it only measures this process (e.g. on Windows)
+CHILDREN_CPU_MEASURED = (resource is not None)
+
+# Measures where the time of a run goes.
+# Every stage records its wall time, CPU time and the time spent waiting for the user, so that the compute time of a
+# stage is its wall time without the think time of the user.  The matching stages also record how many keys they
+# compared and the sizes of the groups they found.
+class RunStats:
+    def __init__(self):
+        self.__begin_wall_time = time.perf_counter()
+        self.__begin_cpu_time = get_cpu_seconds()
+        self.__begin_input_wait_seconds = input_wait_seconds
+        self.__stage = None
+        # every stage as a dict, in the order they run
+        self.stages = []
+        self.rows_in = 0
+        self.unique_rows = 0
+        self.rows_out = 0
+        self.merge_rows_seconds = 0.0
+        self.merge_rows_count = 0
+    
+    def begin_stage(self, name: str):
+        self.end_stage()
+        self.__stage = {"name": name, "comparisons": 0, "group_sizes": {}}
+        self.__stage_begin_times = (time.perf_counter(), get_cpu_seconds(), input_wait_seconds)
+    
+    # Ends the current stage, if any.
+    def end_stage(self):
+        if (self.__stage is None):
+            return
+        (begin_wall_time, begin_cpu_time, begin_input_wait_seconds) = self.__stage_begin_times
+        self.__stage["wall_seconds"] = time.perf_counter() - begin_wall_time
+        self.__stage["cpu_seconds"] = get_cpu_seconds() - begin_cpu_time
+        self.__stage["think_seconds"] = input_wait_seconds - begin_input_wait_seconds
+        self.__stage["compute_seconds"] = self.__stage["wall_seconds"] - self.__stage["think_seconds"]
+        self.stages.append(self.__stage)
+        self.__stage = None
+    
+    # Counts the keys compared by the current stage.
+    def add_comparisons(self, count: int):
+        if (self.__stage is not None):
+            self.__stage["comparisons"] += count
+    
+    # Counts a group of similar rows found by the current stage.
+    def add_group(self, size: int):
+        if (self.__stage is not None):
+            group_sizes = self.__stage["group_sizes"]
+            group_sizes[size] = group_sizes.get(size, 0) + 1
+    
+    # @return merge_rows(rows, column_aggregators = column_aggregators, source_rows = source_rows), timed
+    def merge_rows(self, rows: list, column_aggregators: dict = None, source_rows: list = None) -> list:
+        begin_time = time.perf_counter()
+        merged_row = merge_rows(rows, column_aggregators = column_aggregators, source_rows = source_rows)
+        self.merge_rows_seconds += time.perf_counter() - begin_time
+        self.merge_rows_count += 1
+        return merged_row
+    
+    # Counts a call of merge_rows() timed elsewhere, e.g. in a background thread.
+    def add_merge_rows(self, seconds: float):
+        self.merge_rows_seconds += seconds
+        self.merge_rows_count += 1
+    
+    # @return all the measurements as a dict, which can be dumped as JSON
+    def to_dict(self) -> dict:
+        self.end_stage()
+        wall_seconds = time.perf_counter() - self.__begin_wall_time
+        think_seconds = input_wait_seconds - self.__begin_input_wait_seconds
+        stages = []
+        for stage in self.stages:
+            stage = dict(stage)
+            stage["group_sizes"] = {str(size): count for (size, count) in sorted(stage["group_sizes"].items())}
+            stages.append(stage)
+        return {
+            "rows_in": self.rows_in,
+            "unique_rows": self.unique_rows,
+            "rows_out": self.rows_out,
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": get_cpu_seconds() - self.__begin_cpu_time,
+            "cpu_includes_workers": CHILDREN_CPU_MEASURED,
+            "think_seconds": think_seconds,
+            "compute_seconds": wall_seconds - think_seconds,
+            "merge_rows_seconds": self.merge_rows_seconds,
+            "merge_rows_count": self.merge_rows_count,
+            "peak_rss_bytes": get_peak_rss_bytes(),
+            "stages": stages,
+        }
+    
+    def print_report(self):
+        stats = self.to_dict()
+        table = []
+        for stage in stats["stages"]:
+            group_sizes = [int(size) for size in stage["group_sizes"].keys()]
+            group_count = sum(stage["group_sizes"].values())
+            table.append([stage["name"], "%.3f" % stage["wall_seconds"], "%.3f" % stage["cpu_seconds"], "%.3f" % stage["think_seconds"], "%.3f" % stage["compute_seconds"], str(stage["comparisons"]), str(group_count), str(max(group_sizes, default = 0))])
+        print("")
+        cpu_title = ("CPU (s)" if stats["cpu_includes_workers"] else "CPU, parent only (s)")
+        print_table(["Stage", "Wall (s)", cpu_title, "Think (s)", "Compute (s)", "Comparisons", "Groups", "Max Group"], table)
+        print("Rows in: " + str(stats["rows_in"]) + ", unique: " + str(stats["unique_rows"]) + ", out: " + str(stats["rows_out"]))
+        cpu_name = ("CPU" if stats["cpu_includes_workers"] else "CPU of this process only")
+        print("Wall: %.3f s, %s: %.3f s, think: %.3f s, compute: %.3f s" % (stats["wall_seconds"], cpu_name, stats["cpu_seconds"], stats["think_seconds"], stats["compute_seconds"]))
+        print("merge_rows: %.3f s over %d call(s)" % (stats["merge_rows_seconds"], stats["merge_rows_count"]))
+        if (stats["peak_rss_bytes"] is None):
+            print("Peak RSS: not available on this platform")
+        else:
+            print("Peak RSS: %.1f MB" % (stats["peak_rss_bytes"] / (1024 * 1024)))
+    
+    def save_json(self, json_path: str):
+        with open(json_path, "w", encoding = "utf-8") as json_file:
+            json.dump(self.to_dict(), json_file, indent = 2)
 
 def ask_user(question: str) -> bool:
     while True:
-        user_input = input(question)
+        user_input = wait_for_input(question)
         user_input = user_input.lower()
         if (user_input == "n"):
             return False
@@ -60,157 +723,343 @@ def remove_duplicates(raw_data: list) -> list:
 def serialize_list(l: list, sep: str = ", ") -> str:
     return sep.join(remove_duplicates(l))
 
+# The aggregators below turn the values of one column of the rows being merged into the merged cell.
+# Every aggregator takes (values, sep), where values is an iterator over the cells of the column, read only once.
+# Empty cells are ignored by all of them.
+
+# @param max_values If there are more distinct values, only the first max_values are kept, followed by how many are left out.
+# @return the distinct values in the order they first appear, joined by sep
+def aggregate_union(values, sep: str = ", ", max_values: int = None) -> str:
+    distinct_values = dict.fromkeys(values)
+    distinct_values.pop("", None)
+    if (max_values is not None and len(distinct_values) > max_values):
+        kept_values = []
+        for value in distinct_values:
+            if (len(kept_values) >= max_values):
+                break
+            kept_values.append(value)
+        return sep.join(kept_values) + sep + "... (" + str(len(distinct_values) - max_values) + " more)"
+    return sep.join(distinct_values)
+
+# @return the number of distinct values
+def aggregate_count(values, sep: str = ", ") -> str:
+    distinct_values = set(values)
+    distinct_values.discard("")
+    return str(len(distinct_values))
+
+# @return the smallest (largest if largest is True) value, compared as numbers if all of them are numbers (e.g. CVSS
+# scores), or as strings otherwise (e.g. dates like 20250813), or an empty string if there are no values
+def aggregate_min(values, sep: str = ", ", largest: bool = False) -> str:
+    best_value = None
+    best_number_value = None
+    best_number = None
+    all_numbers = True
+    for value in values:
+        if (value == ""):
+            continue
+        if (best_value is None or (value > best_value if largest else value < best_value)):
+            best_value = value
+        if (all_numbers):
+            try:
+                number = float(value)
+            except ValueError:
+                all_numbers = False
+                continue
+            if (best_number is None or (number > best_number if largest else number < best_number)):
+                best_number = number
+                best_number_value = value
+    if (best_value is None):
+        return ""
+    return (best_number_value if all_numbers else best_value)
+
+# @return see aggregate_min()
+def aggregate_max(values, sep: str = ", ") -> str:
+    return aggregate_min(values, sep, True)
+
+# @return the first value
+def aggregate_first(values, sep: str = ", ") -> str:
+    for value in values:
+        if (value != ""):
+            return value
+    return ""
+
+# @return all the values, including the repeated ones, joined by sep
+def aggregate_concat(values, sep: str = ", ") -> str:
+    return sep.join(value for value in values if value != "")
+
+# aggregator name -> aggregator function, "union" can be followed by "=max_values"
+AGGREGATORS = {
+    "union": aggregate_union,
+    "count": aggregate_count,
+    "min": aggregate_min,
+    "max": aggregate_max,
+    "first": aggregate_first,
+    "concat": aggregate_concat,
+}
+
+# @param aggregator_str An aggregator name, see AGGREGATORS, e.g. "max" or "union=20".
+# @return the aggregator function, or None if aggregator_str is not recognized
+def get_aggregator(aggregator_str: str):
+    (name, has_value, value) = aggregator_str.strip().partition("=")
+    name = name.strip()
+    if (name not in AGGREGATORS):
+        return None
+    if (not has_value):
+        return AGGREGATORS[name]
+    if (name != "union"):
+        return None
+    try:
+        max_values = int(value)
+    except ValueError:
+        return None
+    if (max_values <= 0):
+        return None
+    # a partial (unlike a lambda) can be passed to worker processes
+    return functools.partial(aggregate_union, max_values = max_values)
+
+# @return true if aggregating the cells aggregated by the aggregator again doesn't give the same cell as aggregating all
+# their values at once, e.g. a count of counts, or a capped union of capped unions.  A merged row merged again has to
+# aggregate the rows merged into it instead then, see merge_rows().
+def is_regrouping_sensitive(aggregator) -> bool:
+    if (aggregator is aggregate_count or aggregator is aggregate_concat):
+        return True
+    return (isinstance(aggregator, functools.partial) and aggregator.func is aggregate_union)
+
+# @return the function (column index) -> iterator of the cells of the column of the rows
+def get_column_cells_function(rows: list):
+    store = (rows[0].store if isinstance(rows[0], RowHandle) else None)
+    if (store is not None and all(isinstance(row, RowHandle) and row.store is store for row in rows)):
+        # reads every column of the group straight from its codes, without building the cells of every row
+        row_ids = [row.row_id for row in rows]
+        def iter_column_cells(i: int):
+            (codes, pool) = store.column(i)
+            return (pool[codes[row_id]] for row_id in row_ids)
+        return iter_column_cells
+    return (lambda i: (row[i] for row in rows))
+
 # combine some rows into one row
+# Every column is aggregated in one pass over the rows, straight from the cells of the rows.
 # @param rows is a 2-D table, where rows[rowIndex][columnIndex] == cell
+# @param column_aggregators The dict of column index -> aggregator function, see AGGREGATORS.  The columns not in it
+# (or all of them if None) are aggregated by aggregate_union(), i.e. their distinct non-empty values are joined by sep.
+# @param source_rows The original rows of rows, i.e. with every merged row replaced by the rows merged into it.  The
+# columns whose aggregator is_regrouping_sensitive() aggregate them instead of rows, so that merging a merged row again
+# gives the same cells (e.g. of "count" or "union=N") as merging all its rows at once.  None to aggregate rows only.
 # @return a single row, where row[columnIndex] == aggregated_cell
-def merge_rows(rows: list, sep: str = ", ") -> list:
+def merge_rows(rows: list, sep: str = ", ", column_aggregators: dict = None, source_rows: list = None) -> list:
     if (len(rows) == 0):
         # rows is empty
         return rows
     
     # the number of columns in the first row decides how many columns the resulting table has
     column_count = len(rows[0])
-    result_table = []
-    
-    # create a new dict for every column
-    for i in range(column_count):
-        result_table.append({})
     
-    for row in rows:
-        for i in range(column_count):
-            cell_val = row[i]
-            result_table[i].update({cell_val: None})
+    if (column_aggregators is None):
+        column_aggregators = {}
     
     result_row = []
+    
+    get_column_cells = get_column_cells_function(rows)
+    get_source_column_cells = None
     for i in range(column_count):
-        column_aggregated_dict = result_table[i]
-        # remove empty strings from the result table
-        column_aggregated_dict.pop("", None)
-        column_aggregated_list = list(column_aggregated_dict.keys())
-        result_row.append(serialize_list(column_aggregated_list, sep))
+        aggregator = column_aggregators.get(i, aggregate_union)
+        if (source_rows is not None and is_regrouping_sensitive(aggregator)):
+            if (get_source_column_cells is None):
+                get_source_column_cells = get_column_cells_function(source_rows)
+            result_row.append(aggregator(get_source_column_cells(i), sep))
+        else:
+            result_row.append(aggregator(get_column_cells(i), sep))
     return result_row
 
 # the maximum width we can give to one column to print to the screen
 MAX_COLUMN_WIDTH = 80
 
+# @return the text shown for a cell: its first line only, capped by MAX_COLUMN_WIDTH
+def get_cell_display_text(cell_val: str) -> str:
+    # remove '\r' characters
+    cell_val = cell_val.replace("\r", "")
+    
+    # if content is multi-line, we only show the first line
+    newline_index = cell_val.find("\n")
+    if (newline_index != -1):
+        cell_val = cell_val[0 : newline_index] + "..."
+    
+    # cap content length by MAX_COLUMN_WIDTH
+    if (len(cell_val) > MAX_COLUMN_WIDTH):
+        cell_val = cell_val[0 : MAX_COLUMN_WIDTH - 3] + "..."
+    
+    return cell_val
+
+# @return the display texts of the rows, with exactly column_count cells in every row
+def get_display_rows(rows: list, column_count: int) -> list:
+    display_rows = []
+    for row in rows:
+        display_row = [get_cell_display_text(cell_val) for cell_val in row[0 : column_count]]
+        if (len(display_row) < column_count):
+            display_row.extend([""] * (column_count - len(display_row)))
+        display_rows.append(display_row)
+    return display_rows
+
+# @return the width of every column, just wide enough for every display text in it
+def get_column_widths(display_rows: list, column_count: int) -> list:
+    column_widths = [0] * column_count
+    for display_row in display_rows:
+        for i in range(column_count):
+            cell_width = len(display_row[i])
+            if (cell_width > column_widths[i]):
+                column_widths[i] = cell_width
+    return column_widths
+
+# @param display_cells The display texts of the cells, which must fit in their columns
+# @return the row as one line, without the newline
+def format_row(display_cells: list, column_widths: list, leftmost_border: str, sep_border: str, rightmost_border: str, single_sep_char: str = " ") -> str:
+    padded_cells = []
+    for i in range(len(column_widths)):
+        padded_cells.append(single_sep_char + display_cells[i].ljust(column_widths[i], single_sep_char) + single_sep_char)
+    return leftmost_border + sep_border.join(padded_cells) + rightmost_border
+
+# @return the horizontal border as one line, without the newline
+def format_border_row(column_widths: list, leftmost_border: str, horizontal_unit_border: str, sep_border: str, rightmost_border: str) -> str:
+    return leftmost_border + sep_border.join([horizontal_unit_border * (column_width + 2) for column_width in column_widths]) + rightmost_border
+
 def print_row(cells: list, column_widths: list, leftmost_border: str, sep_border: str, rightmost_border: str, single_sep_char: str = " "):
-    leftmost = True
+    display_cells = get_display_rows([cells], len(column_widths))[0]
     for i in range(len(column_widths)):
-        if leftmost:
-            print(leftmost_border + single_sep_char, end="")
-            leftmost = False
-        else:
-            print(sep_border + single_sep_char, end="")
-        
-        content = cells[i]
-        width = column_widths[i]
-        
-        # remove '\r' characters
-        content.replace("\r", "")
-        
-        # if content is multi-line, we only show the first line
-        if (content.find("\n") != -1):
-            content = content[0 : content.find("\n")] + "..."
-        
-        content_length = len(content)
-        
-        # cap width by MAX_COLUMN_WIDTH
-        if (width > MAX_COLUMN_WIDTH):
-            width = MAX_COLUMN_WIDTH
-        
-        # cap content_length by width
-        if (content_length > width):
-            content = content[0 : width - 3] + "..."
-            content_length = len(content)
-        
-        print(content, end="")
-        
-        while (content_length < width):
-            print(" ", end="")
-            content_length += 1
-        
-        print(single_sep_char, end="")
+        # cap content length by the column width
+        if (len(display_cells[i]) > column_widths[i]):
+            display_cells[i] = display_cells[i][0 : column_widths[i] - 3] + "..."
+    sys.stdout.write(format_row(display_cells, column_widths, leftmost_border, sep_border, rightmost_border, single_sep_char) + "\n")
+
+def print_border_row(column_widths: list, leftmost_border: str, horizontal_unit_border: str, sep_border: str, rightmost_border: str):
+    sys.stdout.write(format_border_row(column_widths, leftmost_border, horizontal_unit_border, sep_border, rightmost_border) + "\n")
+
+# @param display_rows The display texts of the header (first) and the rows, see get_display_rows()
+# @return the whole table as one string, ending with a newline
+def format_display_table(display_rows: list, column_widths: list) -> str:
+    lines = []
     
-    print(rightmost_border, end="")
+    # table top bar
+    lines.append(format_border_row(column_widths, "╔", "═", "╤", "╗"))
     
-    print("") # newline
+    # header
+    lines.append(format_row(display_rows[0], column_widths, "║", "│", "║"))
+    
+    # header and data horizontal separation bar
+    data_border = format_border_row(column_widths, "╠", "═", "╪", "╣")
+    # row horizontal separation bar
+    row_border = format_border_row(column_widths, "╟", "─", "┼", "╢")
+    
+    for i in range(1, len(display_rows)):
+        lines.append(data_border if (i == 1) else row_border)
+        lines.append(format_row(display_rows[i], column_widths, "║", "│", "║"))
+    
+    # table bottom bar
+    lines.append(format_border_row(column_widths, "╚", "═", "╧", "╝"))
+    
+    lines.append("")
+    return "\n".join(lines)
 
-def print_border_row(column_widths: list, leftmost_border: str, horizontal_unit_border: str, sep_border: str, rightmost_border: str):
-    horizontal_borders = []
-    for column_width in column_widths:
-        horizontal_border = ""
-        for i in range(column_width):
-            horizontal_border += horizontal_unit_border
-        horizontal_borders.append(horizontal_border)
-    print_row(horizontal_borders, column_widths, leftmost_border, sep_border, rightmost_border, horizontal_unit_border)
+# @param rows is a 2-D table, where rows[rowIndex][columnIndex] == cell
+# @param max_rows Only the first max_rows rows are formatted, None to format all rows.
+# @return the whole table as one string, ending with a newline, or an empty string if rows is empty.  It is exactly what
+# print_table() prints without paging.
+def format_table(header: list, rows: list, max_rows: int = None) -> str:
+    if (len(rows) == 0):
+        #rows is empty
+        return ""
+    
+    shown_rows = rows
+    if (max_rows is not None and len(rows) > max_rows):
+        shown_rows = rows[0 : max_rows]
+    
+    # the number of columns in the header decides how many columns the resulting table has
+    column_count = len(header)
+    display_rows = get_display_rows([header] + shown_rows, column_count)
+    table_str = format_display_table(display_rows, get_column_widths(display_rows, column_count))
+    if (len(shown_rows) < len(rows)):
+        table_str += "... " + str(len(rows) - len(shown_rows)) + " more row(s) not shown.\n"
+    return table_str
 
+# Prints a table to the console with a single write per page.
 # @param rows is a 2-D table, where rows[rowIndex][columnIndex] == cell
-def print_table(header: list, rows: list):
+# @param max_rows Only the first max_rows rows are printed, None to print all rows.
+# @param page_rows If more than page_rows rows are printed, they are printed page by page, and the user is asked before every next page.  None to print all rows at once.
+def print_table(header: list, rows: list, max_rows: int = None, page_rows: int = None):
     if (len(rows) == 0):
         #rows is empty
         return rows
     
+    shown_rows = rows
+    if (max_rows is not None and len(rows) > max_rows):
+        shown_rows = rows[0 : max_rows]
+    
     # the number of columns in the header decides how many columns the resulting table has
     column_count = len(header)
-    column_widths = []
-    
-    # initialize the column widths with 0
-    # the value will increase if any cell needs a wider column for display
-    for i in range(column_count):
-        column_widths.append(0)
+    display_header = get_display_rows([header], column_count)[0]
+    display_rows = get_display_rows(shown_rows, column_count)
     
+    # all the pages share the same column widths
+    column_widths = get_column_widths([display_header] + display_rows, column_count)
     
-    for i in range(column_count):
-        cell_val = header[i]
-        cell_val = cell_val.replace("\r", "")
-        cell_width = len(cell_val)
-        if (cell_val.find("\n") != -1):
-            cell_val = cell_val[0 : cell_val.find("\n")] + "..."
-            cell_width = len(cell_val)
-        if (cell_width > MAX_COLUMN_WIDTH):
-            cell_val = cell_val[0 : MAX_COLUMN_WIDTH - 3] + "..."
-            cell_width = len(cell_val)
-        
-        if (cell_width > column_widths[i]):
-            column_widths[i] = cell_width
+    if (page_rows is None or page_rows <= 0):
+        page_rows = len(display_rows)
     
-    for row in rows:
-        for i in range(column_count):
-            cell_val = row[i]
-            cell_val = cell_val.replace("\r", "")
-            cell_width = len(cell_val)
-            if (cell_val.find("\n") != -1):
-                cell_val = cell_val[0 : cell_val.find("\n")] + "..."
-                cell_width = len(cell_val)
-            if (cell_width > MAX_COLUMN_WIDTH):
-                cell_val = cell_val[0 : MAX_COLUMN_WIDTH - 3] + "..."
-                cell_width = len(cell_val)
-            
-            if (cell_width > column_widths[i]):
-                column_widths[i] = cell_width
+    for page_begin in range(0, len(display_rows), page_rows):
+        page_end = min(page_begin + page_rows, len(display_rows))
+        sys.stdout.write(format_display_table([display_header] + display_rows[page_begin : page_end], column_widths))
+        if (page_end < len(display_rows)):
+            sys.stdout.flush()
+            user_input = wait_for_input("-- " + str(page_end) + " of " + str(len(display_rows)) + " rows shown, press Enter for more or q to skip the rest: ")
+            if (user_input.lower() == "q"):
+                break
     
-    # print table top bar
-    print_border_row(column_widths, "╔", "═", "╤", "╗")
+    if (len(shown_rows) < len(rows)):
+        sys.stdout.write("... " + str(len(rows) - len(shown_rows)) + " more row(s) not shown.\n")
+
+# Iterates over the items in a background thread, at most max_queued_items items ahead of the caller, so that the caller
+# gets the next item at once after it has spent a while on the previous one (e.g. waiting for the user).
+# An exception raised by the items is raised again to the caller.  The background thread stops when the caller stops
+# iterating.
+def iter_in_background(items, max_queued_items: int):
+    import queue
+    import threading
+    item_queue = queue.Queue(max_queued_items)
+    stopped = threading.Event()
     
-    # print header
-    print_row(header, column_widths, "║", "│", "║")
+    # @return true if the entry is queued, false if the caller has stopped iterating
+    def put(entry: tuple) -> bool:
+        while (not stopped.is_set()):
+            try:
+                item_queue.put(entry, timeout = 0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
     
-    first_row = True
-    # print data
-    for row in rows:
-        if first_row:
-            # print header and data horizontal separation bar
-            print_border_row(column_widths, "╠", "═", "╪", "╣")
-            first_row = False
-        else:
-            # print row horizontal separation bar
-            print_border_row(column_widths, "╟", "─", "┼", "╢")
-        
-        # print row data
-        print_row(row, column_widths, "║", "│", "║")
+    # (is_item, item or the exception raised, or None at the end) of every entry
+    def produce():
+        try:
+            for item in items:
+                if (not put((True, item))):
+                    return
+        except BaseException as exception:
+            put((False, exception))
+            return
+        put((False, None))
     
-    # print table bottom bar
-    print_border_row(column_widths, "╚", "═", "╧", "╝")
+    producer_thread = threading.Thread(target = produce, daemon = True)
+    producer_thread.start()
+    try:
+        while (True):
+            (is_item, item) = item_queue.get()
+            if (not is_item):
+                if (item is not None):
+                    raise item
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer_thread.join()
 
 def demo():
     header = ["Date", "Host", "Name"]
@@ -0,0 +1,80 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_csv_shards.py
+# @brief Checks that the shards of a CSV file parsed by --jobs give the same rows as parsing the whole file, with quoted
+# fields spanning lines and blocks.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import io # to parse the shards
+import csv # to write and parse the CSV file
+import random # to generate the rows
+import tempfile # to hold the files of a test
+import unittest # to run the tests
+import unittest.mock # to shrink the blocks read
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+
+HEADER = ["Plugin ID", "Host", "Name", "Plugin Output"]
+
+# the block sizes to look for the record boundaries with, down to a byte at a time
+SCAN_BLOCK_SIZES = [1, 7, 64, 4096]
+
+class CsvShardsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.src_csv_path = os.path.join(self.temp_dir.name, "scan.csv")
+        
+        # quoted fields with newlines, commas and doubled quotes, and complete duplicates far from each other
+        rnd = random.Random(1)
+        self.rows = []
+        for i in range(300):
+            if (i > 0 and rnd.random() < 0.2):
+                self.rows.append(rnd.choice(self.rows))
+                continue
+            plugin_output = "\n".join(["line " + str(j) + (" \"quoted\", " if (rnd.random() < 0.5) else " ") + str(rnd.randint(0, 9)) for j in range(rnd.randint(0, 4))])
+            self.rows.append([str(rnd.randint(10000, 10009)), "10.0.0." + str(rnd.randint(1, 5)), "Finding \"" + str(i % 7) + "\"", plugin_output])
+        with open(self.src_csv_path, "w", encoding = rm_csv_dup.ENCODING, newline = "") as src_csv_file:
+            csv_writer = csv.writer(src_csv_file)
+            csv_writer.writerow(HEADER)
+            csv_writer.writerows(self.rows)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    # @return the content of a file
+    def read_file(self, path: str) -> str:
+        with open(path, "r", encoding = rm_csv_dup.ENCODING, newline = "") as file:
+            return file.read()
+    
+    def test_shards_end_on_record_boundaries(self):
+        with open(self.src_csv_path, "rb") as src_csv_file:
+            src_csv_bytes = src_csv_file.read()
+        for scan_block_size in SCAN_BLOCK_SIZES:
+            for shard_count in [1, 2, 3, 8, 50]:
+                with unittest.mock.patch.object(rm_csv_dup, "SCAN_BLOCK_SIZE", scan_block_size):
+                    offsets = rm_csv_dup.find_csv_shard_offsets(self.src_csv_path, shard_count)
+                self.assertEqual(offsets, sorted(set(offsets)))
+                self.assertEqual(offsets[-1], len(src_csv_bytes))
+                
+                shard_rows = []
+                for i in range(len(offsets) - 1):
+                    shard_str = src_csv_bytes[offsets[i] : offsets[i + 1]].decode(rm_csv_dup.ENCODING)
+                    shard_rows.extend(csv.reader(io.StringIO(shard_str, newline = "")))
+                self.assertEqual(shard_rows, self.rows, (scan_block_size, shard_count))
+    
+    def test_jobs_like_one_process(self):
+        dest_csv_path = os.path.join(self.temp_dir.name, "one_process.csv")
+        rm_csv_dup.rm_dup(self.src_csv_path, dest_csv_path, exact_only = True)
+        one_process_csv = self.read_file(dest_csv_path)
+        for scan_block_size in [7, 4096]:
+            dest_csv_path = os.path.join(self.temp_dir.name, "jobs_" + str(scan_block_size) + ".csv")
+            with unittest.mock.patch.object(rm_csv_dup, "SCAN_BLOCK_SIZE", scan_block_size):
+                rm_csv_dup.rm_dup(self.src_csv_path, dest_csv_path, exact_only = True, jobs = 3)
+            self.assertEqual(self.read_file(dest_csv_path), one_process_csv, scan_block_size)
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,83 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_deduper.py
+# @brief Checks the rows handed over by Deduper to its decision function and sink.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import json # to check that the rows are plain lists
+import tempfile # to hold the decision store
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+
+HEADER = ["Name", "Host", "Solution"]
+
+ROWS = [
+    ["Apache < 2.4.58 Multiple Vulnerabilities", "10.0.0.1", "Upgrade to Apache 2.4.58 or later."],
+    ["Apache < 2.4.58 Multiple Vulnerabilities", "10.0.0.2", "Upgrade to Apache 2.4.58 or later."],
+    ["Apache < 2.4.58 Multiple Vulnerabilities", "10.0.0.2", "Upgrade to Apache 2.4.58 or later."],
+    ["OpenSSH < 9.6 Multiple Vulnerabilities", "10.0.0.1", "Upgrade to OpenSSH 9.6 or later."],
+]
+
+class DeduperTest(unittest.TestCase):
+    def test_decide_and_sink_get_lists(self):
+        decided_groups = []
+        def decide(header: list, rows_to_be_merged: list, merged_row: list) -> bool:
+            for row in rows_to_be_merged + [merged_row]:
+                self.assertIs(type(row), list)
+            # the rows can be serialized, e.g. to be logged
+            decided_groups.append(json.dumps([rows_to_be_merged, merged_row]))
+            # only merges the rows of the same product
+            return (len(set(row[0] for row in rows_to_be_merged)) == 1)
+        
+        result_rows = []
+        row_count = rm_csv_dup.Deduper(HEADER, decide = decide).run(iter(ROWS), result_rows.append)
+        self.assertGreater(len(decided_groups), 0)
+        self.assertEqual(row_count, 2)
+        self.assertEqual(result_rows, [["Apache < 2.4.58 Multiple Vulnerabilities", "10.0.0.1, 10.0.0.2", "Upgrade to Apache 2.4.58 or later."], ROWS[3]])
+        for row in result_rows:
+            self.assertIs(type(row), list)
+    
+    def test_tuple_rows(self):
+        tuple_rows = [tuple(row) for row in ROWS]
+        for deduper_options in [{"exact_only": True}, {"partition_count": 2}, {"partition_count": 2, "exact_only": True}]:
+            result_rows = []
+            with tempfile.TemporaryDirectory() as temp_dir_path:
+                rm_csv_dup.Deduper(HEADER, temp_dir_path = temp_dir_path, **deduper_options).run(iter(tuple_rows), result_rows.append)
+            self.assertEqual(result_rows, [ROWS[0], ROWS[1], ROWS[3]], deduper_options)
+            for row in result_rows:
+                self.assertIs(type(row), list)
+    
+    def test_rejected_without_decide(self):
+        result_rows = []
+        deduper = rm_csv_dup.Deduper(HEADER)
+        deduper.run(iter(ROWS), result_rows.append)
+        self.assertEqual(result_rows, [ROWS[0], ROWS[1], ROWS[3]])
+        # every distinct group (by "Name" or by "Solution", with or without the OpenSSH row) is counted once, however many stages find it
+        self.assertEqual(deduper.undecided_count, 4)
+    
+    def test_decisions_of_this_run_and_previous_runs(self):
+        with tempfile.TemporaryDirectory() as temp_dir_path:
+            decided_groups = []
+            def decide(header: list, rows_to_be_merged: list, merged_row: list) -> bool:
+                decided_groups.append(rows_to_be_merged)
+                return False
+            
+            deduper = rm_csv_dup.Deduper(HEADER, decide = decide, decisions_path = os.path.join(temp_dir_path, "decisions.db"))
+            deduper.run(iter(ROWS), lambda row: None)
+            # every distinct group is decided once, and rejected again without asking when a later stage finds it again
+            self.assertEqual(len(decided_groups), 4)
+            self.assertEqual((deduper.known_merged_count, deduper.known_rejected_count), (0, 0))
+            self.assertEqual((deduper.repeated_merged_count, deduper.repeated_rejected_count), (0, 4))
+            
+            deduper.run(iter(ROWS), lambda row: None)
+            self.assertEqual(len(decided_groups), 4)
+            self.assertEqual((deduper.known_merged_count, deduper.known_rejected_count), (0, 4))
+            self.assertEqual((deduper.repeated_merged_count, deduper.repeated_rejected_count), (0, 0))
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,26 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_ip_address.py
+# @brief Checks which hosts are parsed as IP addresses, and so grouped by subnet.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rmdutil
+
+class IpAddressTest(unittest.TestCase):
+    def test_ipv4(self):
+        self.assertEqual(rmdutil.parse_ip_address("10.0.0.1").to_int(), 0x0A000001)
+        self.assertEqual(rmdutil.parse_ip_address(" 192.168.1.255 ").to_int(), 0xC0A801FF)
+        self.assertEqual(rmdutil.parse_ip_address("::ffff:1").version(), 6)
+    
+    def test_not_ipv4(self):
+        for host_str in ["1_0.0.0.1", "+1.2.3.4", "-1.2.3.4", "1. 2.3.4", "1.2.3.4 .5", "256.1.1.1", "1.2.3", "1.2.3.4.5", "1..3.4", "host.example.com"]:
+            self.assertIsNone(rmdutil.parse_ip_address(host_str), host_str)
+
+if (__name__ == "__main__"):
+    unittest.main()
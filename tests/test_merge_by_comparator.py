@@ -0,0 +1,44 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_merge_by_comparator.py
+# @brief Checks that merge_by_column_with_comparator() lets its MergeReviewer decide every group.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+
+HEADER = ["Name", "Host"]
+
+ROWS = [
+    ["Apache < 2.4.58", "10.0.0.1"],
+    ["OpenSSH < 9.6", "10.0.0.1"],
+    ["Apache < 2.4.59", "10.0.0.2"],
+]
+
+# @return true if both names are of the same product
+def is_same_product(primary_key_str: str, row_key_str: str) -> bool:
+    return (primary_key_str.split(" ")[0] == row_key_str.split(" ")[0])
+
+class MergeByComparatorTest(unittest.TestCase):
+    def test_merged_as_decided(self):
+        decided_groups = []
+        def decide(header: list, rows_to_be_merged: list, merged_row: list) -> bool:
+            decided_groups.append(rows_to_be_merged)
+            return True
+        
+        result_table = rm_csv_dup.merge_by_column_with_comparator(HEADER, ROWS, "Name", is_same_product, rm_csv_dup.MergeReviewer(decide = decide))
+        self.assertEqual(decided_groups, [[ROWS[0], ROWS[2]]])
+        self.assertEqual(result_table, [["Apache < 2.4.58, Apache < 2.4.59", "10.0.0.1, 10.0.0.2"], ROWS[1]])
+    
+    def test_undecided_in_batch_mode(self):
+        reviewer = rm_csv_dup.MergeReviewer(batch = True)
+        self.assertEqual(rm_csv_dup.merge_by_column_with_comparator(HEADER, ROWS, "Name", is_same_product, reviewer), ROWS)
+        self.assertEqual(reviewer.undecided_count, 1)
+
+if (__name__ == "__main__"):
+    unittest.main()
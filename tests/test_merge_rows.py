@@ -0,0 +1,49 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_merge_rows.py
+# @brief Checks that merging merged rows again aggregates the same cells as merging all their rows at once, where the aggregator needs it.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+import rmdutil
+
+HEADER = ["Name", "Host", "CVE", "Risk", "Solution"]
+
+# 2 groups of 3 rows by "Name", which are merged by "Solution" into 1 row afterwards
+ROWS = [["Java < 1." + str(1 + i // 3) + " x", "h" + str(i + 1), "c" + str(i + 1), ["Low", "High", "Medium"][i % 3], "Upgrade"] for i in range(6)]
+
+class MergeRowsTest(unittest.TestCase):
+    # @return the result rows of a Deduper accepting every merge
+    def dedup(self, aggregators_str: str) -> list:
+        result_rows = []
+        deduper = rm_csv_dup.Deduper(HEADER, decide = lambda header, rows_to_be_merged, merged_row: True, column_aggregators = rm_csv_dup.parse_column_aggregators(aggregators_str))
+        deduper.run(iter(ROWS), result_rows.append)
+        return result_rows
+    
+    def test_merged_again_like_merged_at_once(self):
+        for aggregators_str in ["Host:union=2, CVE:count", "Host:concat, CVE:union, Risk:max", "Host:first, CVE:min, Risk:count"]:
+            column_aggregators = rm_csv_dup.parse_column_aggregators(aggregators_str)
+            column_index_aggregators = {HEADER.index(column_name): aggregator for (column_name, aggregator) in column_aggregators.items()}
+            self.assertEqual(self.dedup(aggregators_str), [rmdutil.merge_rows(ROWS, column_aggregators = column_index_aggregators)], aggregators_str)
+    
+    # The default union joins the cells of a merged row as they are, like merging the rows one pass after another always did,
+    # while a capped union aggregates the original rows.
+    def test_default_union_of_merged_cells(self):
+        rows = [["Java < 1.1 x", "h1", "c1", "Low", "Upgrade"], ["Java < 1.2 x", "h2", "c2", "Low", "Upgrade"], ["Python 3", "h1", "c3", "Low", "Upgrade"]]
+        for (aggregators_str, merged_host) in [("", "h1, h2, h1"), ("Host:union=5", "h1, h2")]:
+            result_rows = []
+            deduper = rm_csv_dup.Deduper(HEADER, decide = lambda header, rows_to_be_merged, merged_row: True, column_aggregators = rm_csv_dup.parse_column_aggregators(aggregators_str))
+            deduper.run(iter(rows), result_rows.append)
+            self.assertEqual(result_rows, [["Java < 1.1 x, Java < 1.2 x, Python 3", merged_host, "c1, c2, c3", "Low", "Upgrade"]], aggregators_str)
+    
+    def test_capped_union_and_count(self):
+        self.assertEqual(self.dedup("Host:union=2, CVE:count"), [["Java < 1.1 x, Java < 1.2 x", "h1, h2, ... (4 more)", "6", "Low, High, Medium", "Upgrade"]])
+
+if (__name__ == "__main__"):
+    unittest.main()
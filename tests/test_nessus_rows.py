@@ -0,0 +1,78 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_nessus_rows.py
+# @brief Checks the rows read from a .nessus file, one row per CVE like the Nessus CSV export.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import io # to read the .nessus file from memory
+import gzip # to write a compressed .nessus file
+import tempfile # to hold the files of a test
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+
+NESSUS_XML = """<?xml version="1.0" ?>
+<NessusClientData_v2>
+<Policy><policyName>Basic</policyName></Policy>
+<Report name="scan">
+<ReportHost name="10.0.0.1">
+<HostProperties><tag name="host-ip">10.0.0.1</tag></HostProperties>
+<ReportItem port="443" svc_name="www" protocol="tcp" severity="3" pluginID="100001" pluginName="Apache &lt; 2.4.58 Multiple Vulnerabilities" pluginFamily="Web Servers">
+<cvss_base_score>7.5</cvss_base_score>
+<risk_factor>High</risk_factor>
+<synopsis>The remote web server is affected by multiple vulnerabilities.</synopsis>
+<description>The version of Apache installed is prior to 2.4.58.</description>
+<solution>Upgrade to Apache version 2.4.58 or later.</solution>
+<see_also>https://httpd.apache.org/security/vulnerabilities_24.html</see_also>
+<cve>CVE-2023-31122</cve>
+<cve>CVE-2023-43622</cve>
+<plugin_output>
+  Installed version : 2.4.57
+  Fixed version     : 2.4.58
+</plugin_output>
+</ReportItem>
+<ReportItem port="0" svc_name="general" protocol="tcp" severity="0" pluginID="19506">
+<plugin_name>Nessus Scan Information</plugin_name>
+<risk_factor>None</risk_factor>
+</ReportItem>
+</ReportHost>
+<ReportHost name="10.0.0.2">
+<ReportItem port="22" svc_name="ssh" protocol="tcp" severity="2" pluginID="100002" pluginName="OpenSSH &lt; 9.6 Multiple Vulnerabilities">
+<risk_factor>Medium</risk_factor>
+<cve>CVE-2023-48795</cve>
+</ReportItem>
+</ReportHost>
+</Report>
+</NessusClientData_v2>
+"""
+
+EXPECTED_ROWS = [
+    ["100001", "CVE-2023-31122", "7.5", "High", "10.0.0.1", "tcp", "443", "Apache < 2.4.58 Multiple Vulnerabilities", "The remote web server is affected by multiple vulnerabilities.", "The version of Apache installed is prior to 2.4.58.", "Upgrade to Apache version 2.4.58 or later.", "https://httpd.apache.org/security/vulnerabilities_24.html", "\n  Installed version : 2.4.57\n  Fixed version     : 2.4.58\n"],
+    ["100001", "CVE-2023-43622", "7.5", "High", "10.0.0.1", "tcp", "443", "Apache < 2.4.58 Multiple Vulnerabilities", "The remote web server is affected by multiple vulnerabilities.", "The version of Apache installed is prior to 2.4.58.", "Upgrade to Apache version 2.4.58 or later.", "https://httpd.apache.org/security/vulnerabilities_24.html", "\n  Installed version : 2.4.57\n  Fixed version     : 2.4.58\n"],
+    ["19506", "", "", "None", "10.0.0.1", "tcp", "0", "Nessus Scan Information", "", "", "", "", ""],
+    ["100002", "CVE-2023-48795", "", "Medium", "10.0.0.2", "tcp", "22", "OpenSSH < 9.6 Multiple Vulnerabilities", "", "", "", "", ""],
+]
+
+class NessusRowsTest(unittest.TestCase):
+    def test_rows(self):
+        rows = list(rm_csv_dup.iter_nessus_file_rows(io.BytesIO(NESSUS_XML.encode("utf-8"))))
+        self.assertEqual(rows, EXPECTED_ROWS)
+        for row in rows:
+            self.assertEqual(len(row), len(rm_csv_dup.NESSUS_CSV_HEADER))
+    
+    def test_src_table(self):
+        with tempfile.TemporaryDirectory() as temp_dir_path:
+            for file_name in ["scan.nessus", "scan.nessus.gz"]:
+                src_path = os.path.join(temp_dir_path, file_name)
+                with (gzip.open(src_path, "wb") if file_name.endswith(".gz") else open(src_path, "wb")) as src_file:
+                    src_file.write(NESSUS_XML.encode("utf-8"))
+                (header, digested_rows) = rm_csv_dup.read_src_table(src_path)
+                self.assertEqual(header, rm_csv_dup.NESSUS_CSV_HEADER)
+                self.assertEqual([row for (digest, row) in digested_rows], EXPECTED_ROWS, file_name)
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_plan_apply.py
+# @brief Checks that plan then apply with every merge accepted writes the same CSV file as an interactive run accepting every merge.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to handle file I/O operations
+import io # to silence the runs
+import csv # to read the rows written
+import json # to edit the review file
+import contextlib # to silence the runs
+import tempfile # to hold the files of a test
+import unittest # to run the tests
+import unittest.mock # to answer the questions of an interactive run
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+import rmdbench
+
+class PlanApplyTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.src_csv_path = os.path.join(self.temp_dir.name, "scan.csv")
+        rmdbench.generate_scan_csv(self.src_csv_path, 600, family_size = 4)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    # @return the content of a file
+    def read_file(self, path: str) -> str:
+        with open(path, "r", encoding = rm_csv_dup.ENCODING, newline = "") as file:
+            return file.read()
+    
+    # Runs rm_dup() answering "y" to every question.
+    # @return the content of the destination CSV file
+    def run_interactive(self, **rm_dup_options) -> str:
+        dest_csv_path = os.path.join(self.temp_dir.name, "interactive.csv")
+        with unittest.mock.patch("builtins.input", return_value = "y"), contextlib.redirect_stdout(io.StringIO()):
+            rm_csv_dup.rm_dup(self.src_csv_path, dest_csv_path, lookahead_groups = 0, **rm_dup_options)
+        return self.read_file(dest_csv_path)
+    
+    # Runs plan_dup(), accepts every group of the review file (but the rejected ones), then runs apply_plan().
+    # @param rejected_group_ids A function returning the IDs of the groups to be rejected, of the groups planned
+    # @return (the groups planned, the content of the destination CSV file, the output of apply_plan())
+    def run_plan_apply(self, rejected_group_ids = lambda groups: [], **plan_options) -> tuple:
+        review_path = os.path.join(self.temp_dir.name, "review.json")
+        dest_csv_path = os.path.join(self.temp_dir.name, "applied.csv")
+        with contextlib.redirect_stdout(io.StringIO()):
+            rm_csv_dup.plan_dup(self.src_csv_path, review_path, **plan_options)
+        with open(review_path, "r", encoding = rm_csv_dup.ENCODING) as review_file:
+            review = json.load(review_file)
+        rejected_group_ids = rejected_group_ids(review["groups"])
+        for group in review["groups"]:
+            group["decision"] = (rm_csv_dup.REVIEW_DECISION_KEEP if group["id"] in rejected_group_ids else rm_csv_dup.REVIEW_DECISION_MERGE)
+        with open(review_path, "w", encoding = rm_csv_dup.ENCODING) as review_file:
+            json.dump(review, review_file)
+        
+        column_aggregators = plan_options.get("column_aggregators")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            is_applied = rm_csv_dup.apply_plan(self.src_csv_path, review_path, dest_csv_path, column_aggregators = column_aggregators)
+        self.assertTrue(is_applied)
+        return (review["groups"], self.read_file(dest_csv_path), output.getvalue())
+    
+    def test_all_merged(self):
+        (groups, applied_csv, output) = self.run_plan_apply()
+        self.assertGreater(len(groups), 0)
+        self.assertEqual(applied_csv, self.run_interactive())
+    
+    # A group merging the merged row of a rejected group is not the group reviewed, so it is left undecided, and the rows
+    # of the rejected group stay separate.
+    def test_rejected_group_merged_again(self):
+        # @return the IDs of the first group whose merged row is merged again, and of the group merging it again
+        def get_chained_group_ids(groups: list) -> tuple:
+            for group in groups:
+                for later_group in groups:
+                    if (group["id"] in later_group["rows"]):
+                        return (group["id"], later_group["id"])
+            self.fail("no merged row is merged again")
+        
+        (groups, all_merged_csv, output) = self.run_plan_apply()
+        (rejected_group_id, later_group_id) = get_chained_group_ids(groups)
+        (groups, applied_csv, output) = self.run_plan_apply(lambda groups: [rejected_group_id])
+        self.assertNotEqual(applied_csv, all_merged_csv)
+        self.assertIn("1 merge(s) rejected", output)
+        # the groups containing the merged row of the group left undecided are left undecided too
+        self.assertRegex(output, "Group\\(s\\) left undecided: " + str(later_group_id) + "[,\\n]")
+        
+        # every row of the rejected group is written as it is
+        applied_rows = list(csv.reader(io.StringIO(applied_csv)))
+        (header, digested_rows) = rm_csv_dup.read_src_table(self.src_csv_path)
+        unique_rows = list(rm_csv_dup.iter_unique_rows(digested_rows))
+        rejected_group = next(group for group in groups if group["id"] == rejected_group_id)
+        for row_id in rejected_group["rows"]:
+            self.assertIn(unique_rows[row_id], applied_rows)
+    
+    def test_all_merged_by_grouping_rules(self):
+        grouping_rules = rm_csv_dup.parse_grouping_rules("Plugin ID, Host:subnet=24; Name:fuzzy=0.6, Port")
+        column_aggregators = rm_csv_dup.parse_column_aggregators("Host:union=3, Risk:max")
+        (groups, applied_csv, output) = self.run_plan_apply(grouping_rules = grouping_rules, column_aggregators = column_aggregators)
+        self.assertGreater(len(groups), 0)
+        self.assertEqual(applied_csv, self.run_interactive(grouping_rules = grouping_rules, column_aggregators = column_aggregators))
+
+if (__name__ == "__main__"):
+    unittest.main()
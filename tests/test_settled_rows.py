@@ -0,0 +1,45 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_settled_rows.py
+# @brief Checks that an incremental run merges the new rows only, and only looks through the new rows for every primary row.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+import rmdutil
+
+HEADER = ["Name", "Host"]
+
+# settled rows whose keys all share their prefix, so that they would all be candidates of each other
+SETTLED_ROWS = [["Apache HTTP Server < 2.4.%d" % i, "10.0.0.%d" % i] for i in range(200)]
+
+NEW_ROWS = [
+    ["OpenSSH < 9.6", "10.0.1.1"],
+    ["OpenSSH < 9.7", "10.0.1.2"],
+    ["Apache HTTP Server < 2.4.5", "10.0.1.3"],
+]
+
+class SettledRowsTest(unittest.TestCase):
+    def test_only_new_rows_are_candidates(self):
+        stats = rmdutil.RunStats()
+        reviewer = rm_csv_dup.MergeReviewer(decide = lambda header, rows_to_be_merged, merged_row: True)
+        clusterer = rm_csv_dup.MatchingPairClusterer(HEADER, SETTLED_ROWS + NEW_ROWS, ["Name"], reviewer = reviewer, settled_row_count = len(SETTLED_ROWS), stats = stats)
+        result_table = clusterer.run()
+        
+        self.assertEqual(len(result_table), len(SETTLED_ROWS) + 1)
+        self.assertIn(["OpenSSH < 9.6, OpenSSH < 9.7", "10.0.1.1, 10.0.1.2"], result_table)
+        self.assertIn(["Apache HTTP Server < 2.4.5", "10.0.0.5, 10.0.1.3"], result_table)
+        for settled_row in SETTLED_ROWS[:5] + SETTLED_ROWS[6:]:
+            self.assertIn(settled_row, result_table)
+        
+        # every primary row has at most the new rows (and the rows merged from them) as candidates
+        for stage in stats.stages:
+            self.assertLessEqual(stage["comparisons"], (len(SETTLED_ROWS) + len(NEW_ROWS)) * len(NEW_ROWS))
+
+if (__name__ == "__main__"):
+    unittest.main()
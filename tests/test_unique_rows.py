@@ -0,0 +1,45 @@
+# Copyright (c) 2025 Pentastic Security Limited. All rights reserved.
+
+# @file test_unique_rows.py
+# @brief Checks that removing the complete duplicates through partitions on disk gives the same rows as in memory.
+# how to use: python3 -m pytest tests
+
+import sys # to import the modules under test
+import os  # to find the modules under test
+import random # to generate the rows
+import tempfile # to hold the partitions
+import unittest # to run the tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rm_csv_dup
+
+# @return rows with quotes, commas, newlines, empty cells, non-ASCII text and different lengths, about a third of them complete duplicates
+def generate_rows(row_count: int) -> list:
+    rnd = random.Random(1)
+    cells = ["", "a", "b, c", "\"quoted\"", "line 1\nline 2", "line 1\r\nline 2", "漏洞", " padded "]
+    rows = [[], [""]]
+    for i in range(row_count):
+        if (rnd.random() < 0.3):
+            rows.append(list(rnd.choice(rows)))
+        else:
+            rows.append([rnd.choice(cells) for j in range(rnd.randint(1, 4))])
+    return rows
+
+class UniqueRowsTest(unittest.TestCase):
+    def test_partitions_like_memory(self):
+        rows = generate_rows(500)
+        unique_rows = list(rm_csv_dup.iter_unique_rows(rm_csv_dup.iter_digested_rows(rows)))
+        self.assertLess(len(unique_rows), len(rows))
+        self.assertEqual(unique_rows, [row for (i, row) in enumerate(rows) if row not in rows[0 : i]])
+        
+        for partition_count in [2, 3, 16]:
+            with tempfile.TemporaryDirectory() as temp_dir_path:
+                digested_rows = list(rm_csv_dup.iter_unique_rows(rm_csv_dup.iter_digested_rows(rows), partition_count, temp_dir_path, yield_digests = True))
+                # the partitions are removed once the rows are read
+                self.assertEqual(os.listdir(temp_dir_path), [])
+            self.assertEqual([row for (digest, row) in digested_rows], unique_rows, partition_count)
+            self.assertEqual([digest for (digest, row) in digested_rows], [rm_csv_dup.get_row_digest(row) for row in unique_rows], partition_count)
+
+if (__name__ == "__main__"):
+    unittest.main()